@@ -54,14 +54,17 @@ if db_connected:
         
         with col1:
             st.info(f"**Database Size:** {stats.get('database_size', 'Unknown')}")
+            if stats.get('approximate'):
+                st.caption(f"Row counts are estimates from table statistics, refreshed {stats['refreshed_at']:%H:%M:%S} UTC")
             st.success("✅ Database Connection: Healthy")
-            st.success("✅ Tables Initialized: Complete")
+            st.success(f"✅ Schema Version: {st.session_state.database.get_schema_version()}")
         
         with col2:
             # Connection test
             if st.button("🔍 Test Database Connection"):
                 try:
-                    test_stats = st.session_state.database.get_database_stats()
+                    # Bypass the cached snapshot so the button really reaches the database
+                    test_stats = st.session_state.database.get_database_stats(refresh=True)
                     if test_stats:
                         st.success("Database connection test successful!")
                     else:
@@ -69,6 +72,16 @@ if db_connected:
                 except Exception as e:
                     st.error(f"Database connection test failed: {str(e)}")
         
+        # Shared connection pool metrics
+        with st.expander("🔌 Connection Pool, Audit Writer & Cache Metrics"):
+            for url, pool_metrics in st.session_state.database.get_pool_metrics().items():
+                st.markdown(f"**{url}**")
+                st.dataframe(pd.DataFrame([pool_metrics]), use_container_width=True)
+            st.markdown("**Audit log writer**")
+            st.dataframe(pd.DataFrame([st.session_state.database.audit_writer.get_stats()]), use_container_width=True)
+            st.markdown("**Query cache**")
+            st.dataframe(pd.DataFrame([st.session_state.database.get_cache_metrics()]), use_container_width=True)
+        
         st.markdown("---")
         
         # Sample data operations
@@ -130,8 +143,12 @@ if db_connected:
                 "fields": ["id", "user_id_hash", "username", "email_hash", "created_at", "last_login", "privacy_score"]
             },
             "encrypted_game_data": {
-                "description": "Encrypted game data with AES-256 protection",
-                "fields": ["id", "user_id_hash", "game_name", "encrypted_payload", "encryption_metadata", "data_hash"]
+                "description": "Per-game pointer rows referencing encrypted content",
+                "fields": ["id", "user_id_hash", "game_name", "content_hash", "encryption_metadata", "data_hash", "created_at", "updated_at"]
+            },
+            "game_data_content": {
+                "description": "Write-once AES-256 ciphertext keyed by content hash",
+                "fields": ["content_hash", "ciphertext (BYTEA)", "kdf_salt", "iv", "auth_tag", "algorithm", "encrypted_at", "payload_metadata"]
             },
             "privacy_assessments": {
                 "description": "Privacy risk assessment results",
@@ -183,8 +200,8 @@ if db_connected:
         with col1:
             st.markdown("#### Data Retention Policy")
             st.info("**Default Retention:** 365 days for user data")
-            st.info("**Audit Logs:** 90 days retention")
-            st.info("**Assessment Data:** User-configurable retention")
+            st.info("**Audit Logs:** 90 days retention (whole monthly partitions dropped)")
+            st.info("**Assessments & Game Data:** Per-user retention from privacy settings")
             
             if st.button("🗑️ Run Data Cleanup"):
                 try:
@@ -205,7 +222,7 @@ if db_connected:
             # Refresh stats
             if st.button("🔄 Refresh Statistics"):
                 try:
-                    new_stats = st.session_state.database.get_database_stats()
+                    new_stats = st.session_state.database.get_database_stats(refresh=True)
                     if new_stats:
                         st.success("Statistics refreshed successfully!")
                         st.rerun()
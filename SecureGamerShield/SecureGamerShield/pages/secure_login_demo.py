@@ -1,8 +1,13 @@
 import streamlit as st
 import json
+import os
 from datetime import datetime
 from utils.encryption_manager import GameDataSecurityManager, EncryptionManager
 from utils.database_manager import SecureGameDataDB
+from utils.password_strength import is_password_acceptable
+from utils.game_data_sync import GameDataSyncEngine
+from utils.login_pipeline import get_default_login_pipeline
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 
 st.set_page_config(
     page_title="Secure Login & Encryption Demo",
@@ -18,11 +23,31 @@ if 'security_manager' not in st.session_state:
     st.session_state.security_manager = GameDataSecurityManager()
 if 'database' not in st.session_state:
     st.session_state.database = SecureGameDataDB()
+if st.session_state.security_manager.connector_registry and st.session_state.security_manager.sync_engine is None:
+    # Real data sources are configured: sync incrementally instead of re-pulling every login
+    st.session_state.security_manager.sync_engine = GameDataSyncEngine(
+        st.session_state.security_manager, st.session_state.database
+    )
 if 'encrypted_session_data' not in st.session_state:
     st.session_state.encrypted_session_data = None
 if 'login_successful' not in st.session_state:
     st.session_state.login_successful = False
 
+def get_client_id() -> str:
+    """Identify the requesting client for per-client rate limiting
+    
+    X-Forwarded-For is only trusted when TRUSTED_PROXY_HOPS says how many proxies we run: the
+    entry those proxies appended is the client address. Left-most entries are client-controlled.
+    """
+    trusted_hops = int(os.getenv('TRUSTED_PROXY_HOPS', '0'))
+    forwarded_for = st.context.headers.get('X-Forwarded-For')
+    if trusted_hops > 0 and forwarded_for:
+        hops = [hop.strip() for hop in forwarded_for.split(',') if hop.strip()]
+        if len(hops) >= trusted_hops:
+            return hops[-trusted_hops]
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx else 'unknown'
+
 # Create tabs for different security demonstrations
 demo_tab, encryption_tab, verification_tab = st.tabs(["🔐 Secure Login", "🛡️ Encryption Details", "✅ Verification"])
 
@@ -39,69 +64,119 @@ with demo_tab:
     6. **Secure Storage**: Return encrypted data safely
     """)
     
-    # Login form
-    with st.form("secure_login_form"):
-        st.markdown("#### User Login")
+    # Login form (credentials sit outside st.form so the strength meter updates on every rerun)
+    st.markdown("#### User Login")
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        user_id = st.text_input("User ID", value="gamer_user_123", help="Enter your gaming user ID")
         
-        col1, col2 = st.columns(2)
+    with col2:
+        password = st.text_input("Password", type="password", value="SecureGamePass2024!", help="Enter your secure password")
+    
+    password_ok, strength = is_password_acceptable(password, user_inputs=[user_id])
+    strength_labels = ["Very weak", "Weak", "Fair", "Strong", "Very strong"]
+    st.progress(
+        (strength['score'] + 1) / 5,
+        text=f"Password strength: {strength_labels[strength['score']]} (estimated crack time: {strength['crack_time_display']})"
+    )
+    if strength['feedback']['warning']:
+        st.warning(strength['feedback']['warning'])
+    for suggestion in strength['feedback']['suggestions']:
+        st.caption(f"💡 {suggestion}")
+    
+    # Game selection (simulating detection)
+    detected_game = st.selectbox(
+        "Currently Playing Game (Auto-detected)",
+        ["Valorant", "League of Legends", "Fortnite", "Minecraft", "Among Us", "Call of Duty", "Apex Legends", "Rocket League"],
+        help="In production, this would be automatically detected"
+    )
+    
+    multi_game = st.checkbox(
+        "Secure all my games (running and owned) in one login",
+        help="Retrieves and encrypts every detected game concurrently and stores them in a single batched write"
+    )
+    
+    register = st.checkbox(
+        "Create a new account with these credentials",
+        help="Accounts must be registered once; logins for unknown user IDs are rejected"
+    )
+    
+    submitted = st.button("🔐 Secure Login & Encrypt Data", use_container_width=True, type="primary")
+    
+    if submitted and not password_ok:
+        st.error("Password rejected before encryption: choose a stronger password.")
+        submitted = False
+    
+    if submitted and user_id and password and multi_game:
+        with st.spinner("Securing all detected games..."):
+            multi_response = st.session_state.security_manager.secure_multi_game_login_flow(
+                user_id, password, client_id=get_client_id(), database=st.session_state.database,
+                register=register
+            )
         
-        with col1:
-            user_id = st.text_input("User ID", value="gamer_user_123", help="Enter your gaming user ID")
+        if multi_response['status'] in ('success', 'partial'):
+            game_results = multi_response['games']
+            first_secured = next(r for r in game_results.values() if r['status'] == 'success')
+            st.session_state.encrypted_session_data = {'encrypted_data': first_secured['encrypted_data']}
+            st.session_state.login_successful = True
             
-        with col2:
-            password = st.text_input("Password", type="password", value="SecureGamePass2024!", help="Enter your secure password")
-        
-        # Game selection (simulating detection)
-        detected_game = st.selectbox(
-            "Currently Playing Game (Auto-detected)",
-            ["Valorant", "League of Legends", "Fortnite", "Minecraft", "Among Us", "Call of Duty", "Apex Legends", "Rocket League"],
-            help="In production, this would be automatically detected"
-        )
-        
-        submitted = st.form_submit_button("🔐 Secure Login & Encrypt Data", use_container_width=True, type="primary")
+            st.session_state.database.log_security_action(
+                user_id_hash=multi_response['user_id_hash'],
+                action_type="secure_login_multi_game",
+                resource_type="game_data",
+                details={
+                    "games": multi_response['detected_games'],
+                    "games_failed": multi_response['data_summary']['games_failed'],
+                    "data_stored": multi_response['persisted']
+                }
+            )
+            
+            if multi_response['status'] == 'success':
+                st.success(f"🎉 {multi_response['data_summary']['games_encrypted']} games encrypted and stored securely.")
+            else:
+                st.warning(
+                    f"Secured {multi_response['data_summary']['games_encrypted']} games; "
+                    f"{multi_response['data_summary']['games_failed']} could not be retrieved."
+                )
+            
+            st.dataframe(
+                [
+                    {
+                        'Game': game,
+                        'Status': '✅ Encrypted' if result['status'] == 'success' else '❌ Failed',
+                        'Details': result.get('error_message', result.get('encrypted_data', {}).get('algorithm', ''))
+                    }
+                    for game, result in game_results.items()
+                ],
+                use_container_width=True
+            )
+        else:
+            st.error(f"Login failed: {multi_response.get('error_message', 'No games could be secured')}")
+            st.session_state.login_successful = False
     
-    if submitted and user_id and password:
+    elif submitted and user_id and password:
         with st.spinner("Processing secure login..."):
             try:
-                # Simulate the complete secure login flow
-                secure_response = st.session_state.security_manager.secure_login_flow(user_id, password)
+                # Run the complete secure login flow; its pipeline persists the user
+                # and encrypted data and writes the audit entry
+                secure_response = st.session_state.security_manager.secure_login_flow(
+                    user_id, password,
+                    client_id=get_client_id(),
+                    database=st.session_state.database,
+                    last_game=detected_game,
+                    register=register
+                )
                 
                 if secure_response['status'] == 'success':
                     st.session_state.encrypted_session_data = secure_response
                     st.session_state.login_successful = True
                     
-                    # Store in database
-                    user_id_hash = secure_response['user_id_hash']
-                    encrypted_data = secure_response['encrypted_data']
-                    
-                    # Create user record
-                    st.session_state.database.create_user(
-                        user_id_hash=user_id_hash,
-                        username=user_id,
-                        email_hash=""
-                    )
-                    
-                    # Store encrypted game data
-                    data_stored = st.session_state.database.store_encrypted_game_data(
-                        user_id_hash=user_id_hash,
-                        game_name=detected_game,
-                        encrypted_data=encrypted_data,
-                        data_hash=user_id_hash[:32]  # Using truncated hash as example
-                    )
-                    
-                    # Log security action
-                    st.session_state.database.log_security_action(
-                        user_id_hash=user_id_hash,
-                        action_type="secure_login",
-                        resource_type="game_data",
-                        details={
-                            "game": detected_game,
-                            "encryption_algorithm": encrypted_data['algorithm'],
-                            "data_stored": data_stored
-                        }
-                    )
-                    
-                    st.success("🎉 Secure login successful! Data encrypted and stored securely in database.")
+                    if secure_response.get('data_stored'):
+                        st.success("🎉 Secure login successful! Data encrypted and stored securely in database.")
+                    else:
+                        st.warning("Secure login successful, but the encrypted data could not be stored.")
                     
                     # Display security summary
                     col1, col2, col3 = st.columns(3)
@@ -235,7 +310,8 @@ with verification_tab:
                 # Set password and decrypt
                 st.session_state.security_manager.set_session_password(verify_password)
                 decrypted_data = st.session_state.security_manager.decrypt_game_data(
-                    st.session_state.encrypted_session_data['encrypted_data']
+                    st.session_state.encrypted_session_data['encrypted_data'],
+                    client_id=get_client_id()
                 )
                 
                 st.success("✅ Decryption successful! Data integrity verified.")
@@ -256,10 +332,15 @@ with verification_tab:
                 if 'sensitive_data' in decrypted_data:
                     st.markdown("#### 🔐 Sensitive Data Hashes")
                     sensitive_hashes = decrypted_data['sensitive_data']
+                    redaction = decrypted_data.get('_redaction', {})
+                    algorithm = redaction.get('algorithm', 'BLAKE3')
                     
-                    for field, hash_info in sensitive_hashes.items():
-                        if isinstance(hash_info, dict) and 'hash' in hash_info:
-                            st.code(f"{field}: {hash_info['hash'][:32]}... ({hash_info['algorithm']})")
+                    for field, hash_value in sensitive_hashes.items():
+                        if isinstance(hash_value, dict) and 'hash' in hash_value:
+                            # Records written before field policies carry per-field hash dicts
+                            st.code(f"{field}: {hash_value['hash'][:32]}... ({hash_value['algorithm']})")
+                        elif field.endswith('_hash') and isinstance(hash_value, str):
+                            st.code(f"{field}: {hash_value[:32]}... ({algorithm})")
                 
             except Exception as e:
                 st.error(f"Decryption failed: {str(e)}")
@@ -295,6 +376,14 @@ with col3:
     st.markdown("• Authentication protection")
     st.markdown("• Forward secrecy")
 
+# Login pipeline observability
+with st.expander("⚙️ Login Pipeline Metrics"):
+    st.markdown("Per-stage latency and queue depth for the shared login pipeline (detect → fetch → redact → encrypt → persist → audit).")
+    if st.session_state.encrypted_session_data and 'stage_timings_ms' in st.session_state.encrypted_session_data:
+        st.markdown("**Your last login (ms per stage):**")
+        st.json(st.session_state.encrypted_session_data['stage_timings_ms'])
+    st.dataframe(get_default_login_pipeline().get_metrics(), use_container_width=True)
+
 # Implementation guide
 with st.expander("📚 Implementation Guide for Developers"):
     st.markdown("""
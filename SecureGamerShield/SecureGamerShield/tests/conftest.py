@@ -0,0 +1,9 @@
+"""
+Shared pytest setup
+Makes the application's `utils` package importable when running from the repository root
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
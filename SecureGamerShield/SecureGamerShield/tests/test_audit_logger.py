@@ -0,0 +1,212 @@
+"""
+Tests for the buffered audit log writer's spill and dead-letter handling
+"""
+
+import os
+import json
+import stat
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from utils.audit_logger import AuditLogWriter
+
+
+class FakeConnection:
+    def __init__(self, registry):
+        self.registry = registry
+
+    def execute(self, statement, params):
+        self.registry.attempts += 1
+        if self.registry.down:
+            raise OperationalError('INSERT', {}, Exception('connection refused'))
+        details = [value for key, value in params.items() if key.startswith('details_')]
+        if self.registry.partition_missing:
+            raise IntegrityError('INSERT', {}, Exception(
+                'no partition of relation "security_audit_log" found for row'
+            ))
+        if any(value and 'reject' in value for value in details):
+            raise IntegrityError('INSERT', {}, Exception('violates check constraint'))
+        self.registry.rows.extend(
+            json.loads(value) if value else None for value in details
+        )
+
+    def commit(self):
+        pass
+
+
+class FakeEngineRegistry:
+    """Stands in for EngineRegistry.connect, rejecting rows whose details mention 'reject'"""
+
+    def __init__(self):
+        self.rows = []
+        self.attempts = 0
+        self.down = False
+        self.partition_missing = False
+
+    @contextmanager
+    def connect(self, database_url):
+        yield FakeConnection(self)
+
+
+class FakePartitionManager:
+    def __init__(self, registry):
+        self.registry = registry
+        self.calls = 0
+
+    def ensure_future_partitions(self) -> int:
+        self.calls += 1
+        created = int(self.registry.partition_missing)
+        self.registry.partition_missing = False
+        return created
+
+
+@pytest.fixture
+def writer(tmp_path):
+    registry = FakeEngineRegistry()
+    partitions = FakePartitionManager(registry)
+    writer = AuditLogWriter(
+        'postgresql://test', engine_registry=registry, flush_interval=0.05, retry_interval=0,
+        spill_path=str(tmp_path / 'spill.jsonl'), dead_letter_path=str(tmp_path / 'dead.jsonl'),
+        partition_manager=partitions
+    )
+    writer.registry = registry
+    writer.partitions = partitions
+    yield writer
+    writer.close()
+
+
+def _dead_letters(writer):
+    with open(writer.dead_letter_path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_rejected_row_is_dead_lettered_and_the_rest_written(writer):
+    writer.log('user-a', 'login', details={'n': 1})
+    writer.log('user-b', 'login', details={'note': 'reject me'})
+    writer.log('user-c', 'login', details={'n': 3})
+    assert writer.flush()
+
+    assert writer.registry.rows == [{'n': 1}, {'n': 3}]
+    [dead] = _dead_letters(writer)
+    assert dead['event']['user_id_hash'] == 'user-b'
+    assert 'check constraint' in dead['error']
+    stats = writer.get_stats()
+    assert stats['dead_lettered'] == 1
+    assert not stats['spill_pending']
+
+
+def test_outage_spills_then_replays_without_poisoning(writer):
+    writer.registry.down = True
+    writer.log('user-a', 'login', details={'n': 1})
+    writer.log('user-b', 'login', details={'note': 'reject me'})
+    assert writer.flush()
+    assert writer.get_stats()['spill_pending']
+
+    writer.registry.down = False
+    assert writer.flush()
+
+    assert writer.registry.rows == [{'n': 1}]
+    assert not writer.get_stats()['spill_pending']
+    assert writer.get_stats()['dead_lettered'] == 1
+
+
+def test_unserialisable_details_do_not_kill_the_writer(writer):
+    writer.log('user-a', 'login', details={'when': object()})
+    writer.log('user-b', 'login', details={'n': 2})
+    assert writer.flush()
+
+    assert len(writer.registry.rows) == 2
+    assert writer._thread.is_alive()
+
+
+def test_torn_spill_line_is_dead_lettered(writer):
+    with open(writer.spill_path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps({'user_id_hash': 'user-a', 'action_type': 'login', 'resource_type': None,
+                            'details': {'n': 1}, 'timestamp': '2026-01-01T00:00:00'}) + '\n')
+        f.write('{"user_id_hash": "user-b", "act')
+    writer.log('user-c', 'login', details={'n': 3})
+    assert writer.flush()
+
+    assert writer.registry.rows == [{'n': 3}, {'n': 1}]
+    assert writer._thread.is_alive()
+    assert len(_dead_letters(writer)) == 1
+
+
+def test_partitions_are_checked_on_start_and_periodically(writer):
+    assert writer.flush()
+    assert writer.partitions.calls == 1
+
+    writer.partition_check_interval = 0
+    assert writer.flush()
+    assert writer.partitions.calls >= 2
+
+
+def test_missing_partition_is_created_and_the_batch_retried(writer):
+    assert writer.flush()
+    writer.registry.partition_missing = True
+    writer.log('user-a', 'login', details={'n': 1})
+    writer.log('user-b', 'login', details={'n': 2})
+    assert writer.flush()
+
+    assert writer.registry.rows == [{'n': 1}, {'n': 2}]
+    stats = writer.get_stats()
+    assert stats['partitions_created'] == 1
+    assert stats['dead_lettered'] == 0
+
+
+def test_default_files_live_in_a_private_directory(tmp_path, monkeypatch):
+    monkeypatch.setenv('AUDIT_DATA_DIR', str(tmp_path / 'audit'))
+    registry = FakeEngineRegistry()
+    writer = AuditLogWriter('postgresql://test', engine_registry=registry,
+                            partition_manager=FakePartitionManager(registry))
+    try:
+        assert os.path.dirname(writer.spill_path) == str(tmp_path / 'audit')
+        assert os.path.dirname(writer.dead_letter_path) == str(tmp_path / 'audit')
+        assert stat.S_IMODE(os.stat(tmp_path / 'audit').st_mode) == 0o700
+    finally:
+        writer.close()
+
+
+def test_spill_file_is_owner_only(writer):
+    writer.registry.down = True
+    writer.log('user-a', 'login', details={'n': 1})
+    assert writer.flush()
+
+    assert stat.S_IMODE(os.stat(writer.spill_path).st_mode) == 0o600
+
+
+def test_spill_is_not_written_through_a_symlink(writer, tmp_path):
+    target = tmp_path / 'elsewhere.jsonl'
+    target.write_text('')
+    os.symlink(target, writer.spill_path)
+    writer.registry.down = True
+    writer.log('user-a', 'login', details={'n': 1})
+    assert writer.flush()
+
+    assert target.read_text() == ''
+    assert writer.get_stats()['writer_errors'] >= 1
+
+
+def test_interrupted_replay_keeps_its_file_until_events_are_written(writer, monkeypatch):
+    writer.registry.down = True
+    writer.log('user-a', 'login', details={'n': 1})
+    writer.log('user-b', 'login', details={'n': 2})
+    assert writer.flush()
+
+    def failing_spill(events):
+        raise OSError('No space left on device')
+
+    # The database is still down and re-spilling fails: the claimed events must stay on disk
+    monkeypatch.setattr(writer, '_spill', failing_spill)
+    assert writer.flush()
+    replay_path = f"{writer.spill_path}.{os.getpid()}.replay"
+    assert os.path.exists(replay_path)
+
+    monkeypatch.undo()
+    writer.registry.down = False
+    assert writer.flush()
+
+    assert writer.registry.rows == [{'n': 1}, {'n': 2}]
+    assert not os.path.exists(replay_path)
@@ -0,0 +1,67 @@
+"""
+Tests for game document hashing and the multi-game login flow
+"""
+
+from utils.encryption_manager import GameDataSecurityManager
+from utils.game_connectors import ConnectorRegistry
+from utils.password_verifier import PasswordVerifierStore
+from utils.rate_limiter import KDFRateLimiter
+
+PASSWORD = 'correct horse battery staple orbit'
+
+DOCUMENT = {
+    'user_id': 'player-1',
+    'game_name': 'Dota 2',
+    'progress': {'level': 7},
+    'sensitive_data': {'auth_token': 'secret'},
+    'metadata': {'retrieved_at': '2026-01-01T00:00:00'}
+}
+
+
+def _manager(key: bytes) -> GameDataSecurityManager:
+    return GameDataSecurityManager(connector_registry=ConnectorRegistry(), data_hash_key=key)
+
+
+def test_data_hash_depends_on_the_server_key():
+    first, second = _manager(b'a' * 32), _manager(b'b' * 32)
+
+    assert first.compute_data_hash(DOCUMENT) == _manager(b'a' * 32).compute_data_hash(DOCUMENT)
+    assert first.compute_data_hash(DOCUMENT) != second.compute_data_hash(DOCUMENT)
+
+
+def test_data_hash_ignores_retrieval_metadata():
+    manager = _manager(b'a' * 32)
+    refreshed = dict(DOCUMENT, metadata={'retrieved_at': '2026-02-01T00:00:00'})
+
+    assert manager.compute_data_hash(refreshed) == manager.compute_data_hash(DOCUMENT)
+
+
+def _login_manager(games, rate_limiter: KDFRateLimiter) -> GameDataSecurityManager:
+    manager = GameDataSecurityManager(
+        verifier_store=PasswordVerifierStore(time_cost=1, memory_cost=8, parallelism=1),
+        rate_limiter=rate_limiter, connector_registry=ConnectorRegistry(), data_hash_key=b'a' * 32
+    )
+    manager.detect_user_games = lambda user_id, user_session, database=None: list(games)
+    manager._secure_one_game = lambda user_id, game: {'data_hash': game}
+    return manager
+
+
+def test_multi_game_login_charges_the_limiter_per_game():
+    limiter = KDFRateLimiter(user_capacity=3, user_refill_per_second=0.001)
+    manager = _login_manager(['A', 'B', 'C', 'D'], limiter)
+
+    result = manager.secure_multi_game_login_flow('player-1', PASSWORD, register=True)
+
+    # One token for the login itself, then one per game until the user budget is spent
+    assert [g for g, r in result['games'].items() if r['status'] == 'success'] == ['A', 'B']
+    assert 'user limit' in result['games']['C']['error_message']
+    assert result['status'] == 'partial'
+
+
+def test_multi_game_login_caps_the_number_of_games():
+    manager = _login_manager([f"Game {i}" for i in range(50)], KDFRateLimiter(user_capacity=100))
+
+    result = manager.secure_multi_game_login_flow('player-1', PASSWORD, register=True, max_games=3)
+
+    assert list(result['games']) == ['Game 0', 'Game 1', 'Game 2']
+    assert len(result['skipped_games']) == 47
@@ -0,0 +1,86 @@
+"""
+Tests for compiled declarative field policies
+"""
+
+import copy
+
+import pytest
+
+from utils.field_policy import CompiledFieldPolicy, FieldPolicyError, verify_hashed_field
+
+HASH_KEY = bytes(range(32))
+
+
+def _document() -> dict:
+    return {
+        'user_id': 'player-1',
+        'progress': {'level': 7, 'history': [{'map': 'dust2'}]},
+        'sensitive_data': {'auth_token': 'secret-token', 'region': 'eu'},
+        'accounts': {
+            'steam': {'password': 'hunter2', 'name': 'p1'},
+            'epic': {'password': 'swordfish', 'name': 'p1-epic'}
+        }
+    }
+
+
+def test_input_document_is_never_mutated():
+    document = _document()
+    original = copy.deepcopy(document)
+    policy = CompiledFieldPolicy({'*': 'keep', 'sensitive_data.auth_token': 'hash', 'accounts': 'drop'})
+
+    redacted = policy.apply(document, hash_key=HASH_KEY)
+    redacted['progress']['history'][0]['map'] = 'changed'
+
+    assert document == original
+    assert redacted['progress'] is not document['progress']
+
+
+def test_nested_rule_hashes_only_its_field():
+    policy = CompiledFieldPolicy({'*': 'keep', 'sensitive_data.auth_token': 'hash'})
+
+    redacted = policy.apply(_document(), hash_key=HASH_KEY)
+
+    assert redacted['sensitive_data']['region'] == 'eu'
+    assert 'auth_token' not in redacted['sensitive_data']
+    assert verify_hashed_field('secret-token', redacted['sensitive_data']['auth_token_hash'],
+                               redacted['_redaction'])
+    assert redacted['_redaction']['hashed_fields'] == 1
+
+
+def test_wildcard_rule_applies_at_its_level_and_exact_rules_win():
+    policy = CompiledFieldPolicy({
+        '*': 'keep',
+        'accounts.*.password': 'drop',
+        'accounts.epic.password': 'hash'
+    })
+
+    redacted = policy.apply(_document(), hash_key=HASH_KEY)
+
+    assert redacted['accounts']['steam'] == {'name': 'p1'}
+    assert redacted['accounts']['epic']['name'] == 'p1-epic'
+    assert 'password_hash' in redacted['accounts']['epic']
+    assert redacted['_redaction']['dropped_fields'] == 1
+
+
+def test_unlisted_fields_follow_the_document_default():
+    policy = CompiledFieldPolicy({'*': 'drop', 'user_id': 'keep'})
+
+    redacted = policy.apply(_document(), hash_key=HASH_KEY)
+
+    assert set(redacted) == {'user_id', '_redaction'}
+
+
+def test_encrypt_without_a_field_key_raises():
+    policy = CompiledFieldPolicy({'*': 'keep', 'sensitive_data.auth_token': 'encrypt'})
+
+    with pytest.raises(FieldPolicyError, match='sensitive_data.auth_token'):
+        policy.apply(_document(), hash_key=HASH_KEY)
+
+
+def test_invalid_policies_are_rejected_at_compile_time():
+    with pytest.raises(FieldPolicyError):
+        CompiledFieldPolicy({'progress.level': 'scramble'})
+    with pytest.raises(FieldPolicyError):
+        CompiledFieldPolicy({'progress..level': 'drop'})
+    with pytest.raises(FieldPolicyError):
+        CompiledFieldPolicy({'*': 'hash'})
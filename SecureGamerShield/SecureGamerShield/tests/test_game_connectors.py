@@ -0,0 +1,156 @@
+"""
+Tests for the async game data connectors against local mock platform servers
+"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from utils.encryption_manager import GameDataSecurityManager
+from utils.game_connectors import (
+    AsyncHTTPClient, CloudSaveConnector, ConnectorError, ConnectorRegistry,
+    KeepAliveHTTPPool, ResponseCache, SteamConnector
+)
+
+
+class MockPlatform:
+    """Keep-alive HTTP/1.1 server answering GETs from a path -> (status, body) table"""
+
+    def __init__(self, routes: dict, etag: str = None, max_age: int = 60):
+        self.routes = routes
+        self.etag = etag
+        self.max_age = max_age
+        self.requests = []
+        self.connections = set()
+        platform = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                platform.requests.append((self.path, dict(self.headers)))
+                platform.connections.add(self.client_address)
+                path = self.path.split('?', 1)[0]
+                if platform.etag and self.headers.get('If-None-Match') == platform.etag:
+                    self.send_response(304)
+                    self.send_header('ETag', platform.etag)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                status, body = platform.routes.get(path, (404, {}))
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.send_header('Cache-Control', f"max-age={platform.max_age}")
+                if platform.etag:
+                    self.send_header('ETag', platform.etag)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+STEAM_STATS = {
+    'playerstats': {
+        'achievements': [{'name': 'FIRST_BLOOD'}, {'name': 'ACE'}],
+        'stats': [{'name': 'total_kills', 'value': 1200}, {'name': 'total_wins', 'value': 310}]
+    }
+}
+STEAM_PATH = '/ISteamUserStats/GetUserStatsForGame/v0002/'
+
+
+@pytest.fixture
+def client():
+    pool = KeepAliveHTTPPool(timeout=5)
+    yield AsyncHTTPClient(pool, ResponseCache())
+    pool.close()
+
+
+@pytest.fixture
+def steam():
+    platform = MockPlatform({STEAM_PATH: (200, STEAM_STATS)}, etag='"v1"', max_age=0)
+    yield platform
+    platform.close()
+
+
+def test_steam_connector_maps_stats(client, steam):
+    registry = ConnectorRegistry(source_timeout=5)
+    registry.register(SteamConnector('key', client, base_url=steam.url))
+
+    results = registry.fetch_all('76561198000000000', 'Counter-Strike 2')
+
+    assert results['steam']['status'] == 'ok'
+    assert results['steam']['data'] == {
+        'progress': {'achievements_unlocked': 2},
+        'scores': {'total_kills': 1200, 'total_wins': 310}
+    }
+
+
+def test_stale_entries_are_revalidated_with_etag_over_one_connection(client, steam):
+    registry = ConnectorRegistry(source_timeout=5)
+    registry.register(SteamConnector('key', client, base_url=steam.url))
+
+    first = registry.fetch_all('76561198000000000', 'Dota 2')
+    second = registry.fetch_all('76561198000000000', 'Dota 2')
+
+    assert first['steam']['data'] == second['steam']['data']
+    assert 'If-None-Match' not in steam.requests[0][1]
+    assert steam.requests[1][1]['If-None-Match'] == '"v1"'
+    assert client.cache.get_stats()['revalidated'] == 1
+    assert len(steam.connections) == 1
+    assert client.pool.get_stats()['connections_reused'] == 1
+
+
+def test_registry_reports_failing_source_and_keeps_the_others(client, steam):
+    broken = MockPlatform({})
+    try:
+        registry = ConnectorRegistry(source_timeout=5)
+        registry.register(SteamConnector('key', client, base_url=steam.url))
+        registry.register(CloudSaveConnector(broken.url, client))
+
+        results = registry.fetch_all('76561198000000000', 'Rocket League')
+    finally:
+        broken.close()
+
+    assert results['steam']['status'] == 'ok'
+    assert results['cloud_save']['status'] == 'error'
+    assert 'HTTP 404' in results['cloud_save']['error']
+
+
+def _security_manager(registry: ConnectorRegistry) -> GameDataSecurityManager:
+    return GameDataSecurityManager(connector_registry=registry)
+
+
+def test_retrieve_falls_back_when_no_connector_supports_the_game(client, steam):
+    registry = ConnectorRegistry(source_timeout=5)
+    registry.register(SteamConnector('key', client, base_url=steam.url))
+
+    game_data = _security_manager(registry).retrieve_game_data('player-1', 'Valorant')
+
+    assert game_data['game_name'] == 'Valorant'
+    assert game_data['progress']
+    assert steam.requests == []
+
+
+def test_retrieve_raises_when_every_supporting_source_fails(client):
+    broken = MockPlatform({})
+    try:
+        registry = ConnectorRegistry(source_timeout=5)
+        registry.register(CloudSaveConnector(broken.url, client))
+
+        with pytest.raises(ConnectorError, match='cloud_save'):
+            _security_manager(registry).retrieve_game_data('player-1', 'Valorant')
+    finally:
+        broken.close()
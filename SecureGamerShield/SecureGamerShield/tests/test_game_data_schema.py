@@ -0,0 +1,46 @@
+"""
+Tests for the compiled game data schema's size budget
+"""
+
+from utils.game_data_schema import GameDataValidator
+
+
+def _document(**sections) -> dict:
+    return {'user_id': 'player-1', 'game_name': 'Dota 2', **sections}
+
+
+def test_walk_stops_inside_a_list_once_the_budget_is_spent():
+    validator = GameDataValidator(max_bytes=1024)
+    # Anything after the oversized string would be reported if the walk continued
+    document = _document(scores={'history': ['x' * 2048] + [object()] * 1000})
+
+    assert validator.errors(document) == [('$', "document larger than 1024 bytes")]
+
+
+def test_walk_stops_inside_objects_once_the_budget_is_spent():
+    validator = GameDataValidator(max_bytes=1024)
+    document = _document(settings={'blob': 'x' * 2048, 'next': object()})
+    document['unexpected'] = object()
+
+    assert validator.errors(document) == [('$', "document larger than 1024 bytes")]
+
+
+def test_strings_past_the_budget_are_not_measured():
+    validator = GameDataValidator(max_bytes=1024)
+    checked = []
+
+    class CountingStr(str):
+        def __len__(self):
+            checked.append(self)
+            return super().__len__()
+
+    document = _document(settings={'values': ['x' * 2048, CountingStr('late'), CountingStr('later')]})
+
+    assert validator.errors(document) == [('$', "document larger than 1024 bytes")]
+    assert checked == []
+
+
+def test_document_within_budget_is_valid():
+    validator = GameDataValidator(max_bytes=1024)
+
+    assert validator.errors(_document(progress={'level': 3}, scores={'history': [1, 2, 3]})) == []
@@ -0,0 +1,144 @@
+"""
+Tests for incremental game data synchronisation
+"""
+
+import hashlib
+import json
+
+from utils.game_data_sync import GameDataSyncEngine
+
+
+def _content_hash(document: dict) -> str:
+    content = {key: value for key, value in document.items() if key != 'metadata'}
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode()).hexdigest()
+
+
+class FakeEncryptionManager:
+    def hash_user_id(self, user_id: str) -> str:
+        return f"hash-{user_id}"
+
+
+class FakeSecurityManager:
+    """Records what would be encrypted; the payload stands in for the redacted ciphertext"""
+
+    def __init__(self):
+        self.encryption_manager = FakeEncryptionManager()
+        self.encrypted = []
+
+    def compute_data_hash(self, game_data: dict) -> str:
+        return _content_hash(game_data)
+
+    def encrypt_game_data(self, game_data: dict, encryption_method: str = 'AES') -> dict:
+        self.encrypted.append(json.loads(json.dumps(game_data)))
+        return {'payload': 'redacted', 'data_hash': _content_hash(game_data)}
+
+    def decrypt_game_data(self, encrypted_data: dict) -> dict:
+        raise AssertionError("the redacted payload must not be used as the merge base")
+
+
+class FakeRegistry:
+    def __init__(self, deltas: dict, full: dict):
+        self.deltas = deltas
+        self.full = full
+
+    def fetch_deltas(self, user_id, game_name, watermarks):
+        return self.deltas
+
+    def fetch_all(self, user_id, game_name):
+        return self.full
+
+
+class FakeDatabase:
+    def __init__(self, stored: dict = None, watermarks: dict = None):
+        self.stored = stored
+        self.watermarks = watermarks or {}
+        self.writes = []
+
+    def retrieve_encrypted_game_data(self, user_id_hash, game_name):
+        return [self.stored] if self.stored else []
+
+    def get_sync_watermarks(self, user_id_hash, game_name):
+        return dict(self.watermarks)
+
+    def store_sync_watermarks(self, user_id_hash, game_name, watermarks):
+        self.watermarks = dict(watermarks)
+
+    def create_user(self, **kwargs):
+        return True
+
+    def store_encrypted_game_data(self, **kwargs):
+        self.writes.append(kwargs)
+        return True
+
+
+def _document(auth_token: str, level: int) -> dict:
+    return {
+        'user_id': 'player-1',
+        'game_name': 'Dota 2',
+        'progress': {'level': level},
+        'scores': {},
+        'settings': {},
+        'sensitive_data': {'auth_token': auth_token}
+    }
+
+
+def _ok(data: dict) -> dict:
+    return {'status': 'ok', 'data': data, 'elapsed_seconds': 0.0}
+
+
+def _stored(document: dict) -> dict:
+    return {'encrypted_payload': {'payload': 'redacted'}, 'data_hash': _content_hash(document)}
+
+
+def test_change_that_restores_stored_content_is_unchanged():
+    current = _document('secret', 7)
+    registry = FakeRegistry(
+        deltas={'cloud_save': _ok({'changed': True, 'data': {'progress': {'level': 7}},
+                                   'watermark': {'cursor': '2'}})},
+        full={'cloud_save': _ok({key: current[key] for key in ('progress', 'sensitive_data')})}
+    )
+    database = FakeDatabase(_stored(current), {'cloud_save': {'cursor': '1'}})
+    manager = FakeSecurityManager()
+
+    result = GameDataSyncEngine(manager, database, registry).sync('player-1', 'Dota 2')
+
+    assert result['status'] == 'unchanged'
+    assert manager.encrypted == []
+    assert database.writes == []
+    assert database.watermarks == {'cloud_save': {'cursor': '2'}}
+
+
+def test_update_hashes_and_encrypts_the_unredacted_document():
+    updated = _document('secret', 8)
+    registry = FakeRegistry(
+        deltas={'cloud_save': _ok({'changed': True, 'data': {'progress': {'level': 8}},
+                                   'watermark': {'cursor': '2'}})},
+        full={'cloud_save': _ok({key: updated[key] for key in ('progress', 'sensitive_data')})}
+    )
+    database = FakeDatabase(_stored(_document('secret', 7)), {'cloud_save': {'cursor': '1'}})
+    manager = FakeSecurityManager()
+
+    result = GameDataSyncEngine(manager, database, registry).sync('player-1', 'Dota 2')
+
+    assert result['status'] == 'updated'
+    assert result['data_hash'] == _content_hash(updated)
+    assert len(manager.encrypted) == 1
+    assert manager.encrypted[0]['sensitive_data'] == {'auth_token': 'secret'}
+    assert database.watermarks == {'cloud_save': {'cursor': '2'}}
+
+
+def test_failed_rebuild_keeps_stored_record_and_watermarks():
+    stored = _stored(_document('secret', 7))
+    registry = FakeRegistry(
+        deltas={'cloud_save': _ok({'changed': True, 'data': {'progress': {'level': 8}},
+                                   'watermark': {'cursor': '2'}})},
+        full={'cloud_save': {'status': 'error', 'error': 'HTTP 503', 'elapsed_seconds': 0.0}}
+    )
+    database = FakeDatabase(stored, {'cloud_save': {'cursor': '1'}})
+
+    result = GameDataSyncEngine(FakeSecurityManager(), database, registry).sync('player-1', 'Dota 2')
+
+    assert result['status'] == 'unchanged'
+    assert result['data_hash'] == stored['data_hash']
+    assert database.writes == []
+    assert database.watermarks == {'cloud_save': {'cursor': '1'}}
@@ -0,0 +1,44 @@
+"""
+Tests for /proc-based game process detection
+"""
+
+from utils.game_detector import ProcessGameDetector
+
+
+def _write_process(proc_root, pid, comm, cmdline, start_time):
+    process_dir = proc_root / str(pid)
+    process_dir.mkdir(exist_ok=True)
+    (process_dir / 'comm').write_text(comm + '\n')
+    (process_dir / 'cmdline').write_bytes(cmdline.replace(' ', '\0').encode())
+    fields = ['S'] + ['0'] * 18 + [str(start_time)] + ['0'] * 10
+    (process_dir / 'stat').write_text(f"{pid} ({comm}) {' '.join(fields)}\n")
+
+
+def test_detects_new_game_process(tmp_path):
+    _write_process(tmp_path, 100, 'bash', '/bin/bash', 10)
+    _write_process(tmp_path, 200, 'RocketLeague.exe', 'C:/games/RocketLeague.exe', 20)
+    detector = ProcessGameDetector(proc_root=str(tmp_path))
+
+    assert detector.poll(force=True) == {'Rocket League': {200}}
+
+
+def test_launcher_that_execs_the_game_is_reclassified(tmp_path):
+    _write_process(tmp_path, 300, 'launcher', '/opt/launcher --start', 30)
+    detector = ProcessGameDetector(proc_root=str(tmp_path), recheck_interval=0)
+    assert detector.poll(force=True) == {}
+
+    # Same PID and start time; exec changed comm and cmdline
+    _write_process(tmp_path, 300, 'r5apex.exe', 'r5apex.exe -dev', 30)
+
+    assert detector.poll(force=True) == {'Apex Legends': {300}}
+    assert detector.get_stats()['reclassified'] == 1
+
+
+def test_recycled_pid_drops_the_old_game(tmp_path):
+    _write_process(tmp_path, 400, 'cs2.exe', 'cs2.exe', 40)
+    detector = ProcessGameDetector(proc_root=str(tmp_path), recheck_interval=0)
+    assert detector.poll(force=True) == {'Counter-Strike 2': {400}}
+
+    _write_process(tmp_path, 400, 'bash', '/bin/bash', 41)
+
+    assert detector.poll(force=True) == {}
@@ -0,0 +1,37 @@
+"""
+Tests for the zxcvbn-style password strength estimator
+"""
+
+import random
+import string
+
+from utils.password_strength import estimate_password_strength, is_password_acceptable
+
+
+def test_very_long_random_password_does_not_overflow():
+    alphabet = string.ascii_letters + string.digits + '!@#$%^&*'
+    rng = random.Random(0)
+    password = ''.join(rng.choice(alphabet) for _ in range(200))
+
+    estimate = estimate_password_strength(password)
+
+    assert estimate['score'] == 4
+    assert estimate['guesses_log10'] > 300
+    assert estimate['crack_time_display'] == 'centuries'
+
+
+def test_very_long_repeated_password_does_not_overflow():
+    rng = random.Random(1)
+    base = ''.join(rng.choice(string.printable[:94]) for _ in range(170))
+
+    acceptable, estimate = is_password_acceptable(base * 2)
+
+    assert acceptable
+    assert estimate['score'] == 4
+
+
+def test_common_password_scores_low():
+    acceptable, estimate = is_password_acceptable('password123')
+
+    assert not acceptable
+    assert estimate['score'] <= 1
@@ -0,0 +1,123 @@
+"""
+Tests for Argon2id verifier storage and KDF admission control
+"""
+
+import threading
+
+import pytest
+
+from utils.password_verifier import (
+    AdmissionRejectedError, InMemoryVerifierBackend, KDFAdmissionController, PasswordVerifierStore
+)
+
+PASSWORD = 'correct horse battery staple orbit'
+
+
+def _store(backend=None, time_cost: int = 1, admission_controller=None) -> PasswordVerifierStore:
+    return PasswordVerifierStore(backend, admission_controller, time_cost=time_cost,
+                                 memory_cost=8, parallelism=1)
+
+
+def test_registered_password_verifies():
+    store = _store()
+
+    assert store.register('user-a', PASSWORD)
+    assert store.has_verifier('user-a')
+    assert store.verify('user-a', PASSWORD)
+
+
+def test_duplicate_registration_keeps_the_first_verifier():
+    store = _store()
+    store.register('user-a', PASSWORD)
+
+    assert not store.register('user-a', 'a different password entirely')
+    assert store.verify('user-a', PASSWORD)
+    assert not store.verify('user-a', 'a different password entirely')
+
+
+def test_wrong_password_and_unknown_user_are_rejected():
+    store = _store()
+    store.register('user-a', PASSWORD)
+
+    assert not store.verify('user-a', PASSWORD + '!')
+    assert not store.verify('user-b', PASSWORD)
+    assert not store.has_verifier('user-b')
+
+
+def test_stale_verifier_is_upgraded_on_login():
+    backend = InMemoryVerifierBackend()
+    _store(backend, time_cost=1).register('user-a', PASSWORD)
+    store = _store(backend, time_cost=2)
+    assert store.needs_rehash(backend.get('user-a'))
+
+    assert store.verify('user-a', PASSWORD)
+
+    assert not store.needs_rehash(backend.get('user-a'))
+    assert store.verify('user-a', PASSWORD)
+
+
+class PasswordChangedDuringLogin(InMemoryVerifierBackend):
+    """Hands out the stale verifier once, then another session changes the password"""
+
+    def __init__(self, changed: str):
+        super().__init__()
+        self.changed = changed
+
+    def get(self, user_id_hash):
+        stale = super().get(user_id_hash)
+        with self._lock:
+            self._verifiers[user_id_hash] = self.changed
+        return stale
+
+
+def test_rehash_does_not_overwrite_a_concurrent_password_change():
+    changed = _store(time_cost=2).hash_password('the new password chosen elsewhere')
+    backend = PasswordChangedDuringLogin(changed)
+    _store(backend, time_cost=1).register('user-a', PASSWORD)
+
+    assert _store(backend, time_cost=2).verify('user-a', PASSWORD)
+
+    assert InMemoryVerifierBackend.get(backend, 'user-a') == changed
+
+
+def test_concurrent_unknown_user_lookups_share_one_dummy_verifier():
+    store = _store()
+    dummies = []
+
+    def lookup():
+        store.verify('nobody', PASSWORD)
+        dummies.append(store._dummy_verifier)
+
+    threads = [threading.Thread(target=lookup) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(set(dummies)) == 1
+
+
+def test_work_past_the_admission_deadline_is_rejected():
+    controller = KDFAdmissionController(max_concurrent=1, max_queue=4, queue_timeout=0.05)
+    store = _store(admission_controller=controller)
+    store.register('user-a', PASSWORD)
+
+    with controller.admit():
+        with pytest.raises(AdmissionRejectedError, match='no KDF slot'):
+            store.verify('user-a', PASSWORD)
+
+    stats = controller.get_stats()
+    assert stats['shed_deadline'] == 1
+    assert stats['waiting'] == 0
+    assert store.verify('user-a', PASSWORD)
+
+
+def test_work_past_a_full_queue_is_shed_immediately():
+    controller = KDFAdmissionController(max_concurrent=1, max_queue=0, queue_timeout=5)
+
+    with controller.admit():
+        with pytest.raises(AdmissionRejectedError, match='queue full'):
+            with controller.admit():
+                pass
+
+    assert controller.get_stats()['shed_queue_full'] == 1
@@ -0,0 +1,75 @@
+"""
+Tests for the versioned query cache with a shared backend and cross-replica invalidation
+"""
+
+import json
+import socket
+import time
+import multiprocessing
+
+import pytest
+
+from utils.cache_invalidation import InvalidationListener, invalidation_payloads
+from utils.query_cache import CacheStore, QueryCache, connect_shared_cache, serve_shared_cache
+
+AUTHKEY = b'test-authkey'
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def shared_address():
+    """A local shared cache server process, as started by `python -m utils.query_cache serve`"""
+    address = ('127.0.0.1', _free_port())
+    server = multiprocessing.Process(target=serve_shared_cache, args=(address, AUTHKEY), daemon=True)
+    server.start()
+    deadline = time.monotonic() + 10
+    while True:
+        try:
+            socket.create_connection(address, timeout=1).close()
+            break
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+    yield address
+    server.terminate()
+    server.join()
+
+
+def _replica(address) -> QueryCache:
+    return QueryCache(CacheStore(), connect_shared_cache(address, AUTHKEY))
+
+
+def _notification(user_id_hash: str) -> str:
+    return json.dumps({'origin': 'another-host', 'table': 'encrypted_game_data',
+                       'users': [user_id_hash], 'sent_at': 0})
+
+
+def test_remote_write_invalidates_shared_backed_processes(shared_address):
+    first, second = _replica(shared_address), _replica(shared_address)
+    assert first.get_or_load('game_data', 'user-1', (), lambda: 'old') == 'old'
+    assert second.get_or_load('game_data', 'user-1', (), lambda: 'unused') == 'old'
+
+    # A replica on another host wrote; only this host's listener hears about it
+    InvalidationListener(None, first)._handle(_notification('user-1'))
+
+    assert first.get_or_load('game_data', 'user-1', (), lambda: 'new') == 'new'
+    assert second.get_or_load('game_data', 'user-1', (), lambda: 'unused') == 'new'
+    assert first.get_stats()['remote_invalidations'] == 1
+
+
+def test_own_notifications_are_skipped(shared_address):
+    cache = _replica(shared_address)
+    cache.get_or_load('game_data', 'user-1', (), lambda: 'cached')
+    listener = InvalidationListener(None, cache)
+    for payload in invalidation_payloads('encrypted_game_data', ['user-1']):
+        listener._handle(payload)
+
+    assert cache.get_or_load('game_data', 'user-1', (), lambda: 'reloaded') == 'cached'
+    assert listener.get_stats()['own_skipped'] == 1
+
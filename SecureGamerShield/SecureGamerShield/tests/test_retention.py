@@ -0,0 +1,81 @@
+"""
+Tests for the retention engine's cache invalidation of deleted rows
+"""
+
+import json
+from contextlib import contextmanager
+
+from utils.cache_invalidation import INVALIDATION_CHANNEL
+from utils.query_cache import CacheStore, QueryCache
+from utils.retention import RetentionEngine
+
+
+class FakeResult:
+    def __init__(self, row):
+        self.row = row
+
+    def fetchone(self):
+        return self.row
+
+
+class FakeConnection:
+    """Answers the checkpoint and batch statements; records NOTIFYs and when the transaction commits"""
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def execute(self, statement, params=None):
+        sql = str(statement)
+        if 'FOR UPDATE SKIP LOCKED' in sql:
+            return FakeResult((0,))
+        if 'WITH scan AS' in sql:
+            return FakeResult(self.engine.batch_row)
+        if 'pg_notify' in sql:
+            assert params['channel'] == INVALIDATION_CHANNEL
+            self.engine.events.append(('notify', json.loads(params['payload'])['users']))
+        return FakeResult(None)
+
+    def commit(self):
+        self.engine.events.append(('commit', None))
+
+    def rollback(self):
+        pass
+
+
+class FakeEngine:
+    def __init__(self, batch_row):
+        self.batch_row = batch_row
+        self.events = []
+
+    @contextmanager
+    def connect(self):
+        yield FakeConnection(self)
+
+
+def _cache_with(user_id_hashes) -> QueryCache:
+    cache = QueryCache(CacheStore())
+    for user_id_hash in user_id_hashes:
+        cache.get_or_load('game_data', user_id_hash, (), lambda: 'cached')
+    return cache
+
+
+def test_deleted_owners_are_notified_before_commit_and_evicted_after():
+    engine = FakeEngine((42, 3, 2, ['user-a', 'user-b']))
+    cache = _cache_with(['user-a', 'user-b', 'user-c'])
+
+    result = RetentionEngine(engine, query_cache=cache).run_batch('encrypted_game_data')
+
+    assert result == {'scanned': 3, 'deleted': 2, 'wrapped': False}
+    assert engine.events == [('notify', ['user-a', 'user-b']), ('commit', None)]
+    assert cache.get_or_load('game_data', 'user-a', (), lambda: 'reloaded') == 'reloaded'
+    assert cache.get_or_load('game_data', 'user-b', (), lambda: 'reloaded') == 'reloaded'
+    assert cache.get_or_load('game_data', 'user-c', (), lambda: 'reloaded') == 'cached'
+
+
+def test_batch_without_deletions_sends_no_notification():
+    engine = FakeEngine((42, 3, 0, None))
+
+    result = RetentionEngine(engine, query_cache=_cache_with([])).run_batch('privacy_assessments')
+
+    assert result['deleted'] == 0
+    assert engine.events == [('commit', None)]
@@ -0,0 +1,344 @@
+"""
+Buffered background writer for the security audit log
+Events are queued in O(1) and flushed in multi-row inserts, spilling to disk while the database is unavailable
+and quarantining rows the database rejects in a dead-letter file
+"""
+
+import os
+import json
+import queue
+import stat
+import atexit
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List
+from sqlalchemy import text
+from sqlalchemy.exc import DisconnectionError, InterfaceError, OperationalError, TimeoutError
+from utils.db_engine import EngineRegistry, get_engine_registry
+from utils.audit_partitions import AuditLogPartitionManager
+
+_STOP = object()
+
+# Failures that say nothing about the rows themselves; anything else (DataError, IntegrityError, ...)
+# is retried row by row so a single bad event cannot block the rest of its batch
+RETRYABLE_ERRORS = (OperationalError, InterfaceError, DisconnectionError, TimeoutError)
+
+# Postgres' error for a row outside every partition of a partitioned table (there is no DEFAULT one)
+MISSING_PARTITION_ERROR = 'no partition of relation'
+
+# Spill and dead-letter files are opened owner-only and never through a symlink planted in their place
+_NOFOLLOW = getattr(os, 'O_NOFOLLOW', 0)
+
+
+def _private_audit_dir() -> str:
+    """Owner-only directory for the spill and dead-letter files (AUDIT_DATA_DIR, else ~/.securegamershield/audit)"""
+    path = os.getenv('AUDIT_DATA_DIR') or os.path.join(os.path.expanduser('~'), '.securegamershield', 'audit')
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode) or (hasattr(os, 'geteuid') and info.st_uid != os.geteuid()):
+        raise PermissionError(f"Audit data directory {path} is not a directory owned by this user")
+    if stat.S_IMODE(info.st_mode) & 0o077:
+        os.chmod(path, 0o700)
+    return path
+
+
+class AuditLogWriter:
+    """Batches audit events from a bounded queue into multi-row inserts on a background thread"""
+
+    def __init__(self, database_url: str, engine_registry: EngineRegistry = None,
+                 batch_size: int = 500, flush_interval: float = 1.0, max_queue: int = 10000,
+                 enqueue_timeout: float = 0.5, spill_path: str = None, retry_interval: float = 5.0,
+                 dead_letter_path: str = None, partition_manager: AuditLogPartitionManager = None,
+                 partition_check_interval: float = 6 * 3600):
+        self.database_url = database_url
+        self.engine_registry = engine_registry or get_engine_registry()
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self.retry_interval = retry_interval
+        self._last_error = 0.0
+        self._partition_manager = partition_manager
+        self.partition_check_interval = partition_check_interval
+        self._partitions_checked = None
+        if not (spill_path and dead_letter_path):
+            audit_dir = _private_audit_dir()
+            spill_path = spill_path or os.path.join(audit_dir, 'audit_spill.jsonl')
+            dead_letter_path = dead_letter_path or os.path.join(audit_dir, 'audit_dead_letter.jsonl')
+        self.spill_path = spill_path
+        self.dead_letter_path = dead_letter_path
+        self.queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._spill_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {'enqueued': 0, 'written': 0, 'batches': 0, 'spilled': 0,
+                       'replayed': 0, 'write_errors': 0, 'dead_lettered': 0, 'writer_errors': 0,
+                       'partitions_created': 0, 'last_flush_ms': 0.0}
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='audit-log-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _count(self, name: str, amount=1):
+        with self._stats_lock:
+            self._stats[name] += amount
+
+    def log(self, user_id_hash: str, action_type: str, resource_type: str = None,
+            details: dict = None) -> bool:
+        """Enqueue an audit event; blocks briefly when the queue is full, then spills to disk"""
+        event = {
+            'user_id_hash': user_id_hash,
+            'action_type': action_type,
+            'resource_type': resource_type,
+            'details': details,
+            # Stamped at enqueue time so batching does not shift event times
+            'timestamp': datetime.utcnow().isoformat()
+        }
+        if self._closed:
+            self._spill([event])
+            return True
+        try:
+            self.queue.put(event, timeout=self.enqueue_timeout)
+        except queue.Full:
+            self._spill([event])
+            return True
+        self._count('enqueued')
+        return True
+
+    def _run(self):
+        while True:
+            try:
+                item = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                self._guarded(self._ensure_partitions)
+                self._guarded(self._replay_spill)
+                continue
+
+            batch: List[Dict] = []
+            waiters: List[threading.Event] = []
+            stop = False
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if item is _STOP:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    batch.append(item)
+                # Flush on size, on an explicit flush/stop, or when the time window closes
+                if stop or waiters or len(batch) >= self.batch_size:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+
+            self._guarded(self._ensure_partitions)
+            if batch:
+                self._guarded(self._write_or_spill, batch)
+            self._guarded(self._replay_spill)
+            for waiter in waiters:
+                waiter.set()
+            if stop:
+                return
+
+    def _guarded(self, step, *args):
+        """Run one writer step; an unexpected error is logged instead of killing the thread"""
+        try:
+            step(*args)
+        except Exception as e:
+            print(f"Error in audit log writer: {str(e)}")
+            self._count('writer_errors')
+            self._last_error = time.monotonic()
+
+    def _ensure_partitions(self, force: bool = False):
+        """Create upcoming monthly partitions on start, then every partition_check_interval"""
+        now = time.monotonic()
+        if not force and self._partitions_checked is not None \
+                and now - self._partitions_checked < self.partition_check_interval:
+            return
+        self._partitions_checked = now
+        if self._partition_manager is None:
+            self._partition_manager = AuditLogPartitionManager(
+                self.engine_registry.get_engine(self.database_url)
+            )
+        created = self._partition_manager.ensure_future_partitions()
+        if created:
+            print(f"Created {created} audit log partitions")
+            self._count('partitions_created', created)
+
+    def _insert(self, events: List[Dict]):
+        values = []
+        params = {}
+        for i, event in enumerate(events):
+            values.append(f"(:user_id_hash_{i}, :action_type_{i}, :resource_type_{i}, :details_{i}, :timestamp_{i})")
+            params.update({
+                f'user_id_hash_{i}': event['user_id_hash'],
+                f'action_type_{i}': event['action_type'],
+                f'resource_type_{i}': event['resource_type'],
+                f'details_{i}': json.dumps(event['details'], default=str) if event['details'] else None,
+                f'timestamp_{i}': event['timestamp']
+            })
+        with self.engine_registry.connect(self.database_url) as conn:
+            conn.execute(
+                text(f"""
+                INSERT INTO security_audit_log
+                (user_id_hash, action_type, resource_type, details, timestamp)
+                VALUES {', '.join(values)}
+                """),
+                params
+            )
+            conn.commit()
+
+    def _write_or_spill(self, events: List[Dict], create_partitions: bool = True) -> bool:
+        """Write events; returns False only when the database is unreachable and they were spilled"""
+        started = time.perf_counter()
+        try:
+            self._insert(events)
+        except RETRYABLE_ERRORS as e:
+            print(f"Error writing audit log batch, spilling {len(events)} events: {str(e)}")
+            self._count('write_errors')
+            self._last_error = time.monotonic()
+            self._spill(events)
+            return False
+        except Exception as e:
+            if create_partitions and MISSING_PARTITION_ERROR in str(e):
+                # e.g. the process outlived its partitions; create them now and retry once
+                print(f"Error writing audit log batch, creating missing partitions: {str(e)}")
+                self._guarded(self._ensure_partitions, True)
+                return self._write_or_spill(events, create_partitions=False)
+            print(f"Error writing audit log batch, retrying {len(events)} events one at a time: {str(e)}")
+            self._count('write_errors')
+            return self._write_individually(events)
+        with self._stats_lock:
+            self._stats['written'] += len(events)
+            self._stats['batches'] += 1
+            self._stats['last_flush_ms'] = (time.perf_counter() - started) * 1000
+        return True
+
+    def _write_individually(self, events: List[Dict]) -> bool:
+        """Insert a rejected batch row by row, dead-lettering the rows the database refuses"""
+        for index, event in enumerate(events):
+            try:
+                self._insert([event])
+            except RETRYABLE_ERRORS as e:
+                print(f"Error writing audit log batch, spilling {len(events) - index} events: {str(e)}")
+                self._last_error = time.monotonic()
+                self._spill(events[index:])
+                return False
+            except Exception as e:
+                self._dead_letter([event], e)
+            else:
+                self._count('written')
+        return True
+
+    def _append_jsonl(self, path: str, records: List[Dict]):
+        with self._spill_lock:
+            fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT | _NOFOLLOW, 0o600)
+            with os.fdopen(fd, 'a', encoding='utf-8') as f:
+                for record in records:
+                    f.write(json.dumps(record, default=str) + '\n')
+
+    def _spill(self, events: List[Dict]):
+        """Append events to the JSONL spill file so they survive a database outage"""
+        self._append_jsonl(self.spill_path, events)
+        self._count('spilled', len(events))
+
+    def _dead_letter(self, events: List, error: Exception):
+        """Quarantine events that can never be written so they are not replayed forever"""
+        print(f"Error writing audit log event, moving {len(events)} to {self.dead_letter_path}: {str(error)}")
+        failed_at = datetime.utcnow().isoformat()
+        self._append_jsonl(self.dead_letter_path, [
+            {'event': event, 'error': str(error), 'failed_at': failed_at} for event in events
+        ])
+        self._count('dead_lettered', len(events))
+
+    def _replay_spill(self):
+        """Move spilled events back into the database once it is reachable again"""
+        replay_path = f"{self.spill_path}.{os.getpid()}.replay"
+        # A replay file left by an interrupted attempt is finished before claiming new spills
+        resuming = os.path.exists(replay_path)
+        if not resuming and not os.path.exists(self.spill_path):
+            return
+        if time.monotonic() - self._last_error < self.retry_interval:
+            return
+        if not resuming:
+            # Claim the file atomically so concurrent processes never replay the same events
+            with self._spill_lock:
+                try:
+                    os.replace(self.spill_path, replay_path)
+                except OSError:
+                    return
+
+        events = []
+        fd = os.open(replay_path, os.O_RDONLY | _NOFOLLOW)
+        with os.fdopen(fd, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    events.append(json.loads(line))
+                except ValueError as e:
+                    # e.g. a line torn by a crash mid-append
+                    self._dead_letter([line.rstrip('\n')], e)
+
+        for start in range(0, len(events), self.batch_size):
+            chunk = events[start:start + self.batch_size]
+            if not self._write_or_spill(chunk):
+                # Still down: the failed chunk was re-spilled, keep the rest with it
+                rest = events[start + self.batch_size:]
+                if rest:
+                    self._spill(rest)
+                break
+            self._count('replayed', len(chunk))
+        # Only now is every event either in the database or back in the spill file
+        os.remove(replay_path)
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Block until everything enqueued so far has been written or spilled"""
+        if self._closed:
+            return True
+        done = threading.Event()
+        self.queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout: float = 10.0):
+        """Flush remaining events and stop the writer thread (registered with atexit)"""
+        if self._closed:
+            return
+        self._closed = True
+        self.queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def get_stats(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['queue_depth'] = self.queue.qsize()
+        stats['queue_capacity'] = self.queue.maxsize
+        stats['spill_pending'] = os.path.exists(self.spill_path)
+        stats['dead_letter_pending'] = os.path.exists(self.dead_letter_path)
+        return stats
+
+
+_writers: Dict[str, AuditLogWriter] = {}
+_writers_lock = threading.Lock()
+
+
+def get_audit_writer(database_url: str) -> AuditLogWriter:
+    """Return the process-wide audit writer for a database URL"""
+    with _writers_lock:
+        writer = _writers.get(database_url)
+        if writer is None:
+            writer = AuditLogWriter(
+                database_url,
+                batch_size=int(os.getenv('AUDIT_BATCH_SIZE', '500')),
+                flush_interval=float(os.getenv('AUDIT_FLUSH_INTERVAL', '1.0')),
+                max_queue=int(os.getenv('AUDIT_MAX_QUEUE', '10000')),
+                spill_path=os.getenv('AUDIT_SPILL_PATH'),
+                dead_letter_path=os.getenv('AUDIT_DEAD_LETTER_PATH'),
+                partition_check_interval=float(os.getenv('AUDIT_PARTITION_CHECK_INTERVAL', '21600'))
+            )
+            _writers[database_url] = writer
+        return writer
@@ -0,0 +1,87 @@
+"""
+Partition maintenance for the monthly range-partitioned security_audit_log
+Creates partitions ahead of time and enforces retention by detaching and dropping whole months
+"""
+
+import os
+import re
+from datetime import date, datetime, timedelta
+from typing import Dict, List
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
+
+PARTITION_NAME = re.compile(r'^security_audit_log_(\d{4})_(\d{2})$')
+
+
+def _add_months(month_start: date, months: int) -> date:
+    index = month_start.year * 12 + month_start.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+class AuditLogPartitionManager:
+    """Keeps future audit log partitions in place and drops expired ones"""
+
+    def __init__(self, engine: Engine, months_ahead: int = None):
+        self.engine = engine
+        self.months_ahead = months_ahead if months_ahead is not None else int(
+            os.getenv('AUDIT_PARTITIONS_AHEAD', '3')
+        )
+
+    def ensure_future_partitions(self) -> int:
+        """Create any missing partitions from this month through months_ahead; returns how many"""
+        today = date.today()
+        with self.engine.connect() as conn:
+            created = conn.execute(
+                text("SELECT ensure_audit_log_partitions(:from_date, :to_date)"),
+                {'from_date': today, 'to_date': _add_months(today.replace(day=1), self.months_ahead)}
+            ).scalar()
+            conn.commit()
+        return created or 0
+
+    def list_partitions(self) -> List[Dict]:
+        """Monthly partitions with their [start, end) bounds, oldest first"""
+        with self.engine.connect() as conn:
+            rows = conn.execute(text("""
+                SELECT child.relname
+                FROM pg_inherits
+                JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+                JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+                WHERE parent.relname = 'security_audit_log'
+            """)).fetchall()
+
+        partitions = []
+        for (name,) in rows:
+            match = PARTITION_NAME.match(name)
+            if match:
+                start = date(int(match.group(1)), int(match.group(2)), 1)
+                partitions.append({'name': name, 'start': start, 'end': _add_months(start, 1)})
+        return sorted(partitions, key=lambda p: p['start'])
+
+    def drop_expired_partitions(self, retention_days: int) -> List[str]:
+        """Detach and drop every partition whose whole range is older than the retention window
+
+        Rows in the partition that straddles the cutoff are kept until that month fully expires.
+        """
+        cutoff = (datetime.utcnow() - timedelta(days=retention_days)).date()
+        dropped = []
+        for partition in self.list_partitions():
+            if partition['end'] > cutoff:
+                break
+            # Each partition in its own short transaction: a metadata change, not a row DELETE
+            with self.engine.connect() as conn:
+                conn.execute(text(f'ALTER TABLE security_audit_log DETACH PARTITION "{partition["name"]}"'))
+                conn.execute(text(f'DROP TABLE "{partition["name"]}"'))
+                conn.commit()
+            dropped.append(partition['name'])
+        return dropped
+
+    def maintain(self, retention_days: int) -> Dict:
+        """Create upcoming partitions and drop expired ones"""
+        try:
+            created = self.ensure_future_partitions()
+            dropped = self.drop_expired_partitions(retention_days)
+            return {'created': created, 'dropped': dropped}
+        except SQLAlchemyError as e:
+            print(f"Error maintaining audit log partitions: {str(e)}")
+            return {}
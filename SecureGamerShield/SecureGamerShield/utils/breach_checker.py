@@ -0,0 +1,167 @@
+"""
+Local breached-password checking backed by a memory-mapped Bloom filter
+The filter is built offline from a SHA-1 password-hash corpus and shared read-only through the page cache
+"""
+
+import os
+import sys
+import math
+import mmap
+import struct
+import hashlib
+import argparse
+import threading
+from typing import Optional, Iterable
+
+MAGIC = b'SGBLOOM1'
+HEADER = struct.Struct('<8sQIQ')  # magic, num_bits, num_hashes, num_items
+
+
+def _probe_seeds(sha1_digest: bytes) -> tuple:
+    """Split a SHA-1 digest into the two seeds used for double hashing"""
+    h1 = int.from_bytes(sha1_digest[0:8], 'little')
+    h2 = int.from_bytes(sha1_digest[8:16], 'little') | 1
+    return h1, h2
+
+
+def optimal_parameters(num_items: int, false_positive_rate: float) -> tuple:
+    """Return (num_bits, num_hashes) for the target false positive rate"""
+    num_items = max(1, num_items)
+    num_bits = math.ceil(-num_items * math.log(false_positive_rate) / (math.log(2) ** 2))
+    num_bits = (num_bits + 7) // 8 * 8
+    num_hashes = max(1, round(num_bits / num_items * math.log(2)))
+    return num_bits, num_hashes
+
+
+class BloomFilterBuilder:
+    """Builds a Bloom filter file from SHA-1 password hashes"""
+
+    def __init__(self, expected_items: int, false_positive_rate: float = 0.001):
+        self.num_bits, self.num_hashes = optimal_parameters(expected_items, false_positive_rate)
+        self.bits = bytearray(self.num_bits // 8)
+        self.num_items = 0
+
+    def add_digest(self, sha1_digest: bytes):
+        """Add one raw 20-byte SHA-1 digest"""
+        h1, h2 = _probe_seeds(sha1_digest)
+        bits = self.bits
+        num_bits = self.num_bits
+        for i in range(self.num_hashes):
+            index = (h1 + i * h2) % num_bits
+            bits[index >> 3] |= 1 << (index & 7)
+        self.num_items += 1
+
+    def add_password(self, password: str):
+        self.add_digest(hashlib.sha1(password.encode()).digest())
+
+    def add_corpus_lines(self, lines: Iterable[str], plaintext: bool = False):
+        """Add corpus lines in `SHA1HEX[:count]` form, or raw passwords when `plaintext` is set"""
+        for line in lines:
+            line = line.rstrip('\r\n')
+            if not line:
+                continue
+            if plaintext:
+                self.add_password(line)
+            else:
+                self.add_digest(bytes.fromhex(line.split(':', 1)[0].strip()))
+
+    def write(self, path: str):
+        """Write the filter atomically so running readers never see a partial file"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, self.num_bits, self.num_hashes, self.num_items))
+            f.write(self.bits)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+
+class BreachedPasswordChecker:
+    """Answers 'has this password appeared in a breach' from a read-only mmap'd Bloom filter"""
+
+    def __init__(self, filter_path: str):
+        self.filter_path = filter_path
+        with open(filter_path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self.num_bits, self.num_hashes, self.num_items = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            self._mmap.close()
+            raise ValueError(f"Not a breached-password filter: {filter_path}")
+        if len(self._mmap) < HEADER.size + self.num_bits // 8:
+            self._mmap.close()
+            raise ValueError(f"Truncated breached-password filter: {filter_path}")
+
+        self._offset = HEADER.size
+
+    def contains_digest(self, sha1_digest: bytes) -> bool:
+        """Check a raw SHA-1 digest; false positives are possible, false negatives are not"""
+        h1, h2 = _probe_seeds(sha1_digest)
+        data = self._mmap
+        offset = self._offset
+        num_bits = self.num_bits
+        for i in range(self.num_hashes):
+            index = (h1 + i * h2) % num_bits
+            if not data[offset + (index >> 3)] & (1 << (index & 7)):
+                return False
+        return True
+
+    def is_breached(self, password: str) -> bool:
+        """Return True when the password is (probably) in the breach corpus"""
+        return self.contains_digest(hashlib.sha1(password.encode()).digest())
+
+    def expected_false_positive_rate(self) -> float:
+        return (1 - math.exp(-self.num_hashes * self.num_items / self.num_bits)) ** self.num_hashes
+
+    def close(self):
+        self._mmap.close()
+
+
+_default_checker: Optional[BreachedPasswordChecker] = None
+_default_checker_loaded = False
+_default_checker_lock = threading.Lock()
+
+
+def get_default_breach_checker() -> Optional[BreachedPasswordChecker]:
+    """Return the process-wide checker for BREACHED_PASSWORD_FILTER, or None when not configured"""
+    global _default_checker, _default_checker_loaded
+    with _default_checker_lock:
+        if not _default_checker_loaded:
+            filter_path = os.getenv('BREACHED_PASSWORD_FILTER')
+            if filter_path and os.path.exists(filter_path):
+                _default_checker = BreachedPasswordChecker(filter_path)
+            _default_checker_loaded = True
+        return _default_checker
+
+
+def build_filter(corpus_path: str, output_path: str, false_positive_rate: float = 0.001,
+                 plaintext: bool = False) -> BloomFilterBuilder:
+    """Build a filter file from a corpus with one hash (or password) per line"""
+    with open(corpus_path, 'r', encoding='utf-8', errors='replace') as f:
+        expected_items = sum(1 for line in f if line.strip())
+
+    builder = BloomFilterBuilder(expected_items, false_positive_rate)
+    with open(corpus_path, 'r', encoding='utf-8', errors='replace') as f:
+        builder.add_corpus_lines(f, plaintext=plaintext)
+    builder.write(output_path)
+    return builder
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build a breached-password Bloom filter")
+    parser.add_argument('corpus', help="Corpus file with one SHA1HEX[:count] entry per line")
+    parser.add_argument('output', help="Path of the filter file to write")
+    parser.add_argument('--fp-rate', type=float, default=0.001, help="Target false positive rate")
+    parser.add_argument('--plaintext', action='store_true', help="Corpus contains raw passwords")
+    args = parser.parse_args(argv)
+
+    builder = build_filter(args.corpus, args.output, args.fp_rate, args.plaintext)
+    print(
+        f"Wrote {args.output}: {builder.num_items} entries, "
+        f"{builder.num_bits // 8} bytes, {builder.num_hashes} hashes"
+    )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
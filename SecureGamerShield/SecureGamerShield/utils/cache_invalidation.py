@@ -0,0 +1,157 @@
+"""
+Cross-replica query cache invalidation over Postgres LISTEN/NOTIFY
+Writers notify inside their transaction; every replica's listener thread evicts the affected users locally
+"""
+
+import os
+import json
+import time
+import uuid
+import select
+import threading
+from typing import Dict, Iterable, Iterator, Optional
+import psycopg2
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
+from utils.query_cache import QueryCache
+
+INVALIDATION_CHANNEL = 'securegamershield_cache_invalidation'
+
+# Identifies this process so a listener skips its own writes (already invalidated locally)
+PROCESS_ORIGIN = uuid.uuid4().hex
+
+# NOTIFY payloads must stay under 8000 bytes; 100 SHA-256 hex ids leave ample headroom
+USERS_PER_NOTIFICATION = 100
+
+
+def invalidation_payloads(table: str, user_id_hashes: Iterable[str]) -> Iterator[str]:
+    """JSON NOTIFY payloads naming the changed table and users, chunked to fit the size limit"""
+    users = sorted(set(user_id_hashes))
+    for start in range(0, len(users), USERS_PER_NOTIFICATION):
+        yield json.dumps({
+            'origin': PROCESS_ORIGIN,
+            'table': table,
+            'users': users[start:start + USERS_PER_NOTIFICATION],
+            'sent_at': time.time()
+        })
+
+
+class InvalidationListener:
+    """Background thread that LISTENs on a dedicated connection and evicts notified users"""
+
+    def __init__(self, engine: Engine, cache: QueryCache, channel: str = INVALIDATION_CHANNEL,
+                 poll_timeout: float = 1.0, reconnect_interval: float = 5.0):
+        self.engine = engine
+        self.cache = cache
+        self.channel = channel
+        self.poll_timeout = poll_timeout
+        self.reconnect_interval = reconnect_interval
+        self._stop = threading.Event()
+        self._listening = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._stats = {'notifications': 0, 'evictions': 0, 'own_skipped': 0, 'connects': 0,
+                       'errors': 0, 'total_lag_ms': 0.0, 'max_lag_ms': 0.0}
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='cache-invalidation-listener', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def wait_until_listening(self, timeout: float = None) -> bool:
+        return self._listening.wait(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._listen()
+            except (psycopg2.Error, SQLAlchemyError, OSError) as e:
+                print(f"Error in cache invalidation listener, reconnecting: {str(e)}")
+                with self._lock:
+                    self._stats['errors'] += 1
+            self._stop.wait(self.reconnect_interval)
+
+    def _listen(self):
+        # A detached connection: LISTEN needs it for the thread's lifetime, not a pool slot
+        connection = self.engine.raw_connection()
+        connection.detach()
+        try:
+            dbapi_connection = connection.dbapi_connection
+            dbapi_connection.autocommit = True
+            with dbapi_connection.cursor() as cursor:
+                cursor.execute(f'LISTEN "{self.channel}"')
+
+            with self._lock:
+                self._stats['connects'] += 1
+                reconnected = self._stats['connects'] > 1
+            if reconnected:
+                # Notifications sent while disconnected are lost; drop everything cached, shared included
+                self.cache.clear()
+            self._listening.set()
+
+            while not self._stop.is_set():
+                readable, _, _ = select.select([dbapi_connection], [], [], self.poll_timeout)
+                if not readable:
+                    continue
+                dbapi_connection.poll()
+                while dbapi_connection.notifies:
+                    self._handle(dbapi_connection.notifies.pop(0).payload)
+        finally:
+            self._listening.clear()
+            connection.close()
+
+    def _handle(self, payload: str):
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            return
+        if message.get('origin') == PROCESS_ORIGIN:
+            with self._lock:
+                self._stats['own_skipped'] += 1
+            return
+
+        users = message.get('users', [])
+        for user_id_hash in users:
+            self.cache.invalidate_remote_write(user_id_hash)
+
+        lag_ms = max(0.0, (time.time() - message.get('sent_at', time.time())) * 1000)
+        with self._lock:
+            self._stats['notifications'] += 1
+            self._stats['evictions'] += len(users)
+            self._stats['total_lag_ms'] += lag_ms
+            self._stats['max_lag_ms'] = max(self._stats['max_lag_ms'], lag_ms)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        total_lag = stats.pop('total_lag_ms')
+        stats['avg_lag_ms'] = total_lag / stats['notifications'] if stats['notifications'] else 0.0
+        stats['listening'] = self._listening.is_set()
+        return stats
+
+
+_listeners: Dict[str, InvalidationListener] = {}
+_listeners_lock = threading.Lock()
+
+
+def get_invalidation_listener(database_url: str, engine: Engine, cache: QueryCache) -> Optional[InvalidationListener]:
+    """Start (once per URL) the process-wide listener; None when CACHE_INVALIDATION_LISTENER=false"""
+    if os.getenv('CACHE_INVALIDATION_LISTENER', 'true').lower() == 'false':
+        return None
+    with _listeners_lock:
+        listener = _listeners.get(database_url)
+        if listener is None:
+            listener = InvalidationListener(
+                engine, cache,
+                poll_timeout=float(os.getenv('CACHE_INVALIDATION_POLL_TIMEOUT', '1.0'))
+            )
+            listener.start()
+            _listeners[database_url] = listener
+        return listener
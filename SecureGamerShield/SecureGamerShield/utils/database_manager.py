@@ -4,124 +4,327 @@ Uses PostgreSQL with proper security measures
 """
 
 import os
+import io
+import sys
+import argparse
+import base64
+import hashlib
+import csv
 import json
+import itertools
 from datetime import datetime
-from typing import Optional, Dict, List
+from typing import Optional, Dict, Iterable, Iterator, List
 import sqlalchemy as sa
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
+import psycopg2
 import pandas as pd
+from utils.db_engine import EngineRegistry, get_engine_registry
+from utils.db_migrations import MigrationError, SchemaMigrator, ensure_schema
+from utils.audit_logger import get_audit_writer
+from utils.audit_partitions import AuditLogPartitionManager
+from utils.retention import RetentionEngine
+from utils.db_stats import get_stats_service
+from utils.query_cache import QueryCache, get_query_cache
+from utils.cache_invalidation import INVALIDATION_CHANNEL, invalidation_payloads, get_invalidation_listener
+
+# Envelope key -> BYTEA column; the remaining envelope keys go to payload_metadata
+ENVELOPE_BINARY_COLUMNS = {'ciphertext': 'ciphertext', 'salt': 'kdf_salt', 'iv': 'iv', 'tag': 'auth_tag'}
+ENVELOPE_TYPED_KEYS = ('ciphertext', 'salt', 'iv', 'tag', 'algorithm', 'timestamp')
+
+# Cold envelope columns live in game_data_content; the pointer row keeps only hot metadata
+CONTENT_COLUMNS = ('ciphertext', 'kdf_salt', 'iv', 'auth_tag', 'algorithm', 'encrypted_at', 'payload_metadata')
+POINTER_COLUMNS = ('content_hash', 'encryption_metadata', 'data_hash')
+PAYLOAD_COLUMNS = CONTENT_COLUMNS + POINTER_COLUMNS
+
+# Envelope read from the content row, falling back to pointer rows not yet moved by migrate_payload_storage
+ENVELOPE_SELECT_COLUMNS = f"""
+    e.id, e.game_name, {', '.join(f'COALESCE(c.{col}, e.{col})' for col in CONTENT_COLUMNS)},
+    e.encrypted_payload, e.encryption_metadata, e.data_hash, e.created_at, e.updated_at
+"""
+
+# Bind parameters that need a type before they reach a VALUES list
+PARAM_CASTS = {'encrypted_at': 'TIMESTAMP', 'payload_metadata': 'JSONB', 'encryption_metadata': 'JSONB'}
+
+# Pointer-row ON CONFLICT assignments; none of these columns is indexed, so updates can stay HOT.
+# Rows written before the content table existed drop their inline payload when first rewritten.
+POINTER_UPSERT_ASSIGNMENTS = """
+    content_hash = EXCLUDED.content_hash,
+    encryption_metadata = EXCLUDED.encryption_metadata,
+    data_hash = EXCLUDED.data_hash,
+    ciphertext = NULL,
+    kdf_salt = NULL,
+    iv = NULL,
+    auth_tag = NULL,
+    algorithm = NULL,
+    encrypted_at = NULL,
+    payload_metadata = NULL,
+    encrypted_payload = NULL,
+"""
+
+# How stale last_seen_at may get before an unchanged upsert refreshes it; retention works in days
+LAST_SEEN_RESOLUTION = '1 day'
+
+# Session-local staging table for bulk ingestion; rows vanish at each commit
+BULK_STAGING_TABLE_SQL = """
+    CREATE TEMP TABLE IF NOT EXISTS encrypted_game_data_staging (
+        user_id_hash VARCHAR(64) NOT NULL,
+        game_name VARCHAR(100) NOT NULL,
+        ciphertext BYTEA NOT NULL,
+        kdf_salt BYTEA NOT NULL,
+        iv BYTEA NOT NULL,
+        auth_tag BYTEA NOT NULL,
+        algorithm VARCHAR(32),
+        encrypted_at TIMESTAMP,
+        payload_metadata JSONB,
+        content_hash VARCHAR(64) NOT NULL,
+        encryption_metadata JSONB NOT NULL,
+        data_hash VARCHAR(64) NOT NULL
+    ) ON COMMIT DELETE ROWS
+"""
+
+BULK_COPY_SQL = f"""
+    COPY encrypted_game_data_staging
+    (user_id_hash, game_name, {', '.join(PAYLOAD_COLUMNS)})
+    FROM STDIN WITH (FORMAT csv)
+"""
+
+
+def _merge_sql(source: str, updated_at_param: str) -> str:
+    """CTEs writing content rows and pointer upserts for every row of `source`
+    
+    Content is inserted only for rows whose data_hash differs from the stored pointer, so an
+    unchanged payload is never rewritten, and identical ciphertext is stored once. Reusing an
+    existing content row refreshes its created_at (and row-locks it), so purge_orphaned_content's
+    grace period cannot delete it under the new pointer. Unchanged rows only get last_seen_at
+    refreshed, at most once per LAST_SEEN_RESOLUTION, which retention measures expiry from.
+    """
+    return f"""
+        content AS (
+            INSERT INTO game_data_content (content_hash, {', '.join(CONTENT_COLUMNS)})
+            SELECT DISTINCT ON (s.content_hash) s.content_hash, {', '.join('s.' + c for c in CONTENT_COLUMNS)}
+            FROM {source} s
+            WHERE NOT EXISTS (
+                SELECT 1 FROM encrypted_game_data e
+                WHERE e.user_id_hash = s.user_id_hash
+                  AND e.game_name = s.game_name
+                  AND e.data_hash = s.data_hash
+            )
+            ON CONFLICT (content_hash) DO UPDATE SET created_at = CURRENT_TIMESTAMP
+        ),
+        merged AS (
+            INSERT INTO encrypted_game_data
+            (user_id_hash, game_name, {', '.join(POINTER_COLUMNS)})
+            SELECT user_id_hash, game_name, {', '.join(POINTER_COLUMNS)}
+            FROM {source}
+            ON CONFLICT (user_id_hash, game_name) DO UPDATE SET
+                {POINTER_UPSERT_ASSIGNMENTS}
+                updated_at = {updated_at_param},
+                last_seen_at = {updated_at_param}
+            WHERE encrypted_game_data.data_hash IS DISTINCT FROM EXCLUDED.data_hash
+            RETURNING (xmax = 0) AS inserted
+        ),
+        seen AS (
+            UPDATE encrypted_game_data e
+            SET last_seen_at = {updated_at_param}
+            FROM {source} s
+            WHERE e.user_id_hash = s.user_id_hash
+              AND e.game_name = s.game_name
+              AND e.data_hash = s.data_hash
+              AND (e.last_seen_at IS NULL
+                   OR e.last_seen_at < {updated_at_param} - INTERVAL '{LAST_SEEN_RESOLUTION}')
+        )
+    """
+
+
+def _values_merge_sql(row_count: int) -> str:
+    """Merge statement over `row_count` sets of suffixed bind parameters (:column_0, :column_1, ...)"""
+    columns = ('user_id_hash', 'game_name') + PAYLOAD_COLUMNS
+    rows = []
+    for i in range(row_count):
+        values = [
+            f"CAST(:{c}_{i} AS {PARAM_CASTS[c]})" if c in PARAM_CASTS else f":{c}_{i}"
+            for c in columns
+        ]
+        rows.append(f"({', '.join(values)})")
+    return f"""
+        WITH incoming ({', '.join(columns)}) AS (VALUES {', '.join(rows)}),
+        {_merge_sql('incoming', ':updated_at')}
+        SELECT inserted FROM merged
+    """
+
+
+BULK_MERGE_SQL = f"""
+    WITH {_merge_sql('encrypted_game_data_staging', '%(updated_at)s')}
+    SELECT COUNT(*) FILTER (WHERE inserted), COUNT(*) FILTER (WHERE NOT inserted) FROM merged
+"""
+
+
+def _to_bytes(value) -> bytes:
+    """Raw bytes from an envelope value that may already be bytes or base64 text"""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value)
+    return base64.b64decode(value)
+
+
+def _json_value(value):
+    """psycopg2 decodes JSONB itself; TEXT columns still need json.loads"""
+    if value is None or isinstance(value, (dict, list)):
+        return value
+    return json.loads(value)
+
+
+def _payload_params(encrypted_data: dict, data_hash: str) -> Dict:
+    """Split an encryption envelope into typed column values"""
+    params = {column: _to_bytes(encrypted_data[key]) for key, column in ENVELOPE_BINARY_COLUMNS.items()}
+    params.update({
+        # Content address of the cold row; matches encode(sha256(ciphertext), 'hex') in SQL
+        'content_hash': hashlib.sha256(params['ciphertext']).hexdigest(),
+        'algorithm': encrypted_data.get('algorithm'),
+        'encrypted_at': encrypted_data.get('timestamp'),
+        'payload_metadata': json.dumps(
+            {key: value for key, value in encrypted_data.items() if key not in ENVELOPE_TYPED_KEYS},
+            default=str
+        ),
+        'encryption_metadata': json.dumps(encrypted_data.get('security_info', {})),
+        'data_hash': data_hash
+    })
+    return params
+
+
+def _envelope_from_columns(ciphertext, kdf_salt, iv, auth_tag, algorithm, encrypted_at,
+                           payload_metadata, legacy_payload) -> dict:
+    """Rebuild the encryption envelope; ciphertext fields stay raw bytes"""
+    if ciphertext is None:
+        # Not yet converted by the online payload migration
+        return _json_value(legacy_payload) or {}
+    envelope = dict(_json_value(payload_metadata) or {})
+    envelope.update({
+        'ciphertext': bytes(ciphertext),
+        'salt': bytes(kdf_salt),
+        'iv': bytes(iv),
+        'tag': bytes(auth_tag),
+        'algorithm': algorithm,
+        'timestamp': encrypted_at.isoformat() if encrypted_at else None
+    })
+    return envelope
+
+
+def _encode_cursor(updated_at: datetime, record_id: int) -> str:
+    """Opaque keyset cursor for the (updated_at, id) position of the last row on a page"""
+    position = json.dumps([updated_at.isoformat(), record_id]).encode()
+    return base64.urlsafe_b64encode(position).decode().rstrip('=')
+
+
+def _decode_cursor(cursor: str):
+    """Inverse of _encode_cursor; raises ValueError on a malformed cursor"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        updated_at, record_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(updated_at), int(record_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid page cursor: {cursor!r}") from e
+
+
+def _game_data_from_row(row) -> Dict:
+    """Record dict for a row selected with ENVELOPE_SELECT_COLUMNS"""
+    return {
+        'id': row[0],
+        'game_name': row[1],
+        'encrypted_payload': _envelope_from_columns(*row[2:10]),
+        'encryption_metadata': _json_value(row[10]) or {},
+        'data_hash': row[11],
+        'created_at': row[12],
+        'updated_at': row[13]
+    }
+
+
+def _batched(records: Iterable[Dict], batch_size: int) -> Iterator[List[Dict]]:
+    """Yield lists of up to batch_size records without materializing the whole iterable"""
+    iterator = iter(records)
+    while True:
+        batch = list(itertools.islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def _records_to_csv(records: Iterable[Dict]) -> io.StringIO:
+    """Encode records as the CSV stream COPY expects (BYTEA in hex format)"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for record in records:
+        params = _payload_params(record['encrypted_data'], record['data_hash'])
+        row = [record['user_id_hash'], record['game_name']]
+        for column in PAYLOAD_COLUMNS:
+            value = params[column]
+            row.append('\\x' + value.hex() if isinstance(value, bytes) else value)
+        writer.writerow(row)
+    buffer.seek(0)
+    return buffer
+
 
 class SecureGameDataDB:
     """Manages secure database operations for encrypted game data"""
     
-    def __init__(self):
+    def __init__(self, engine_registry: EngineRegistry = None, query_cache: QueryCache = None):
         self.database_url = os.getenv('DATABASE_URL')
         if not self.database_url:
             raise ValueError("DATABASE_URL environment variable not set")
         
-        self.engine = create_engine(self.database_url)
-        self._initialize_tables()
+        # Engines and their pools are shared process-wide; the schema check runs once per URL
+        self.engine_registry = engine_registry or get_engine_registry()
+        self.engine = self.engine_registry.get_engine(self.database_url)
+        self.engine_registry.run_once(self.database_url, self._ensure_schema)
+        self.audit_writer = get_audit_writer(self.database_url)
+        # User-scoped reads go through the cache; store_* writes invalidate the user's entries
+        self.query_cache = query_cache or get_query_cache()
+        # Evicts users written by other replicas, announced over LISTEN/NOTIFY
+        self.invalidation_listener = get_invalidation_listener(self.database_url, self.engine, self.query_cache)
+        self.stats_service = get_stats_service(self.database_url, self.engine)
     
-    def _initialize_tables(self):
-        """Create necessary tables for secure data storage"""
-        
-        # Create tables for encrypted game data storage
-        create_tables_sql = """
-        -- Users table for authentication and user management
-        CREATE TABLE IF NOT EXISTS users (
-            id SERIAL PRIMARY KEY,
-            user_id_hash VARCHAR(64) UNIQUE NOT NULL,
-            username VARCHAR(100) NOT NULL,
-            email_hash VARCHAR(64),
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            last_login TIMESTAMP,
-            privacy_score INTEGER DEFAULT 0,
-            account_status VARCHAR(20) DEFAULT 'active'
-        );
-        
-        -- Encrypted game data storage
-        CREATE TABLE IF NOT EXISTS encrypted_game_data (
-            id SERIAL PRIMARY KEY,
-            user_id_hash VARCHAR(64) NOT NULL,
-            game_name VARCHAR(100) NOT NULL,
-            encrypted_payload TEXT NOT NULL,
-            encryption_metadata JSONB NOT NULL,
-            data_hash VARCHAR(64) NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            encryption_version VARCHAR(10) DEFAULT '1.0',
-            FOREIGN KEY (user_id_hash) REFERENCES users(user_id_hash)
-        );
-        
-        -- Privacy assessment results
-        CREATE TABLE IF NOT EXISTS privacy_assessments (
-            id SERIAL PRIMARY KEY,
-            user_id_hash VARCHAR(64) NOT NULL,
-            assessment_data JSONB NOT NULL,
-            risk_score INTEGER NOT NULL,
-            risk_level VARCHAR(20) NOT NULL,
-            recommendations JSONB,
-            completed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id_hash) REFERENCES users(user_id_hash)
-        );
-        
-        -- User privacy settings and preferences
-        CREATE TABLE IF NOT EXISTS privacy_settings (
-            id SERIAL PRIMARY KEY,
-            user_id_hash VARCHAR(64) UNIQUE NOT NULL,
-            settings_data JSONB NOT NULL,
-            encryption_preferences JSONB,
-            data_retention_days INTEGER DEFAULT 365,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id_hash) REFERENCES users(user_id_hash)
-        );
-        
-        -- Security audit log
-        CREATE TABLE IF NOT EXISTS security_audit_log (
-            id SERIAL PRIMARY KEY,
-            user_id_hash VARCHAR(64),
-            action_type VARCHAR(50) NOT NULL,
-            resource_type VARCHAR(50),
-            resource_id VARCHAR(100),
-            details JSONB,
-            ip_address INET,
-            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            success BOOLEAN DEFAULT TRUE
-        );
-        
-        -- Education progress tracking
-        CREATE TABLE IF NOT EXISTS education_progress (
-            id SERIAL PRIMARY KEY,
-            user_id_hash VARCHAR(64) NOT NULL,
-            module_name VARCHAR(100) NOT NULL,
-            completion_status VARCHAR(20) DEFAULT 'in_progress',
-            quiz_score INTEGER,
-            completed_at TIMESTAMP,
-            time_spent_minutes INTEGER,
-            FOREIGN KEY (user_id_hash) REFERENCES users(user_id_hash),
-            UNIQUE(user_id_hash, module_name)
-        );
-        
-        -- Create indexes for better performance
-        CREATE INDEX IF NOT EXISTS idx_users_user_id_hash ON users(user_id_hash);
-        CREATE INDEX IF NOT EXISTS idx_encrypted_game_data_user_game ON encrypted_game_data(user_id_hash, game_name);
-        CREATE INDEX IF NOT EXISTS idx_privacy_assessments_user ON privacy_assessments(user_id_hash);
-        CREATE INDEX IF NOT EXISTS idx_security_audit_log_user_timestamp ON security_audit_log(user_id_hash, timestamp);
-        CREATE INDEX IF NOT EXISTS idx_education_progress_user ON education_progress(user_id_hash);
-        """
-        
+    def _connect(self):
+        """Check out a pooled connection with wait-time metrics"""
+        return self.engine_registry.connect(self.database_url)
+    
+    def get_pool_metrics(self) -> Dict[str, dict]:
+        """Connection pool checkout and wait metrics for every shared engine"""
+        return self.engine_registry.get_metrics()
+    
+    def _ensure_schema(self, engine=None):
+        """Bring the schema up to date through versioned migrations (see utils/db_migrations.py)"""
         try:
-            with self.engine.connect() as conn:
-                conn.execute(text(create_tables_sql))
-                conn.commit()
-        except SQLAlchemyError as e:
+            applied = ensure_schema(engine or self.engine)
+            if applied:
+                print(f"Applied database migrations: {applied}")
+            AuditLogPartitionManager(engine or self.engine).ensure_future_partitions()
+        except (SQLAlchemyError, MigrationError) as e:
             raise Exception(f"Failed to initialize database tables: {str(e)}")
     
+    def get_cache_metrics(self) -> dict:
+        """Query cache hit rate, size and invalidation counters, plus invalidation listener lag"""
+        stats = self.query_cache.get_stats()
+        if self.invalidation_listener is not None:
+            stats.update({f'listener_{k}': v for k, v in self.invalidation_listener.get_stats().items()})
+        return stats
+    
+    def _publish_invalidation(self, conn, table: str, user_id_hashes: Iterable[str]):
+        """NOTIFY other replicas inside the write's transaction; delivered only if it commits"""
+        for payload in invalidation_payloads(table, user_id_hashes):
+            conn.execute(
+                text("SELECT pg_notify(:channel, :payload)"),
+                {'channel': INVALIDATION_CHANNEL, 'payload': payload}
+            )
+    
+    def get_schema_version(self) -> Optional[int]:
+        """Newest applied migration version"""
+        current = SchemaMigrator(self.engine).current_version()
+        return current['version'] if current else None
+    
     def create_user(self, user_id_hash: str, username: str, email_hash: str = "") -> bool:
         """Create a new user record"""
         try:
-            with self.engine.connect() as conn:
+            with self._connect() as conn:
                 result = conn.execute(
                     text("""
                     INSERT INTO users (user_id_hash, username, email_hash, last_login)
@@ -145,106 +348,493 @@ class SecureGameDataDB:
     def store_encrypted_game_data(self, user_id_hash: str, game_name: str, 
                                  encrypted_data: dict, data_hash: str) -> bool:
         """Store encrypted game data securely"""
+        return self.upsert_encrypted_game_data(user_id_hash, game_name, encrypted_data, data_hash) is not None
+    
+    def upsert_encrypted_game_data(self, user_id_hash: str, game_name: str,
+                                   encrypted_data: dict, data_hash: str) -> Optional[str]:
+        """Insert or update a record in one round trip
+        
+        Returns 'inserted', 'updated', or 'unchanged' when the stored data_hash already matches
+        (the payload write is skipped; only last_seen_at may be refreshed), and None on error. The ciphertext goes to game_data_content and only
+        the small pointer row is updated.
+        """
+        params = {'user_id_hash_0': user_id_hash, 'game_name_0': game_name, 'updated_at': datetime.utcnow()}
+        for column, value in _payload_params(encrypted_data, data_hash).items():
+            params[f'{column}_0'] = value
+        
         try:
-            with self.engine.connect() as conn:
-                # Check if data already exists for this user and game
-                existing = conn.execute(
-                    text("SELECT id FROM encrypted_game_data WHERE user_id_hash = :user_id_hash AND game_name = :game_name"),
-                    {'user_id_hash': user_id_hash, 'game_name': game_name}
-                ).fetchone()
-                
-                if existing:
-                    # Update existing record
-                    conn.execute(
-                        text("""
-                        UPDATE encrypted_game_data 
-                        SET encrypted_payload = :payload,
-                            encryption_metadata = :metadata,
-                            data_hash = :data_hash,
-                            updated_at = :updated_at
-                        WHERE user_id_hash = :user_id_hash AND game_name = :game_name
-                        """),
-                        {
-                            'payload': json.dumps(encrypted_data),
-                            'metadata': json.dumps(encrypted_data.get('security_info', {})),
-                            'data_hash': data_hash,
-                            'updated_at': datetime.utcnow(),
-                            'user_id_hash': user_id_hash,
-                            'game_name': game_name
-                        }
-                    )
-                else:
-                    # Insert new record
-                    conn.execute(
-                        text("""
-                        INSERT INTO encrypted_game_data 
-                        (user_id_hash, game_name, encrypted_payload, encryption_metadata, data_hash)
-                        VALUES (:user_id_hash, :game_name, :payload, :metadata, :data_hash)
-                        """),
-                        {
-                            'user_id_hash': user_id_hash,
-                            'game_name': game_name,
-                            'payload': json.dumps(encrypted_data),
-                            'metadata': json.dumps(encrypted_data.get('security_info', {})),
-                            'data_hash': data_hash
-                        }
-                    )
-                
+            with self._connect() as conn:
+                row = conn.execute(text(_values_merge_sql(1)), params).fetchone()
+                if row is not None:
+                    self._publish_invalidation(conn, 'encrypted_game_data', [user_id_hash])
                 conn.commit()
-                return True
+                if row is None:
+                    return 'unchanged'
+                self.query_cache.invalidate_user(user_id_hash)
+                return 'inserted' if row[0] else 'updated'
         except SQLAlchemyError as e:
             print(f"Error storing encrypted game data: {str(e)}")
+            return None
+    
+    def store_encrypted_game_data_batch(self, records: List[Dict]) -> bool:
+        """Store several encrypted game records in one statement and one transaction
+        
+        Each record needs user_id_hash, game_name, encrypted_data and data_hash. Records whose
+        data_hash matches the stored row are not rewritten.
+        """
+        if not records:
+            return True
+        
+        # ON CONFLICT cannot touch the same row twice in one statement; the last record wins
+        unique_records = {(r['user_id_hash'], r['game_name']): r for r in records}
+        
+        params = {'updated_at': datetime.utcnow()}
+        for i, record in enumerate(unique_records.values()):
+            params[f'user_id_hash_{i}'] = record['user_id_hash']
+            params[f'game_name_{i}'] = record['game_name']
+            for column, value in _payload_params(record['encrypted_data'], record['data_hash']).items():
+                params[f'{column}_{i}'] = value
+        
+        try:
+            with self._connect() as conn:
+                conn.execute(text(_values_merge_sql(len(unique_records))), params)
+                self._publish_invalidation(conn, 'encrypted_game_data', (key[0] for key in unique_records))
+                conn.commit()
+            for user_id_hash in {key[0] for key in unique_records}:
+                self.query_cache.invalidate_user(user_id_hash)
+            return True
+        except SQLAlchemyError as e:
+            print(f"Error storing encrypted game data batch: {str(e)}")
             return False
     
+    def store_encrypted_game_data_bulk(self, records: Iterable[Dict], batch_size: int = None) -> Dict:
+        """Stream many encrypted records through COPY into a staging table and merge them
+        
+        Each record needs user_id_hash, game_name, encrypted_data and data_hash, and its user must
+        already exist. Every batch is one COPY plus one upsert in its own short transaction, so an
+        interrupted import keeps the batches already committed.
+        """
+        batch_size = batch_size or int(os.getenv('BULK_INGEST_BATCH_SIZE', '10000'))
+        stats = {'rows': 0, 'inserted': 0, 'updated': 0, 'unchanged': 0, 'batches': 0, 'success': True}
+        
+        try:
+            with self._connect() as conn:
+                dbapi_connection = conn.connection.dbapi_connection
+                try:
+                    with dbapi_connection.cursor() as cursor:
+                        cursor.execute(BULK_STAGING_TABLE_SQL)
+                        dbapi_connection.commit()
+                        for batch in _batched(records, batch_size):
+                            # ON CONFLICT cannot touch a row twice per statement; the last record wins
+                            unique_batch = {(r['user_id_hash'], r['game_name']): r for r in batch}
+                            cursor.copy_expert(BULK_COPY_SQL, _records_to_csv(unique_batch.values()))
+                            cursor.execute(BULK_MERGE_SQL, {'updated_at': datetime.utcnow()})
+                            inserted, updated = cursor.fetchone()
+                            for payload in invalidation_payloads(
+                                'encrypted_game_data', (key[0] for key in unique_batch)
+                            ):
+                                cursor.execute("SELECT pg_notify(%s, %s)", (INVALIDATION_CHANNEL, payload))
+                            dbapi_connection.commit()
+                            for user_id_hash in {key[0] for key in unique_batch}:
+                                self.query_cache.invalidate_user(user_id_hash)
+                            
+                            stats['rows'] += len(batch)
+                            stats['inserted'] += inserted
+                            stats['updated'] += updated
+                            stats['unchanged'] += len(unique_batch) - inserted - updated
+                            stats['batches'] += 1
+                except psycopg2.Error:
+                    dbapi_connection.rollback()
+                    raise
+        except (SQLAlchemyError, psycopg2.Error) as e:
+            print(f"Error bulk storing encrypted game data: {str(e)}")
+            stats['success'] = False
+            stats['error'] = str(e)
+        return stats
+    
     def retrieve_encrypted_game_data(self, user_id_hash: str, game_name: str = None) -> List[Dict]:
-        """Retrieve encrypted game data for a user"""
+        """Retrieve encrypted game data for a user (read-through cached)"""
         try:
-            with self.engine.connect() as conn:
-                if game_name:
-                    # Get specific game data
-                    result = conn.execute(
-                        text("""
-                        SELECT game_name, encrypted_payload, encryption_metadata, 
-                               data_hash, created_at, updated_at
-                        FROM encrypted_game_data 
-                        WHERE user_id_hash = :user_id_hash AND game_name = :game_name
+            return self.query_cache.get_or_load(
+                'game_data', user_id_hash, (game_name,),
+                lambda: self._load_encrypted_game_data(user_id_hash, game_name)
+            )
+        except SQLAlchemyError as e:
+            print(f"Error retrieving encrypted game data: {str(e)}")
+            return []
+    
+    def _load_encrypted_game_data(self, user_id_hash: str, game_name: str = None) -> List[Dict]:
+        # Loaders raise instead of returning [] so database errors are never cached
+        with self._connect() as conn:
+            if game_name:
+                # Get specific game data
+                result = conn.execute(
+                    text(f"""
+                    SELECT {ENVELOPE_SELECT_COLUMNS}
+                    FROM encrypted_game_data e
+                    LEFT JOIN game_data_content c ON c.content_hash = e.content_hash
+                    WHERE e.user_id_hash = :user_id_hash AND e.game_name = :game_name
+                    """),
+                    {'user_id_hash': user_id_hash, 'game_name': game_name}
+                )
+            else:
+                # Get all game data for user
+                result = conn.execute(
+                    text(f"""
+                    SELECT {ENVELOPE_SELECT_COLUMNS}
+                    FROM encrypted_game_data e
+                    LEFT JOIN game_data_content c ON c.content_hash = e.content_hash
+                    WHERE e.user_id_hash = :user_id_hash
+                    ORDER BY e.updated_at DESC
+                    """),
+                    {'user_id_hash': user_id_hash}
+                )
+            
+            return [_game_data_from_row(row) for row in result.fetchall()]
+    
+    def list_game_data(self, user_id_hash: str, limit: int = 50, cursor: str = None) -> Dict:
+        """One page of a user's games without any ciphertext, newest first (read-through cached)
+        
+        Returns {'items': [...], 'next_cursor': str or None}; pass next_cursor back to get the
+        following page. Items carry the record id for get_game_data_by_id().
+        """
+        after = _decode_cursor(cursor) if cursor else None
+        try:
+            return self.query_cache.get_or_load(
+                'game_list', user_id_hash, (limit, cursor),
+                lambda: self._load_game_data_page(user_id_hash, limit, after)
+            )
+        except SQLAlchemyError as e:
+            print(f"Error listing game data: {str(e)}")
+            return {'items': [], 'next_cursor': None}
+    
+    def _load_game_data_page(self, user_id_hash: str, limit: int, after) -> Dict:
+        # One extra row tells whether another page exists
+        params = {'user_id_hash': user_id_hash, 'limit': limit + 1}
+        if after:
+            params.update({'after_updated_at': after[0], 'after_id': after[1]})
+        with self._connect() as conn:
+            # octet_length reads the TOAST header only, so sizes never pull the ciphertext
+            rows = conn.execute(
+                text(f"""
+                SELECT e.id, e.game_name, e.data_hash, e.created_at, e.updated_at,
+                       octet_length(COALESCE(c.ciphertext, e.ciphertext)),
+                       octet_length(e.encrypted_payload)
+                FROM encrypted_game_data e
+                LEFT JOIN game_data_content c ON c.content_hash = e.content_hash
+                WHERE e.user_id_hash = :user_id_hash
+                {'AND (e.updated_at, e.id) < (:after_updated_at, :after_id)' if after else ''}
+                ORDER BY e.updated_at DESC, e.id DESC
+                LIMIT :limit
+                """),
+                params
+            ).fetchall()
+        
+        page = rows[:limit]
+        items = [
+            {
+                'id': row[0],
+                'game_name': row[1],
+                'data_hash': row[2],
+                'created_at': row[3],
+                'updated_at': row[4],
+                'ciphertext_bytes': row[5],
+                'legacy_payload_bytes': row[6]
+            }
+            for row in page
+        ]
+        next_cursor = _encode_cursor(page[-1][4], page[-1][0]) if len(rows) > limit else None
+        return {'items': items, 'next_cursor': next_cursor}
+    
+    def get_game_data_by_id(self, user_id_hash: str, record_id: int) -> Optional[Dict]:
+        """Fetch one record's payload by the id from list_game_data(), scoped to its owner"""
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    text(f"""
+                    SELECT {ENVELOPE_SELECT_COLUMNS}
+                    FROM encrypted_game_data e
+                    LEFT JOIN game_data_content c ON c.content_hash = e.content_hash
+                    WHERE e.id = :record_id AND e.user_id_hash = :user_id_hash
+                    """),
+                    {'record_id': record_id, 'user_id_hash': user_id_hash}
+                ).fetchone()
+                return _game_data_from_row(row) if row is not None else None
+        except SQLAlchemyError as e:
+            print(f"Error fetching encrypted game data: {str(e)}")
+            return None
+    
+    def _stream(self, sql: str, params: Dict, fetch_size: int = None) -> Iterator:
+        """Yield rows from a server-side (named) cursor, fetch_size rows per round trip
+        
+        The pooled connection stays checked out until the generator is exhausted or closed.
+        """
+        fetch_size = fetch_size or int(os.getenv('DB_STREAM_FETCH_SIZE', '1000'))
+        with self._connect() as conn:
+            # yield_per implies stream_results: psycopg2 declares a named cursor and fetches in chunks
+            result = conn.execute(text(sql).execution_options(yield_per=fetch_size), params)
+            try:
+                for row in result:
+                    yield row
+            finally:
+                result.close()
+    
+    def iter_encrypted_game_data(self, user_id_hash: str = None, fetch_size: int = None) -> Iterator[Dict]:
+        """Stream encrypted game records (one user's, or every user's) in id order with flat memory
+        
+        For exports and key rotation; errors propagate so a partial scan is never mistaken for a full one.
+        """
+        for row in self._stream(
+            f"""
+            SELECT {ENVELOPE_SELECT_COLUMNS}, e.user_id_hash
+            FROM encrypted_game_data e
+            LEFT JOIN game_data_content c ON c.content_hash = e.content_hash
+            {'WHERE e.user_id_hash = :user_id_hash' if user_id_hash else ''}
+            ORDER BY e.id
+            """,
+            {'user_id_hash': user_id_hash} if user_id_hash else {},
+            fetch_size
+        ):
+            record = _game_data_from_row(row)
+            record['user_id_hash'] = row[14]
+            yield record
+    
+    def iter_privacy_assessments(self, user_id_hash: str = None, fetch_size: int = None) -> Iterator[Dict]:
+        """Stream privacy assessments in id order for analytics"""
+        for row in self._stream(
+            f"""
+            SELECT id, user_id_hash, assessment_data, risk_score, risk_level, recommendations, completed_at
+            FROM privacy_assessments
+            {'WHERE user_id_hash = :user_id_hash' if user_id_hash else ''}
+            ORDER BY id
+            """,
+            {'user_id_hash': user_id_hash} if user_id_hash else {},
+            fetch_size
+        ):
+            yield {
+                'id': row[0],
+                'user_id_hash': row[1],
+                'assessment_data': _json_value(row[2]),
+                'risk_score': row[3],
+                'risk_level': row[4],
+                'recommendations': _json_value(row[5]),
+                'completed_at': row[6]
+            }
+    
+    def iter_security_audit_log(self, since: datetime = None, until: datetime = None,
+                                fetch_size: int = None) -> Iterator[Dict]:
+        """Stream audit events in time order; the time bounds prune monthly partitions"""
+        conditions = []
+        params = {}
+        if since is not None:
+            conditions.append('timestamp >= :since')
+            params['since'] = since
+        if until is not None:
+            conditions.append('timestamp < :until')
+            params['until'] = until
+        for row in self._stream(
+            f"""
+            SELECT id, user_id_hash, action_type, resource_type, details, timestamp
+            FROM security_audit_log
+            {'WHERE ' + ' AND '.join(conditions) if conditions else ''}
+            ORDER BY timestamp, id
+            """,
+            params,
+            fetch_size
+        ):
+            yield {
+                'id': row[0],
+                'user_id_hash': row[1],
+                'action_type': row[2],
+                'resource_type': row[3],
+                'details': _json_value(row[4]),
+                'timestamp': row[5]
+            }
+    
+    def migrate_payload_storage(self, batch_size: int = 500, max_batches: int = None) -> Dict:
+        """Move inline payloads (legacy JSON-in-TEXT or BYTEA columns) into game_data_content in short batches
+        
+        Safe to run while the application is serving traffic; the decoding and hashing happen in SQL.
+        """
+        stats = {'batches': 0, 'converted': 0}
+        last_id = 0
+        try:
+            while max_batches is None or stats['batches'] < max_batches:
+                with self._connect() as conn:
+                    row = conn.execute(
+                        text(f"""
+                        WITH batch AS (
+                            SELECT e.id,
+                                   COALESCE(e.ciphertext, decode(l.doc->>'ciphertext', 'base64')) AS ciphertext,
+                                   COALESCE(e.kdf_salt, decode(l.doc->>'salt', 'base64')) AS kdf_salt,
+                                   COALESCE(e.iv, decode(l.doc->>'iv', 'base64')) AS iv,
+                                   COALESCE(e.auth_tag, decode(l.doc->>'tag', 'base64')) AS auth_tag,
+                                   COALESCE(e.algorithm, l.doc->>'algorithm') AS algorithm,
+                                   COALESCE(e.encrypted_at, (l.doc->>'timestamp')::timestamp) AS encrypted_at,
+                                   COALESCE(
+                                       e.payload_metadata,
+                                       l.doc - 'ciphertext' - 'salt' - 'iv' - 'tag' - 'algorithm' - 'timestamp'
+                                   ) AS payload_metadata
+                            FROM encrypted_game_data e
+                            CROSS JOIN LATERAL (SELECT e.encrypted_payload::jsonb AS doc) l
+                            WHERE e.content_hash IS NULL AND e.id > :after_id
+                              AND (e.ciphertext IS NOT NULL OR e.encrypted_payload IS NOT NULL)
+                            ORDER BY e.id
+                            LIMIT :batch_size
+                            FOR UPDATE OF e SKIP LOCKED
+                        ),
+                        hashed AS (
+                            SELECT *, encode(sha256(ciphertext), 'hex') AS content_hash FROM batch
+                        ),
+                        content AS (
+                            INSERT INTO game_data_content (content_hash, {', '.join(CONTENT_COLUMNS)})
+                            SELECT DISTINCT ON (content_hash) content_hash, {', '.join(CONTENT_COLUMNS)}
+                            FROM hashed
+                            ON CONFLICT (content_hash) DO UPDATE SET created_at = CURRENT_TIMESTAMP
+                        ),
+                        converted AS (
+                            UPDATE encrypted_game_data e
+                            SET content_hash = h.content_hash,
+                                ciphertext = NULL,
+                                kdf_salt = NULL,
+                                iv = NULL,
+                                auth_tag = NULL,
+                                algorithm = NULL,
+                                encrypted_at = NULL,
+                                payload_metadata = NULL,
+                                encrypted_payload = NULL
+                            FROM hashed h
+                            WHERE e.id = h.id
+                            RETURNING e.id
+                        )
+                        SELECT MAX(id), COUNT(*) FROM converted
                         """),
-                        {'user_id_hash': user_id_hash, 'game_name': game_name}
-                    )
-                else:
-                    # Get all game data for user
-                    result = conn.execute(
+                        {'after_id': last_id, 'batch_size': batch_size}
+                    ).fetchone()
+                    conn.commit()
+                
+                if not row[1]:
+                    break
+                last_id = row[0]
+                stats['batches'] += 1
+                stats['converted'] += row[1]
+        except SQLAlchemyError as e:
+            print(f"Error migrating payload storage: {str(e)}")
+            stats['error'] = str(e)
+        return stats
+    
+    def purge_orphaned_content(self, batch_size: int = 500, grace_minutes: int = 60) -> Dict:
+        """Delete content rows no pointer references any more (superseded or expired payloads)
+        
+        The grace period leaves rows alone that a concurrent writer may be about to reference.
+        """
+        stats = {'batches': 0, 'deleted': 0}
+        try:
+            while True:
+                with self._connect() as conn:
+                    deleted = conn.execute(
                         text("""
-                        SELECT game_name, encrypted_payload, encryption_metadata,
-                               data_hash, created_at, updated_at
-                        FROM encrypted_game_data 
-                        WHERE user_id_hash = :user_id_hash
-                        ORDER BY updated_at DESC
+                        WITH orphaned AS (
+                            SELECT c.content_hash
+                            FROM game_data_content c
+                            WHERE c.created_at < NOW() - make_interval(mins => :grace_minutes)
+                              AND NOT EXISTS (
+                                  SELECT 1 FROM encrypted_game_data e WHERE e.content_hash = c.content_hash
+                              )
+                            LIMIT :batch_size
+                            FOR UPDATE OF c SKIP LOCKED
+                        ),
+                        deleted AS (
+                            DELETE FROM game_data_content c
+                            USING orphaned o
+                            WHERE c.content_hash = o.content_hash
+                            RETURNING c.content_hash
+                        )
+                        SELECT COUNT(*) FROM deleted
                         """),
-                        {'user_id_hash': user_id_hash}
-                    )
+                        {'batch_size': batch_size, 'grace_minutes': grace_minutes}
+                    ).scalar()
+                    conn.commit()
                 
-                rows = result.fetchall()
-                return [
-                    {
-                        'game_name': row[0],
-                        'encrypted_payload': json.loads(row[1]) if row[1] else {},
-                        'encryption_metadata': json.loads(row[2]) if row[2] else {},
-                        'data_hash': row[3],
-                        'created_at': row[4],
-                        'updated_at': row[5]
+                stats['batches'] += 1
+                stats['deleted'] += deleted
+                if deleted < batch_size:
+                    break
+        except SQLAlchemyError as e:
+            print(f"Error purging orphaned game data content: {str(e)}")
+            stats['error'] = str(e)
+        return stats
+    
+    def get_sync_watermarks(self, user_id_hash: str, game_name: str) -> Dict[str, Dict]:
+        """Get per-source sync watermarks for a user's game"""
+        try:
+            with self._connect() as conn:
+                result = conn.execute(
+                    text("""
+                    SELECT source, last_modified, etag, sync_cursor, content_hash
+                    FROM game_data_sync_watermarks
+                    WHERE user_id_hash = :user_id_hash AND game_name = :game_name
+                    """),
+                    {'user_id_hash': user_id_hash, 'game_name': game_name}
+                )
+                
+                return {
+                    row[0]: {
+                        'last_modified': row[1],
+                        'etag': row[2],
+                        'cursor': row[3],
+                        'content_hash': row[4]
                     }
-                    for row in rows
-                ]
+                    for row in result.fetchall()
+                }
         except SQLAlchemyError as e:
-            print(f"Error retrieving encrypted game data: {str(e)}")
-            return []
+            print(f"Error retrieving sync watermarks: {str(e)}")
+            return {}
+    
+    def store_sync_watermarks(self, user_id_hash: str, game_name: str, 
+                              watermarks: Dict[str, Dict]) -> bool:
+        """Upsert per-source sync watermarks in a single transaction"""
+        if not watermarks:
+            return True
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    text("""
+                    INSERT INTO game_data_sync_watermarks
+                    (user_id_hash, game_name, source, last_modified, etag, sync_cursor, content_hash, synced_at)
+                    VALUES (:user_id_hash, :game_name, :source, :last_modified, :etag, :cursor, :content_hash, :synced_at)
+                    ON CONFLICT (user_id_hash, game_name, source) DO UPDATE SET
+                        last_modified = EXCLUDED.last_modified,
+                        etag = EXCLUDED.etag,
+                        sync_cursor = EXCLUDED.sync_cursor,
+                        content_hash = EXCLUDED.content_hash,
+                        synced_at = EXCLUDED.synced_at
+                    """),
+                    [
+                        {
+                            'user_id_hash': user_id_hash,
+                            'game_name': game_name,
+                            'source': source,
+                            'last_modified': watermark.get('last_modified'),
+                            'etag': watermark.get('etag'),
+                            'cursor': watermark.get('cursor'),
+                            'content_hash': watermark.get('content_hash'),
+                            'synced_at': datetime.utcnow()
+                        }
+                        for source, watermark in watermarks.items()
+                    ]
+                )
+                conn.commit()
+                return True
+        except SQLAlchemyError as e:
+            print(f"Error storing sync watermarks: {str(e)}")
+            return False
     
     def store_privacy_assessment(self, user_id_hash: str, assessment_data: dict, 
                                risk_score: int, risk_level: str, recommendations: list) -> bool:
         """Store privacy assessment results"""
         try:
-            with self.engine.connect() as conn:
+            with self._connect() as conn:
                 conn.execute(
                     text("""
                     INSERT INTO privacy_assessments 
@@ -259,44 +849,52 @@ class SecureGameDataDB:
                         'recommendations': json.dumps(recommendations)
                     }
                 )
+                self._publish_invalidation(conn, 'privacy_assessments', [user_id_hash])
                 conn.commit()
-                return True
+            self.query_cache.invalidate_user(user_id_hash)
+            return True
         except SQLAlchemyError as e:
             print(f"Error storing privacy assessment: {str(e)}")
             return False
     
     def get_user_privacy_score_history(self, user_id_hash: str) -> List[Dict]:
-        """Get privacy score history for a user"""
+        """Get privacy score history for a user (read-through cached)"""
         try:
-            with self.engine.connect() as conn:
-                result = conn.execute(
-                    text("""
-                    SELECT risk_score, risk_level, completed_at
-                    FROM privacy_assessments 
-                    WHERE user_id_hash = :user_id_hash
-                    ORDER BY completed_at DESC
-                    LIMIT 30
-                    """),
-                    {'user_id_hash': user_id_hash}
-                )
-                
-                rows = result.fetchall()
-                return [
-                    {
-                        'risk_score': row[0],
-                        'risk_level': row[1],
-                        'completed_at': row[2]
-                    }
-                    for row in rows
-                ]
+            return self.query_cache.get_or_load(
+                'privacy_history', user_id_hash, (),
+                lambda: self._load_privacy_score_history(user_id_hash)
+            )
         except SQLAlchemyError as e:
             print(f"Error retrieving privacy score history: {str(e)}")
             return []
     
+    def _load_privacy_score_history(self, user_id_hash: str) -> List[Dict]:
+        with self._connect() as conn:
+            result = conn.execute(
+                text("""
+                SELECT risk_score, risk_level, completed_at
+                FROM privacy_assessments 
+                WHERE user_id_hash = :user_id_hash
+                ORDER BY completed_at DESC
+                LIMIT 30
+                """),
+                {'user_id_hash': user_id_hash}
+            )
+            
+            rows = result.fetchall()
+            return [
+                {
+                    'risk_score': row[0],
+                    'risk_level': row[1],
+                    'completed_at': row[2]
+                }
+                for row in rows
+            ]
+    
     def update_privacy_settings(self, user_id_hash: str, settings_data: dict) -> bool:
         """Update user privacy settings"""
         try:
-            with self.engine.connect() as conn:
+            with self._connect() as conn:
                 conn.execute(
                     text("""
                     INSERT INTO privacy_settings (user_id_hash, settings_data, updated_at)
@@ -319,92 +917,74 @@ class SecureGameDataDB:
     
     def log_security_action(self, user_id_hash: str, action_type: str, 
                           resource_type: str = None, details: dict = None) -> bool:
-        """Log security-related actions for audit purposes"""
-        try:
-            with self.engine.connect() as conn:
-                conn.execute(
-                    text("""
-                    INSERT INTO security_audit_log 
-                    (user_id_hash, action_type, resource_type, details)
-                    VALUES (:user_id_hash, :action_type, :resource_type, :details)
-                    """),
-                    {
-                        'user_id_hash': user_id_hash,
-                        'action_type': action_type,
-                        'resource_type': resource_type,
-                        'details': json.dumps(details) if details else None
-                    }
-                )
-                conn.commit()
-                return True
-        except SQLAlchemyError as e:
-            print(f"Error logging security action: {str(e)}")
-            return False
+        """Log security-related actions for audit purposes
+        
+        Events are queued for the background audit writer, so this never waits on the database.
+        """
+        return self.audit_writer.log(user_id_hash, action_type, resource_type, details)
+    
+    def flush_audit_log(self, timeout: float = 10.0) -> bool:
+        """Wait until queued audit events have been written (or spilled to disk)"""
+        return self.audit_writer.flush(timeout)
     
-    def get_database_stats(self) -> Dict:
-        """Get database statistics and health information"""
+    def get_database_stats(self, exact: bool = False, refresh: bool = False) -> Dict:
+        """Get database statistics and health information
+        
+        Served from a snapshot refreshed in the background (DB_STATS_REFRESH_INTERVAL); row counts
+        are planner estimates unless exact=True, which runs one combined COUNT(*) query.
+        """
         try:
-            with self.engine.connect() as conn:
-                stats = {}
-                
-                # Count users
-                result = conn.execute(text("SELECT COUNT(*) FROM users"))
-                stats['total_users'] = result.scalar()
-                
-                # Count encrypted game data records
-                result = conn.execute(text("SELECT COUNT(*) FROM encrypted_game_data"))
-                stats['total_game_data_records'] = result.scalar()
-                
-                # Count privacy assessments
-                result = conn.execute(text("SELECT COUNT(*) FROM privacy_assessments"))
-                stats['total_assessments'] = result.scalar()
-                
-                # Get recent activity
-                result = conn.execute(text("""
-                    SELECT COUNT(*) FROM security_audit_log 
-                    WHERE timestamp > NOW() - INTERVAL '24 hours'
-                """))
-                stats['recent_activity_24h'] = result.scalar()
-                
-                # Database size
-                result = conn.execute(text("""
-                    SELECT pg_size_pretty(pg_database_size(current_database()))
-                """))
-                stats['database_size'] = result.scalar()
-                
-                return stats
+            return self.stats_service.get_stats(exact=exact, refresh=refresh)
         except SQLAlchemyError as e:
             print(f"Error getting database stats: {str(e)}")
             return {}
     
-    def cleanup_old_data(self, retention_days: int = 365) -> bool:
-        """Clean up old data based on retention policy"""
-        try:
-            with self.engine.connect() as conn:
-                # Clean up old audit logs (keep last 90 days)
-                conn.execute(
-                    text("""
-                    DELETE FROM security_audit_log 
-                    WHERE timestamp < NOW() - INTERVAL ':days days'
-                    """),
-                    {'days': 90}
-                )
-                
-                # Clean up old privacy assessments (keep based on user settings)
-                conn.execute(
-                    text("""
-                    DELETE FROM privacy_assessments 
-                    WHERE completed_at < NOW() - INTERVAL ':days days'
-                    """),
-                    {'days': retention_days}
-                )
-                
-                conn.commit()
-                return True
-        except SQLAlchemyError as e:
-            print(f"Error cleaning up old data: {str(e)}")
+    def cleanup_old_data(self, retention_days: int = 365, audit_retention_days: int = 90,
+                         max_seconds: float = None) -> bool:
+        """Clean up old data based on retention policy
+        
+        Assessments and game data follow each user's privacy_settings.data_retention_days
+        (retention_days when unset) and are deleted in throttled, checkpointed batches.
+        """
+        # Audit logs: whole monthly partitions are detached and dropped instead of row DELETEs
+        if not AuditLogPartitionManager(self.engine).maintain(audit_retention_days):
             return False
+        results = RetentionEngine.from_env(self.engine, retention_days, self.query_cache).run(max_seconds)
+        # Payloads superseded by re-encryption or whose pointer rows expired above
+        results['game_data_content'] = self.purge_orphaned_content()
+        return all('error' not in result for result in results.values())
 
 def get_database_connection():
     """Get database connection for external use"""
-    return SecureGameDataDB()
\ No newline at end of file
+    return SecureGameDataDB()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run game data storage maintenance")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    migrate = subparsers.add_parser(
+        'migrate-payloads', help="Move inline payloads into game_data_content (safe while serving traffic)"
+    )
+    migrate.add_argument('--batch-size', type=int, default=500)
+    migrate.add_argument('--max-batches', type=int, default=None)
+    purge = subparsers.add_parser('purge-content', help="Delete content rows no pointer references")
+    purge.add_argument('--batch-size', type=int, default=500)
+    purge.add_argument('--grace-minutes', type=int, default=60)
+    args = parser.parse_args(argv)
+
+    if not os.getenv('DATABASE_URL'):
+        print("DATABASE_URL environment variable not set")
+        return 1
+    db = SecureGameDataDB()
+
+    if args.command == 'migrate-payloads':
+        stats = db.migrate_payload_storage(args.batch_size, args.max_batches)
+        print(f"Converted {stats['converted']} rows in {stats['batches']} batches")
+    else:
+        stats = db.purge_orphaned_content(args.batch_size, args.grace_minutes)
+        print(f"Deleted {stats['deleted']} orphaned content rows in {stats['batches']} batches")
+    return 1 if 'error' in stats else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
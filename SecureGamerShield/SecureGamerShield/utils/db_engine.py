@@ -0,0 +1,168 @@
+"""
+Process-wide SQLAlchemy engine registry
+One pooled engine per database URL with explicit pool settings, checkout metrics and run-once initialization
+"""
+
+import os
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+
+class PoolMetrics:
+    """Checkout wait times and pool event counters for one engine"""
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        self._lock = threading.Lock()
+        self._waits = deque(maxlen=1024)
+        self._stats = {'connects': 0, 'checkouts': 0, 'checkins': 0, 'invalidations': 0,
+                       'timeouts': 0, 'total_wait_seconds': 0.0, 'max_wait_seconds': 0.0}
+
+        event.listen(engine, 'connect', self._on_connect)
+        event.listen(engine, 'checkout', self._on_checkout)
+        event.listen(engine, 'checkin', self._on_checkin)
+        event.listen(engine, 'invalidate', self._on_invalidate)
+
+    def _increment(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        self._increment('connects')
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        self._increment('checkouts')
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        self._increment('checkins')
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception):
+        self._increment('invalidations')
+
+    def record_wait(self, seconds: float):
+        with self._lock:
+            self._stats['total_wait_seconds'] += seconds
+            self._stats['max_wait_seconds'] = max(self._stats['max_wait_seconds'], seconds)
+            self._waits.append(seconds)
+
+    def record_timeout(self):
+        self._increment('timeouts')
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            waits = sorted(self._waits)
+        pool = self.engine.pool
+        total_wait = stats.pop('total_wait_seconds')
+        timed = len(waits)
+        return {
+            'pool_size': pool.size(),
+            'checked_out': pool.checkedout(),
+            'checked_in': pool.checkedin(),
+            'overflow': pool.overflow(),
+            'avg_wait_ms': (total_wait / timed * 1000) if timed else 0.0,
+            'p95_wait_ms': waits[int(timed * 0.95) - 1] * 1000 if waits else 0.0,
+            'max_wait_ms': stats.pop('max_wait_seconds') * 1000,
+            **stats
+        }
+
+
+class EngineRegistry:
+    """Shares one pooled engine per database URL across every session in the process"""
+
+    def __init__(self, pool_size: int = 10, max_overflow: int = 20, pool_timeout: float = 30,
+                 pool_recycle: int = 1800, pool_pre_ping: bool = True):
+        self.pool_options = {
+            'pool_size': pool_size,
+            'max_overflow': max_overflow,
+            'pool_timeout': pool_timeout,
+            'pool_recycle': pool_recycle,
+            'pool_pre_ping': pool_pre_ping
+        }
+        self._engines: Dict[str, Engine] = {}
+        self._metrics: Dict[str, PoolMetrics] = {}
+        self._initialized: set = set()
+        self._lock = threading.Lock()
+        self._init_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> 'EngineRegistry':
+        """Build a registry from DB_POOL_* environment variables"""
+        return cls(
+            pool_size=int(os.getenv('DB_POOL_SIZE', '10')),
+            max_overflow=int(os.getenv('DB_MAX_OVERFLOW', '20')),
+            pool_timeout=float(os.getenv('DB_POOL_TIMEOUT', '30')),
+            pool_recycle=int(os.getenv('DB_POOL_RECYCLE', '1800')),
+            pool_pre_ping=os.getenv('DB_POOL_PRE_PING', 'true').lower() != 'false'
+        )
+
+    def get_engine(self, database_url: str) -> Engine:
+        """Return the shared engine for a URL, creating it on first use"""
+        with self._lock:
+            engine = self._engines.get(database_url)
+            if engine is None:
+                engine = create_engine(database_url, **self.pool_options)
+                self._engines[database_url] = engine
+                self._metrics[database_url] = PoolMetrics(engine)
+            return engine
+
+    @contextmanager
+    def connect(self, database_url: str):
+        """Check out a pooled connection, recording how long the checkout waited"""
+        engine = self.get_engine(database_url)
+        metrics = self._metrics[database_url]
+        started = time.perf_counter()
+        try:
+            conn = engine.connect()
+        except PoolTimeoutError:
+            metrics.record_timeout()
+            raise
+        metrics.record_wait(time.perf_counter() - started)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def run_once(self, database_url: str, initializer: Callable[[Engine], None]):
+        """Run an initializer (e.g. DDL) once per process per URL; failures are retried next call"""
+        if database_url in self._initialized:
+            return
+        with self._init_lock:
+            if database_url in self._initialized:
+                return
+            initializer(self.get_engine(database_url))
+            self._initialized.add(database_url)
+
+    def get_metrics(self) -> Dict[str, dict]:
+        """Pool metrics keyed by URL with the password masked"""
+        with self._lock:
+            items = list(self._metrics.items())
+        return {
+            self._engines[url].url.render_as_string(hide_password=True): metrics.snapshot()
+            for url, metrics in items
+        }
+
+    def dispose(self):
+        """Close every pooled connection (e.g. after fork)"""
+        with self._lock:
+            for engine in self._engines.values():
+                engine.dispose()
+
+
+_default_registry: Optional[EngineRegistry] = None
+_default_registry_lock = threading.Lock()
+
+
+def get_engine_registry() -> EngineRegistry:
+    """Return the process-wide engine registry"""
+    global _default_registry
+    with _default_registry_lock:
+        if _default_registry is None:
+            _default_registry = EngineRegistry.from_env()
+        return _default_registry
@@ -0,0 +1,442 @@
+"""
+Versioned schema migrations for the secure game data database
+Ordered, checksummed migrations applied under a Postgres advisory lock so only one replica migrates
+"""
+
+import os
+import sys
+import time
+import hashlib
+import argparse
+from typing import List, Optional
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
+from utils.db_engine import get_engine_registry
+
+# Arbitrary application-wide key for pg_advisory_lock
+MIGRATION_LOCK_KEY = 7248150301
+
+
+class Migration:
+    """One schema change; its checksum guards against editing an applied migration"""
+
+    def __init__(self, version: int, name: str, sql: str):
+        self.version = version
+        self.name = name
+        self.sql = sql
+        # Whitespace-insensitive so re-indenting a migration does not change its checksum
+        self.checksum = hashlib.sha256(' '.join(sql.split()).encode()).hexdigest()
+
+
+class MigrationError(Exception):
+    """Raised when applied migrations do not match the code or a migration fails"""
+
+
+# Append only: never edit or reorder a migration once it has shipped
+MIGRATIONS: List[Migration] = [
+    Migration(1, 'baseline', """
+        -- Users table for authentication and user management
+        CREATE TABLE IF NOT EXISTS users (
+            id SERIAL PRIMARY KEY,
+            user_id_hash VARCHAR(64) UNIQUE NOT NULL,
+            username VARCHAR(100) NOT NULL,
+            email_hash VARCHAR(64),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_login TIMESTAMP,
+            privacy_score INTEGER DEFAULT 0,
+            account_status VARCHAR(20) DEFAULT 'active'
+        );
+
+        -- Encrypted game data storage
+        CREATE TABLE IF NOT EXISTS encrypted_game_data (
+            id SERIAL PRIMARY KEY,
+            user_id_hash VARCHAR(64) NOT NULL,
+            game_name VARCHAR(100) NOT NULL,
+            encrypted_payload TEXT NOT NULL,
+            encryption_metadata JSONB NOT NULL,
+            data_hash VARCHAR(64) NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            encryption_version VARCHAR(10) DEFAULT '1.0',
+            FOREIGN KEY (user_id_hash) REFERENCES users(user_id_hash)
+        );
+
+        -- Privacy assessment results
+        CREATE TABLE IF NOT EXISTS privacy_assessments (
+            id SERIAL PRIMARY KEY,
+            user_id_hash VARCHAR(64) NOT NULL,
+            assessment_data JSONB NOT NULL,
+            risk_score INTEGER NOT NULL,
+            risk_level VARCHAR(20) NOT NULL,
+            recommendations JSONB,
+            completed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id_hash) REFERENCES users(user_id_hash)
+        );
+
+        -- User privacy settings and preferences
+        CREATE TABLE IF NOT EXISTS privacy_settings (
+            id SERIAL PRIMARY KEY,
+            user_id_hash VARCHAR(64) UNIQUE NOT NULL,
+            settings_data JSONB NOT NULL,
+            encryption_preferences JSONB,
+            data_retention_days INTEGER DEFAULT 365,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id_hash) REFERENCES users(user_id_hash)
+        );
+
+        -- Security audit log
+        CREATE TABLE IF NOT EXISTS security_audit_log (
+            id SERIAL PRIMARY KEY,
+            user_id_hash VARCHAR(64),
+            action_type VARCHAR(50) NOT NULL,
+            resource_type VARCHAR(50),
+            resource_id VARCHAR(100),
+            details JSONB,
+            ip_address INET,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            success BOOLEAN DEFAULT TRUE
+        );
+
+        -- Education progress tracking
+        CREATE TABLE IF NOT EXISTS education_progress (
+            id SERIAL PRIMARY KEY,
+            user_id_hash VARCHAR(64) NOT NULL,
+            module_name VARCHAR(100) NOT NULL,
+            completion_status VARCHAR(20) DEFAULT 'in_progress',
+            quiz_score INTEGER,
+            completed_at TIMESTAMP,
+            time_spent_minutes INTEGER,
+            FOREIGN KEY (user_id_hash) REFERENCES users(user_id_hash),
+            UNIQUE(user_id_hash, module_name)
+        );
+
+        -- Create indexes for better performance
+        CREATE INDEX IF NOT EXISTS idx_users_user_id_hash ON users(user_id_hash);
+        CREATE INDEX IF NOT EXISTS idx_encrypted_game_data_user_game ON encrypted_game_data(user_id_hash, game_name);
+        CREATE INDEX IF NOT EXISTS idx_privacy_assessments_user ON privacy_assessments(user_id_hash);
+        CREATE INDEX IF NOT EXISTS idx_security_audit_log_user_timestamp ON security_audit_log(user_id_hash, timestamp);
+        CREATE INDEX IF NOT EXISTS idx_education_progress_user ON education_progress(user_id_hash);
+    """),
+    Migration(2, 'game_data_sync_watermarks', """
+        -- Per-source sync watermarks for incremental game data retrieval
+        CREATE TABLE IF NOT EXISTS game_data_sync_watermarks (
+            id SERIAL PRIMARY KEY,
+            user_id_hash VARCHAR(64) NOT NULL,
+            game_name VARCHAR(100) NOT NULL,
+            source VARCHAR(50) NOT NULL,
+            last_modified VARCHAR(100),
+            etag VARCHAR(255),
+            sync_cursor VARCHAR(255),
+            content_hash VARCHAR(64),
+            synced_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id_hash) REFERENCES users(user_id_hash),
+            UNIQUE(user_id_hash, game_name, source)
+        );
+    """),
+    Migration(3, 'encrypted_game_data_unique_user_game', """
+        -- Keep only the newest record per (user, game) before enforcing uniqueness
+        DELETE FROM encrypted_game_data e
+        USING encrypted_game_data newer
+        WHERE e.user_id_hash = newer.user_id_hash
+          AND e.game_name = newer.game_name
+          AND (COALESCE(newer.updated_at, newer.created_at), newer.id)
+            > (COALESCE(e.updated_at, e.created_at), e.id);
+
+        ALTER TABLE encrypted_game_data
+            ADD CONSTRAINT uq_encrypted_game_data_user_game UNIQUE (user_id_hash, game_name);
+
+        -- The constraint's unique index replaces the plain lookup index
+        DROP INDEX IF EXISTS idx_encrypted_game_data_user_game;
+    """),
+    Migration(4, 'partition_security_audit_log_by_month', """
+        ALTER TABLE security_audit_log RENAME TO security_audit_log_legacy;
+        DROP INDEX IF EXISTS idx_security_audit_log_user_timestamp;
+
+        -- The partition key must be part of the primary key
+        CREATE TABLE security_audit_log (
+            id BIGSERIAL,
+            user_id_hash VARCHAR(64),
+            action_type VARCHAR(50) NOT NULL,
+            resource_type VARCHAR(50),
+            resource_id VARCHAR(100),
+            details JSONB,
+            ip_address INET,
+            timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            success BOOLEAN DEFAULT TRUE,
+            PRIMARY KEY (id, timestamp)
+        ) PARTITION BY RANGE (timestamp);
+
+        CREATE INDEX idx_security_audit_log_user_timestamp ON security_audit_log(user_id_hash, timestamp);
+
+        -- Creates any missing monthly partitions covering [from_date, to_date]
+        CREATE OR REPLACE FUNCTION ensure_audit_log_partitions(from_date DATE, to_date DATE)
+        RETURNS INTEGER AS $$
+        DECLARE
+            month_start DATE := date_trunc('month', from_date)::date;
+            partition_name TEXT;
+            created INTEGER := 0;
+        BEGIN
+            WHILE month_start <= to_date LOOP
+                partition_name := format('security_audit_log_%s', to_char(month_start, 'YYYY_MM'));
+                IF to_regclass(partition_name) IS NULL THEN
+                    EXECUTE format(
+                        'CREATE TABLE %I PARTITION OF security_audit_log FOR VALUES FROM (%L) TO (%L)',
+                        partition_name, month_start, (month_start + INTERVAL '1 month')::date
+                    );
+                    created := created + 1;
+                END IF;
+                month_start := (month_start + INTERVAL '1 month')::date;
+            END LOOP;
+            RETURN created;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        SELECT ensure_audit_log_partitions(
+            LEAST(COALESCE((SELECT MIN(timestamp) FROM security_audit_log_legacy), CURRENT_DATE), CURRENT_DATE)::date,
+            GREATEST(COALESCE((SELECT MAX(timestamp) FROM security_audit_log_legacy), CURRENT_DATE),
+                     CURRENT_DATE + INTERVAL '3 months')::date
+        );
+
+        INSERT INTO security_audit_log
+        (id, user_id_hash, action_type, resource_type, resource_id, details, ip_address, timestamp, success)
+        SELECT id, user_id_hash, action_type, resource_type, resource_id, details, ip_address,
+               COALESCE(timestamp, CURRENT_TIMESTAMP), success
+        FROM security_audit_log_legacy;
+
+        SELECT setval(
+            pg_get_serial_sequence('security_audit_log', 'id'),
+            COALESCE((SELECT MAX(id) FROM security_audit_log), 0) + 1,
+            false
+        );
+
+        DROP TABLE security_audit_log_legacy;
+    """),
+    Migration(5, 'retention_checkpoints', """
+        -- Keyset position of each retention job so cleanup resumes where it stopped
+        CREATE TABLE IF NOT EXISTS retention_checkpoints (
+            job_name VARCHAR(50) PRIMARY KEY,
+            last_id BIGINT NOT NULL DEFAULT 0,
+            passes_completed INTEGER NOT NULL DEFAULT 0,
+            rows_deleted BIGINT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """),
+    Migration(6, 'encrypted_game_data_bytea_envelope', """
+        -- Nullable columns are a catalog-only change; existing rows are converted online in batches
+        ALTER TABLE encrypted_game_data
+            ADD COLUMN IF NOT EXISTS ciphertext BYTEA,
+            ADD COLUMN IF NOT EXISTS kdf_salt BYTEA,
+            ADD COLUMN IF NOT EXISTS iv BYTEA,
+            ADD COLUMN IF NOT EXISTS auth_tag BYTEA,
+            ADD COLUMN IF NOT EXISTS algorithm VARCHAR(32),
+            ADD COLUMN IF NOT EXISTS encrypted_at TIMESTAMP,
+            ADD COLUMN IF NOT EXISTS payload_metadata JSONB,
+            ALTER COLUMN encrypted_payload DROP NOT NULL;
+
+        -- Rows still holding the legacy JSON-in-TEXT payload
+        CREATE INDEX IF NOT EXISTS idx_encrypted_game_data_legacy_payload
+            ON encrypted_game_data(id) WHERE ciphertext IS NULL;
+    """),
+    Migration(7, 'game_data_content_table', """
+        -- Cold, write-once ciphertext keyed by the SHA-256 of the ciphertext
+        CREATE TABLE IF NOT EXISTS game_data_content (
+            content_hash VARCHAR(64) PRIMARY KEY,
+            ciphertext BYTEA NOT NULL,
+            kdf_salt BYTEA NOT NULL,
+            iv BYTEA NOT NULL,
+            auth_tag BYTEA NOT NULL,
+            algorithm VARCHAR(32),
+            encrypted_at TIMESTAMP,
+            payload_metadata JSONB,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        -- Ciphertext does not compress; skip TOAST compression attempts
+        ALTER TABLE game_data_content ALTER COLUMN ciphertext SET STORAGE EXTERNAL;
+
+        ALTER TABLE encrypted_game_data
+            ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64) REFERENCES game_data_content(content_hash);
+
+        -- Free space on each page lets pointer-row updates stay heap-only (HOT).
+        -- HOT also requires that updated columns (content_hash, data_hash, updated_at) stay unindexed.
+        ALTER TABLE encrypted_game_data SET (fillfactor = 70);
+        DROP INDEX IF EXISTS idx_encrypted_game_data_legacy_payload;
+    """),
+    Migration(8, 'password_verifiers', """
+        -- Argon2id verifiers, created only by explicit registration
+        CREATE TABLE IF NOT EXISTS password_verifiers (
+            user_id_hash VARCHAR(64) PRIMARY KEY,
+            verifier TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """),
+    Migration(9, 'drop_game_data_content_fkey', """
+        -- content_hash is unindexed (so pointer updates stay HOT), which made the foreign key's check on
+        -- every content DELETE a sequential scan of encrypted_game_data. purge_orphaned_content's
+        -- NOT EXISTS plus its grace period protect referenced rows instead; writers that reuse an
+        -- existing content row refresh its created_at.
+        ALTER TABLE encrypted_game_data DROP CONSTRAINT IF EXISTS encrypted_game_data_content_hash_fkey;
+    """),
+    Migration(10, 'encrypted_game_data_last_seen', """
+        -- Last upsert of a record, changed or not; game data retention expires rows by it. Existing rows
+        -- stay NULL (retention falls back to updated_at) so the ALTER is catalog-only. Deliberately
+        -- unindexed so the periodic refresh from unchanged upserts stays a HOT update.
+        ALTER TABLE encrypted_game_data ADD COLUMN IF NOT EXISTS last_seen_at TIMESTAMP;
+        ALTER TABLE encrypted_game_data ALTER COLUMN last_seen_at SET DEFAULT CURRENT_TIMESTAMP;
+    """),
+]
+
+
+SCHEMA_VERSION_SQL = """
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        name VARCHAR(100) NOT NULL,
+        checksum VARCHAR(64) NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        execution_ms INTEGER
+    )
+"""
+
+
+class SchemaMigrator:
+    """Applies pending migrations in order, one transaction each"""
+
+    def __init__(self, engine: Engine, migrations: List[Migration] = None,
+                 lock_key: int = MIGRATION_LOCK_KEY):
+        self.engine = engine
+        self.migrations = sorted(migrations or MIGRATIONS, key=lambda m: m.version)
+        self.lock_key = lock_key
+
+    @property
+    def latest(self) -> Migration:
+        return self.migrations[-1]
+
+    def current_version(self) -> Optional[dict]:
+        """Single-row read of the newest applied migration; None if nothing was applied"""
+        try:
+            with self.engine.connect() as conn:
+                row = conn.execute(text(
+                    "SELECT version, checksum FROM schema_version ORDER BY version DESC LIMIT 1"
+                )).fetchone()
+        except SQLAlchemyError:
+            # schema_version does not exist yet
+            return None
+        return {'version': row[0], 'checksum': row[1]} if row else None
+
+    def is_current(self) -> bool:
+        """True when the database is at (or, during a rolling deploy, beyond) the latest migration"""
+        current = self.current_version()
+        if current is None:
+            return False
+        if current['version'] == self.latest.version:
+            return current['checksum'] == self.latest.checksum
+        return current['version'] > self.latest.version
+
+    def _applied(self, conn) -> dict:
+        rows = conn.execute(text("SELECT version, checksum FROM schema_version")).fetchall()
+        return {row[0]: row[1] for row in rows}
+
+    def migrate(self) -> List[int]:
+        """Apply every pending migration under the advisory lock; returns the versions applied"""
+        applied_now = []
+        with self.engine.connect() as conn:
+            # Session-level lock: other replicas block here, then find nothing left to do
+            conn.execute(text("SELECT pg_advisory_lock(:key)"), {'key': self.lock_key})
+            conn.commit()
+            try:
+                conn.execute(text(SCHEMA_VERSION_SQL))
+                applied = self._applied(conn)
+                conn.commit()
+
+                for migration in self.migrations:
+                    if migration.version in applied:
+                        if applied[migration.version] != migration.checksum:
+                            raise MigrationError(
+                                f"Checksum mismatch for applied migration {migration.version} "
+                                f"({migration.name}); migrations must not be edited after release"
+                            )
+                        continue
+
+                    started = time.perf_counter()
+                    try:
+                        conn.execute(text(migration.sql))
+                        conn.execute(
+                            text("""
+                            INSERT INTO schema_version (version, name, checksum, execution_ms)
+                            VALUES (:version, :name, :checksum, :execution_ms)
+                            """),
+                            {
+                                'version': migration.version,
+                                'name': migration.name,
+                                'checksum': migration.checksum,
+                                'execution_ms': int((time.perf_counter() - started) * 1000)
+                            }
+                        )
+                        conn.commit()
+                    except SQLAlchemyError as e:
+                        conn.rollback()
+                        raise MigrationError(f"Migration {migration.version} ({migration.name}) failed: {str(e)}")
+                    applied_now.append(migration.version)
+            finally:
+                conn.rollback()
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {'key': self.lock_key})
+                conn.commit()
+        return applied_now
+
+    def status(self) -> List[dict]:
+        """Every known migration with whether and when it was applied"""
+        try:
+            with self.engine.connect() as conn:
+                rows = conn.execute(text(
+                    "SELECT version, checksum, applied_at FROM schema_version"
+                )).fetchall()
+        except SQLAlchemyError:
+            rows = []
+        applied = {row[0]: (row[1], row[2]) for row in rows}
+        return [
+            {
+                'version': migration.version,
+                'name': migration.name,
+                'applied_at': applied[migration.version][1] if migration.version in applied else None,
+                'checksum_ok': applied[migration.version][0] == migration.checksum
+                if migration.version in applied else None
+            }
+            for migration in self.migrations
+        ]
+
+
+def ensure_schema(engine: Engine) -> List[int]:
+    """Startup hook: a one-row version check, migrating only when the schema is behind"""
+    migrator = SchemaMigrator(engine)
+    if migrator.is_current():
+        return []
+    return migrator.migrate()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply or inspect database schema migrations")
+    parser.add_argument('command', choices=['migrate', 'status'], nargs='?', default='migrate')
+    args = parser.parse_args(argv)
+
+    database_url = os.getenv('DATABASE_URL')
+    if not database_url:
+        print("DATABASE_URL environment variable not set")
+        return 1
+    migrator = SchemaMigrator(get_engine_registry().get_engine(database_url))
+
+    if args.command == 'status':
+        for entry in migrator.status():
+            state = 'pending' if entry['applied_at'] is None else f"applied {entry['applied_at']}"
+            if entry['checksum_ok'] is False:
+                state += ' (CHECKSUM MISMATCH)'
+            print(f"{entry['version']:>4}  {entry['name']:<40} {state}")
+        return 0
+
+    applied = migrator.migrate()
+    print(f"Applied migrations: {applied}" if applied else "Schema is up to date")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,130 @@
+"""
+Cached database statistics for dashboards and health checks
+Planner-estimate row counts refreshed on a background interval, with a single-query exact mode on demand
+"""
+
+import os
+import time
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
+
+# Stats key -> table whose row count is reported (estimates include any partitions)
+COUNTED_TABLES = {
+    'total_users': 'users',
+    'total_game_data_records': 'encrypted_game_data',
+    'total_assessments': 'privacy_assessments',
+}
+
+
+def _estimate_sql(table: str) -> str:
+    """pg_class.reltuples as maintained by VACUUM/ANALYZE; exact COUNT(*) only for never-analyzed tables"""
+    return f"""
+        COALESCE((
+            SELECT CASE
+                WHEN SUM(GREATEST(c.reltuples, 0)) > 0 OR bool_and(c.reltuples >= 0)
+                    THEN SUM(GREATEST(c.reltuples, 0))::bigint
+                -- reltuples is -1 until the first ANALYZE; counting such a small table is cheap
+                ELSE (SELECT COUNT(*) FROM {table})
+            END
+            FROM pg_class c
+            WHERE c.oid = '{table}'::regclass
+               OR c.oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = '{table}'::regclass)
+        ), 0)
+    """
+
+
+# Every statistic in one round trip instead of one statement per number. The 24h audit count only
+# touches the newest monthly partitions and, like pg_database_size, runs on the background refresh.
+APPROXIMATE_STATS_SQL = f"""
+    SELECT {', '.join(f'{_estimate_sql(table)} AS {key}' for key, table in COUNTED_TABLES.items())},
+           (SELECT COUNT(*) FROM security_audit_log WHERE timestamp > NOW() - INTERVAL '24 hours')
+               AS recent_activity_24h,
+           pg_size_pretty(pg_database_size(current_database())) AS database_size
+"""
+
+EXACT_STATS_SQL = f"""
+    SELECT {', '.join(f'(SELECT COUNT(*) FROM {table}) AS {key}' for key, table in COUNTED_TABLES.items())},
+           (SELECT COUNT(*) FROM security_audit_log WHERE timestamp > NOW() - INTERVAL '24 hours')
+               AS recent_activity_24h,
+           pg_size_pretty(pg_database_size(current_database())) AS database_size
+"""
+
+
+class DatabaseStatsService:
+    """Serves statistics from a cache that a background thread keeps fresh"""
+
+    def __init__(self, engine: Engine, refresh_interval: float = 30.0):
+        self.engine = engine
+        self.refresh_interval = refresh_interval
+        self._cache: Dict[bool, Dict] = {}
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def refresh(self, exact: bool = False) -> Dict:
+        """Query the database now and replace the cached snapshot"""
+        # Concurrent refreshes of the same snapshot collapse into one query
+        with self._refresh_lock:
+            started = time.perf_counter()
+            with self.engine.connect() as conn:
+                row = conn.execute(text(EXACT_STATS_SQL if exact else APPROXIMATE_STATS_SQL)).mappings().fetchone()
+            stats = dict(row)
+            stats.update({
+                'approximate': not exact,
+                'refreshed_at': datetime.utcnow(),
+                'query_ms': (time.perf_counter() - started) * 1000
+            })
+            with self._lock:
+                self._cache[exact] = {'stats': stats, 'expires_at': time.monotonic() + self.refresh_interval}
+            return stats
+
+    def get_stats(self, exact: bool = False, refresh: bool = False) -> Dict:
+        """Cached snapshot; queried synchronously only when missing, stale, or refresh is requested"""
+        with self._lock:
+            cached = self._cache.get(exact)
+        if cached and not refresh and cached['expires_at'] > time.monotonic():
+            return dict(cached['stats'])
+        return dict(self.refresh(exact))
+
+    def start(self):
+        """Refresh the approximate snapshot every refresh_interval on a daemon thread"""
+        if self._thread is not None:
+            return
+
+        def loop():
+            while not self._stop.is_set():
+                try:
+                    self.refresh()
+                except SQLAlchemyError as e:
+                    print(f"Error refreshing database stats: {str(e)}")
+                # Refresh slightly early so readers never find the snapshot expired
+                self._stop.wait(self.refresh_interval * 0.9)
+
+        self._thread = threading.Thread(target=loop, name='database-stats-refresher', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+_services: Dict[str, DatabaseStatsService] = {}
+_services_lock = threading.Lock()
+
+
+def get_stats_service(database_url: str, engine: Engine) -> DatabaseStatsService:
+    """Return the process-wide stats service for a database URL, refreshed every DB_STATS_REFRESH_INTERVAL seconds"""
+    with _services_lock:
+        service = _services.get(database_url)
+        if service is None:
+            service = DatabaseStatsService(engine, float(os.getenv('DB_STATS_REFRESH_INTERVAL', '30')))
+            service.start()
+            _services[database_url] = service
+        return service
@@ -7,6 +7,8 @@ import os
 import hashlib
 import base64
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 from cryptography.hazmat.primitives import hashes, serialization
@@ -14,6 +16,18 @@ from cryptography.hazmat.primitives.asymmetric import rsa, ec
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from cryptography.hazmat.backends import default_backend
 import blake3
+from utils.password_verifier import PasswordVerifierStore, get_default_verifier_store
+from utils.rate_limiter import KDFRateLimiter, RateLimitExceededError, get_default_rate_limiter
+from utils.breach_checker import BreachedPasswordChecker, get_default_breach_checker
+from utils.password_strength import is_password_acceptable
+from utils.game_detector import GAME_SIGNATURES, ProcessGameDetector, get_default_game_detector
+from utils.login_pipeline import LoginPipeline, get_default_login_pipeline
+from utils.field_policy import CompiledFieldPolicy, get_default_field_policy
+from utils.game_data_schema import GameDataValidator, get_default_game_data_validator
+from utils.game_connectors import (
+    ConnectorError, ConnectorRegistry, get_default_connector_registry,
+    merge_documents, retrieved_metadata
+)
 
 class EncryptionManager:
     """Handles encryption, decryption, and hashing of sensitive game data"""
@@ -67,14 +81,21 @@ class EncryptionManager:
         except Exception as e:
             raise Exception(f"AES encryption failed: {str(e)}")
     
+    @staticmethod
+    def _as_bytes(value) -> bytes:
+        """Accept raw bytes as stored in the database or base64 text as returned by encrypt_aes_256"""
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return bytes(value)
+        return base64.b64decode(value)
+    
     def decrypt_aes_256(self, encrypted_data: dict, password: str) -> str:
         """Decrypt AES-256-GCM encrypted data"""
         try:
-            # Extract components
-            ciphertext = base64.b64decode(encrypted_data['ciphertext'])
-            salt = base64.b64decode(encrypted_data['salt'])
-            iv = base64.b64decode(encrypted_data['iv'])
-            tag = base64.b64decode(encrypted_data['tag'])
+            # Extract components (raw bytes from BYTEA columns, or base64 strings)
+            ciphertext = self._as_bytes(encrypted_data['ciphertext'])
+            salt = self._as_bytes(encrypted_data['salt'])
+            iv = self._as_bytes(encrypted_data['iv'])
+            tag = self._as_bytes(encrypted_data['tag'])
             
             # Regenerate key
             key, _ = self.generate_aes_key(password, salt)
@@ -142,6 +163,10 @@ class EncryptionManager:
             'timestamp': datetime.utcnow().isoformat()
         }
     
+    def hash_user_id(self, user_id: str) -> str:
+        """Deterministic SHA-256 user identifier hash for keying per-user state"""
+        return self.hash_sha256(user_id, os.getenv('USER_ID_HASH_SALT', ''))['hash']
+    
     def verify_hash(self, data: str, hash_info: dict) -> bool:
         """Verify data against stored hash"""
         try:
@@ -160,11 +185,58 @@ class EncryptionManager:
         except Exception:
             return False
 
+_data_hash_key = None
+_data_hash_key_lock = threading.Lock()
+
+
+def get_data_hash_key() -> bytes:
+    """Server-side BLAKE3 key for content hashes, from DATA_HASH_KEY (64 hex chars)
+
+    data_hash is stored in plaintext next to the ciphertext, so it must not be computable from
+    guessed field values by someone who can only read the database.
+    """
+    global _data_hash_key
+    with _data_hash_key_lock:
+        if _data_hash_key is None:
+            configured = os.getenv('DATA_HASH_KEY')
+            if configured:
+                _data_hash_key = bytes.fromhex(configured)
+            else:
+                print("DATA_HASH_KEY not set: using a per-process key, so unchanged data is rewritten once after each restart")
+                _data_hash_key = os.urandom(32)
+        return _data_hash_key
+
+
 class GameDataSecurityManager:
     """Manages secure handling of game-related user data"""
     
-    def __init__(self):
+    def __init__(self, verifier_store: PasswordVerifierStore = None,
+                 rate_limiter: KDFRateLimiter = None,
+                 breach_checker: BreachedPasswordChecker = None,
+                 game_detector: ProcessGameDetector = None,
+                 connector_registry: ConnectorRegistry = None,
+                 sync_engine=None,
+                 login_pipeline: LoginPipeline = None,
+                 field_policy: CompiledFieldPolicy = None,
+                 validator: GameDataValidator = None,
+                 data_hash_key: bytes = None):
         self.encryption_manager = EncryptionManager()
+        self.verifier_store = verifier_store or get_default_verifier_store()
+        self.rate_limiter = rate_limiter or get_default_rate_limiter()
+        self.breach_checker = breach_checker or get_default_breach_checker()
+        self.game_detector = game_detector or get_default_game_detector()
+        self.connector_registry = connector_registry or get_default_connector_registry()
+        # Optional GameDataSyncEngine; when set, logins fetch and persist deltas only
+        self.sync_engine = sync_engine
+        # Staged login pipeline; defaults to the process-wide one
+        self.login_pipeline = login_pipeline
+        # Compiled redaction policy; 'encrypt' fields need FIELD_ENCRYPTION_KEY (64 hex chars)
+        self.field_policy = field_policy or get_default_field_policy()
+        field_key = os.getenv('FIELD_ENCRYPTION_KEY')
+        self.field_key = bytes.fromhex(field_key) if field_key else None
+        self.validator = validator or get_default_game_data_validator()
+        # Keys compute_data_hash; kept outside the database (see get_data_hash_key)
+        self.data_hash_key = data_hash_key or get_data_hash_key()
         self.session_password = None
     
     def set_session_password(self, password: str):
@@ -173,36 +245,31 @@ class GameDataSecurityManager:
     
     def detect_current_game(self, user_session: dict) -> str:
         """Detect currently playing game from user session"""
-        # In a real implementation, this would integrate with:
-        # - Steam API
-        # - Xbox Live API
-        # - PlayStation Network API
-        # - Process monitoring
-        # - Browser activity monitoring
-        
-        # For demo purposes, simulate game detection
-        detected_games = [
-            "Valorant", "League of Legends", "Fortnite", 
-            "Minecraft", "Among Us", "Call of Duty", 
-            "Apex Legends", "Rocket League"
-        ]
-        
-        # Simulate detection based on session data
-        if 'last_game' in user_session:
+        # Local process monitoring via /proc; platform APIs (Steam, Xbox Live,
+        # PlayStation Network) can feed user_session['last_game'] instead
+        running_games = self.game_detector.running_games() if self.game_detector.available else []
+        
+        # Prefer the session's last game when it is actually running
+        if user_session.get('last_game') in running_games:
             return user_session['last_game']
+        if running_games:
+            return running_games[0]
         
-        # Default fallback
-        return detected_games[0]  # Would be actual detection in production
+        # Nothing detected: fall back to session data, then to the demo default
+        if 'last_game' in user_session:
+            return user_session['last_game']
+        return next(iter(GAME_SIGNATURES))
     
     def retrieve_game_data(self, user_id: str, game_name: str) -> dict:
         """Retrieve user's game-related data"""
-        # In production, this would fetch from:
-        # - Game APIs
-        # - Local game files
-        # - Cloud save data
-        # - Platform-specific APIs
-        
-        # Simulated game data structure
+        # Fetch from configured sources (Steam, Xbox Live, PSN, cloud saves,
+        # local save files) concurrently; see utils/game_connectors.py
+        if self.connector_registry:
+            return self._retrieve_from_connectors(user_id, game_name)
+        return self._simulated_game_data(user_id, game_name)
+    
+    def _simulated_game_data(self, user_id: str, game_name: str) -> dict:
+        """Demo document used when no configured source covers the game"""
         game_data = {
             'user_id': user_id,
             'game_name': game_name,
@@ -241,56 +308,103 @@ class GameDataSecurityManager:
         
         return game_data
     
+    def _retrieve_from_connectors(self, user_id: str, game_name: str) -> dict:
+        """Merge partial documents from every connector that supports the game"""
+        source_results = self.connector_registry.fetch_all(user_id, game_name)
+        if not source_results:
+            # Connectors are configured but none claims this game (e.g. only Steam for Valorant)
+            return self._simulated_game_data(user_id, game_name)
+        
+        game_data = {
+            'user_id': user_id,
+            'game_name': game_name,
+            'progress': {},
+            'scores': {},
+            'settings': {},
+            'sensitive_data': {}
+        }
+        for result in source_results.values():
+            if result['status'] == 'ok':
+                merge_documents(game_data, result['data'])
+        
+        if not any(result['status'] == 'ok' for result in source_results.values()):
+            errors = '; '.join(
+                f"{name}: {result.get('error', 'not supported')}" for name, result in source_results.items()
+            )
+            raise ConnectorError(f"No game data source succeeded for {game_name}: {errors}")
+        
+        game_data['metadata'] = retrieved_metadata(source_results)
+        game_data['metadata'].update({'data_version': '1.0', 'encryption_required': True})
+        return game_data
+    
+    def compute_data_hash(self, game_data: dict) -> str:
+        """Keyed content hash of a game document, ignoring volatile retrieval metadata"""
+        content = {key: value for key, value in game_data.items() if key != 'metadata'}
+        return blake3.blake3(
+            json.dumps(content, sort_keys=True, default=str).encode(), key=self.data_hash_key
+        ).hexdigest()
+    
+    def redact_game_data(self, game_data: dict) -> dict:
+        """Apply the field policy, returning a new document (the input is not modified)"""
+        return self.field_policy.apply(game_data, field_key=self.field_key)
+    
+    def encrypt_redacted_game_data(self, game_data: dict, redacted_data: dict,
+                                   encryption_method: str = 'AES', data_hash: str = None) -> dict:
+        """Encrypt an already-redacted document and attach metadata from the original"""
+        if not self.session_password:
+            raise ValueError("Session password not set. Call set_session_password() first.")
+        
+        # Convert to JSON for encryption
+        data_json = json.dumps(redacted_data, default=str)
+        
+        # Encrypt based on method
+        if encryption_method.upper() == 'AES':
+            encryption_result = self.encryption_manager.encrypt_aes_256(
+                data_json, 
+                self.session_password
+            )
+        else:
+            raise ValueError(f"Unsupported encryption method: {encryption_method}")
+        
+        # Add metadata (the user id hash is deterministic so records key per user)
+        encryption_result['original_game'] = game_data['game_name']
+        encryption_result['user_id_hash'] = self.encryption_manager.hash_user_id(
+            game_data['user_id']
+        )
+        encryption_result['encryption_method'] = encryption_method
+        encryption_result['data_hash'] = data_hash or self.compute_data_hash(game_data)
+        encryption_result['field_count'] = len(game_data)
+        encryption_result['sensitive_fields_hashed'] = redacted_data.get('_redaction', {}).get('hashed_fields', 0)
+        
+        return encryption_result
+    
     def encrypt_game_data(self, game_data: dict, encryption_method: str = 'AES') -> dict:
         """Encrypt game data using specified method"""
         if not self.session_password:
             raise ValueError("Session password not set. Call set_session_password() first.")
         
+        # Reject malformed documents before paying for key derivation and encryption
+        self.validator.validate(game_data)
+        
         try:
-            # Separate sensitive and non-sensitive data
-            sensitive_fields = ['auth_token', 'session_key', 'api_credentials']
-            encrypted_data = game_data.copy()
-            
-            # Hash sensitive fields
-            if 'sensitive_data' in game_data:
-                for field, value in game_data['sensitive_data'].items():
-                    if field in sensitive_fields:
-                        # Hash sensitive tokens/credentials
-                        hash_info = self.encryption_manager.hash_blake3(str(value))
-                        encrypted_data['sensitive_data'][f"{field}_hash"] = hash_info
-                        # Remove original sensitive data
-                        del encrypted_data['sensitive_data'][field]
-            
-            # Convert to JSON for encryption
-            data_json = json.dumps(encrypted_data, default=str)
-            
-            # Encrypt based on method
-            if encryption_method.upper() == 'AES':
-                encryption_result = self.encryption_manager.encrypt_aes_256(
-                    data_json, 
-                    self.session_password
-                )
-            else:
-                raise ValueError(f"Unsupported encryption method: {encryption_method}")
-            
-            # Add metadata
-            encryption_result['original_game'] = game_data['game_name']
-            encryption_result['user_id_hash'] = self.encryption_manager.hash_sha256(
-                game_data['user_id']
-            )['hash']
-            encryption_result['encryption_method'] = encryption_method
-            
-            return encryption_result
+            data_hash = self.compute_data_hash(game_data)
+            redacted_data = self.redact_game_data(game_data)
+            return self.encrypt_redacted_game_data(
+                game_data, redacted_data, encryption_method, data_hash=data_hash
+            )
         
         except Exception as e:
             raise Exception(f"Game data encryption failed: {str(e)}")
     
-    def decrypt_game_data(self, encrypted_data: dict) -> dict:
+    def decrypt_game_data(self, encrypted_data: dict, client_id: str = None) -> dict:
         """Decrypt game data"""
         if not self.session_password:
             raise ValueError("Session password not set. Call set_session_password() first.")
         
         try:
+            # Every decrypt runs a PBKDF2 derivation, so charge it to the record owner
+            self.rate_limiter.acquire(encrypted_data.get('user_id_hash', 'anonymous'), client_id)
+            
             encryption_method = encrypted_data.get('encryption_method', 'AES')
             
             if encryption_method == 'AES':
@@ -305,29 +419,70 @@ class GameDataSecurityManager:
         except Exception as e:
             raise Exception(f"Game data decryption failed: {str(e)}")
     
-    def secure_login_flow(self, user_id: str, password: str) -> dict:
-        """Complete secure login flow with game detection and data encryption"""
+    def _authenticate(self, user_id: str, password: str, client_id: str = None,
+                      register: bool = False) -> str:
+        """Check password policy, rate limits and the stored verifier; returns the user key
+        
+        With register=True the user is enrolled instead, failing if the user ID is already taken.
+        """
+        # Reject passwords from known breach corpora before spending any KDF work
+        if self.breach_checker and self.breach_checker.is_breached(password):
+            raise ValueError(
+                "This password appears in a known data breach. Please choose a different password."
+            )
+        
+        # Weak passwords are rejected here too, so no PBKDF2/Argon2 run is spent on them
+        acceptable, strength = is_password_acceptable(password, user_inputs=[user_id])
+        if not acceptable:
+            raise ValueError(
+                f"Password is too weak: {strength['feedback']['warning'] or 'add more words or characters.'}"
+            )
+        
+        user_key = self.encryption_manager.hash_user_id(user_id)
+        
+        # Bound KDF work per user, per client and process-wide before hashing anything
+        self.rate_limiter.acquire(user_key, client_id)
+        
+        if register:
+            if not self.verifier_store.register(user_key, password):
+                raise ValueError("This user ID is already registered")
+        # Verify the credential before any game data is touched
+        elif not self.verifier_store.verify(user_key, password):
+            raise ValueError("Invalid user ID or password")
+        
+        # Set session password for encryption
+        self.set_session_password(password)
+        return user_key
+    
+    def secure_login_flow(self, user_id: str, password: str, client_id: str = None,
+                          database=None, last_game: str = None, register: bool = False) -> dict:
+        """Complete secure login flow with game detection and data encryption
+        
+        After authentication the login runs through the staged pipeline
+        (detect, fetch, redact, encrypt, persist, audit); persist and audit
+        only run when a database is given. register=True creates the account first.
+        """
         try:
-            # Set session password for encryption
-            self.set_session_password(password)
+            user_id_hash = self._authenticate(user_id, password, client_id, register)
             
-            # Simulate user session data
+            # User session data (last_game is filled in by platform integrations when available)
             user_session = {
                 'user_id': user_id,
-                'login_time': datetime.utcnow().isoformat(),
-                'last_game': 'Valorant'  # Would come from actual detection
+                'login_time': datetime.utcnow().isoformat()
             }
+            if last_game:
+                user_session['last_game'] = last_game
             
-            # Step 1: Detect current game
-            current_game = self.detect_current_game(user_session)
-            
-            # Step 2: Retrieve game data
-            game_data = self.retrieve_game_data(user_id, current_game)
+            pipeline = self.login_pipeline or get_default_login_pipeline()
+            job = pipeline.process(self, user_id, user_id_hash, user_session, database)
+            if job['error'] is not None:
+                raise job['error']
             
-            # Step 3: Encrypt the data
-            encrypted_data = self.encrypt_game_data(game_data, 'AES')
+            current_game = job['game_name']
+            encrypted_data = job['encrypted_data']
+            sync_result = job.get('sync_result')
             
-            # Step 4: Prepare secure response
+            # Prepare secure response
             secure_response = {
                 'status': 'success',
                 'user_id_hash': encrypted_data['user_id_hash'],
@@ -340,13 +495,26 @@ class GameDataSecurityManager:
                     'security_level': 'high'
                 },
                 'data_summary': {
-                    'total_fields_encrypted': len(game_data),
-                    'sensitive_fields_hashed': 3,
+                    'total_fields_encrypted': encrypted_data.get('field_count', 0),
+                    'sensitive_fields_hashed': encrypted_data.get('sensitive_fields_hashed', 0),
                     'encryption_key_strength': '256-bit',
                     'authentication_method': 'PBKDF2-SHA256'
+                },
+                'stage_timings_ms': {
+                    name: round(seconds * 1000, 2) for name, seconds in job['stage_timings'].items()
                 }
             }
             
+            if database is not None:
+                secure_response['data_stored'] = job.get('persisted', False)
+            
+            if sync_result is not None:
+                secure_response['sync'] = {
+                    'status': sync_result['status'],
+                    'persisted': sync_result.get('persisted', sync_result['status'] == 'unchanged'),
+                    'sources': sync_result['sources']
+                }
+            
             return secure_response
         
         except Exception as e:
@@ -359,6 +527,123 @@ class GameDataSecurityManager:
                 }
             }
 
+    def detect_user_games(self, user_id: str, user_session: dict, database=None) -> list:
+        """Detect every running game plus the games the user owns on any source"""
+        games = []
+        if self.game_detector.available:
+            games.extend(self.game_detector.running_games())
+        if user_session.get('last_game'):
+            games.append(user_session['last_game'])
+        if self.connector_registry:
+            games.extend(self.connector_registry.owned_games(user_id))
+        if database is not None:
+            user_id_hash = self.encryption_manager.hash_user_id(user_id)
+            # Metadata-only listing: no ciphertext crosses the wire just to learn game names
+            cursor = None
+            while True:
+                page = database.list_game_data(user_id_hash, limit=100, cursor=cursor)
+                games.extend(item['game_name'] for item in page['items'])
+                cursor = page['next_cursor']
+                if cursor is None:
+                    break
+        
+        # De-duplicate while keeping running games first
+        unique_games = list(dict.fromkeys(games))
+        return unique_games or [self.detect_current_game(user_session)]
+    
+    def _secure_one_game(self, user_id: str, game_name: str) -> dict:
+        """Retrieve, hash and encrypt a single game's data"""
+        game_data = self.retrieve_game_data(user_id, game_name)
+        return self.encrypt_game_data(game_data, 'AES')
+    
+    def secure_multi_game_login_flow(self, user_id: str, password: str, client_id: str = None,
+                                     database=None, max_parallel: int = 4, register: bool = False,
+                                     max_games: int = None) -> dict:
+        """Secure login that processes all of a user's games concurrently
+        
+        Games are retrieved and encrypted on a bounded thread pool and persisted in one batched
+        write, so latency tracks the slowest game rather than the sum. Failed games are reported
+        individually while the rest are still returned. Each game's encryption runs a PBKDF2
+        derivation, so every game is charged to the rate limiter before it is submitted, and at
+        most max_games (MULTI_GAME_LOGIN_MAX_GAMES, default 10) are processed per login.
+        """
+        if max_games is None:
+            max_games = int(os.getenv('MULTI_GAME_LOGIN_MAX_GAMES', '10'))
+        try:
+            user_id_hash = self._authenticate(user_id, password, client_id, register)
+            
+            user_session = {
+                'user_id': user_id,
+                'login_time': datetime.utcnow().isoformat()
+            }
+            detected_games = self.detect_user_games(user_id, user_session, database)
+            # Running games come first, so the cap drops owned-but-idle titles
+            games = detected_games[:max_games]
+            
+            results = {}
+            with ThreadPoolExecutor(max_workers=max(1, min(max_parallel, len(games)))) as executor:
+                futures = {}
+                for game in games:
+                    try:
+                        self.rate_limiter.acquire(user_id_hash, client_id)
+                    except RateLimitExceededError as e:
+                        results[game] = {'status': 'error', 'error_message': str(e)}
+                        continue
+                    futures[game] = executor.submit(self._secure_one_game, user_id, game)
+                for game, future in futures.items():
+                    try:
+                        results[game] = {'status': 'success', 'encrypted_data': future.result()}
+                    except Exception as e:
+                        results[game] = {'status': 'error', 'error_message': str(e)}
+            results = {game: results[game] for game in games}
+            
+            succeeded = {game: r['encrypted_data'] for game, r in results.items() if r['status'] == 'success'}
+            
+            persisted = None
+            if database is not None and succeeded:
+                database.create_user(user_id_hash=user_id_hash, username=user_id)
+                persisted = database.store_encrypted_game_data_batch([
+                    {
+                        'user_id_hash': user_id_hash,
+                        'game_name': game,
+                        'encrypted_data': encrypted_data,
+                        'data_hash': encrypted_data['data_hash']
+                    }
+                    for game, encrypted_data in succeeded.items()
+                ])
+            
+            if not succeeded:
+                status = 'error'
+            elif len(succeeded) < len(results):
+                status = 'partial'
+            else:
+                status = 'success'
+            
+            return {
+                'status': status,
+                'user_id_hash': user_id_hash,
+                'detected_games': detected_games,
+                'skipped_games': detected_games[max_games:],
+                'games': results,
+                'persisted': persisted,
+                'data_summary': {
+                    'games_encrypted': len(succeeded),
+                    'games_failed': len(results) - len(succeeded),
+                    'encryption_key_strength': '256-bit',
+                    'authentication_method': 'PBKDF2-SHA256'
+                }
+            }
+        
+        except Exception as e:
+            return {
+                'status': 'error',
+                'error_message': str(e),
+                'security_info': {
+                    'error_logged': True,
+                    'timestamp': datetime.utcnow().isoformat()
+                }
+            }
+
 def verify_encryption_integrity(encrypted_data: dict, password: str) -> bool:
     """Verify the integrity of encrypted data"""
     try:
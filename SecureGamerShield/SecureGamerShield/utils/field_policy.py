@@ -0,0 +1,202 @@
+"""
+Declarative field policies for redacting sensitive game data
+Policies map dotted paths to keep/drop/hash/encrypt and compile once into a single-pass transform
+"""
+
+import os
+import json
+import base64
+import hmac
+import threading
+from typing import Callable, Dict, Optional
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+import blake3
+
+ACTIONS = ('keep', 'drop', 'hash', 'encrypt')
+POLICY_VERSION = '2.0'
+
+# '*' matches any key at its level; the bare '*' entry is the default for unlisted fields
+DEFAULT_GAME_DATA_POLICY = {
+    '*': 'keep',
+    'sensitive_data.auth_token': 'hash',
+    'sensitive_data.session_key': 'hash',
+    'sensitive_data.api_credentials': 'hash',
+}
+
+
+class FieldPolicyError(ValueError):
+    """Raised for invalid policies or when a policy cannot be applied"""
+
+
+class _TransformContext:
+    """Per-document state shared by every field handler during one transform"""
+
+    __slots__ = ('hash_key', 'field_cipher', 'hashed', 'encrypted', 'dropped')
+
+    def __init__(self, hash_key: bytes, field_key: Optional[bytes]):
+        self.hash_key = hash_key
+        self.field_cipher = AESGCM(field_key) if field_key else None
+        self.hashed = 0
+        self.encrypted = 0
+        self.dropped = 0
+
+
+def _clone(value):
+    """Structural copy of JSON-like containers so output never aliases the input"""
+    if isinstance(value, dict):
+        return {key: _clone(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_clone(item) for item in value]
+    return value
+
+
+def _keep(key, value, out, ctx, path):
+    out[key] = _clone(value)
+
+
+def _drop(key, value, out, ctx, path):
+    ctx.dropped += 1
+
+
+def _hash(key, value, out, ctx, path):
+    out[f"{key}_hash"] = blake3.blake3(str(value).encode(), key=ctx.hash_key).hexdigest()
+    ctx.hashed += 1
+
+
+def _encrypt(key, value, out, ctx, path):
+    if ctx.field_cipher is None:
+        raise FieldPolicyError(f"Policy encrypts '{path}' but no field encryption key was supplied")
+    nonce = os.urandom(12)
+    plaintext = json.dumps(value, default=str).encode()
+    ciphertext = ctx.field_cipher.encrypt(nonce, plaintext, path.encode())
+    out[f"{key}_enc"] = base64.b64encode(nonce + ciphertext).decode()
+    ctx.encrypted += 1
+
+
+_LEAF_HANDLERS = {'keep': _keep, 'drop': _drop, 'hash': _hash, 'encrypt': _encrypt}
+
+
+def _parse(policy: Dict[str, str]) -> dict:
+    """Turn dotted paths into a tree of {'action', 'children', 'wildcard'} nodes"""
+    root = {'action': None, 'children': {}, 'wildcard': None}
+    for path, action in policy.items():
+        if action not in ACTIONS:
+            raise FieldPolicyError(f"Unknown action '{action}' for '{path}', expected one of {ACTIONS}")
+        if path == '*':
+            root['action'] = action
+            continue
+
+        node = root
+        for part in path.split('.'):
+            if not part:
+                raise FieldPolicyError(f"Empty path segment in '{path}'")
+            if part == '*':
+                if node['wildcard'] is None:
+                    node['wildcard'] = {'action': None, 'children': {}, 'wildcard': None}
+                node = node['wildcard']
+            else:
+                node = node['children'].setdefault(part, {'action': None, 'children': {}, 'wildcard': None})
+        node['action'] = action
+    return root
+
+
+def _compile_node(node: dict, default_action: str, path: str) -> Callable:
+    """Compile a policy node into handler(key, value, out, ctx, path)"""
+    action = node['action'] or default_action
+    if not node['children'] and node['wildcard'] is None:
+        return _LEAF_HANDLERS[action]
+
+    exact = {
+        key: _compile_node(child, action, f"{path}.{key}" if path else key)
+        for key, child in node['children'].items()
+    }
+    fallback = (
+        _compile_node(node['wildcard'], action, f"{path}.*" if path else '*')
+        if node['wildcard'] is not None else _LEAF_HANDLERS[action]
+    )
+    leaf = _LEAF_HANDLERS[action]
+
+    def transform_level(key, value, out, ctx, parent_path):
+        # Policies with sub-paths only apply when the value is actually a mapping
+        if not isinstance(value, dict):
+            leaf(key, value, out, ctx, parent_path)
+            return
+        level = {}
+        for child_key, child_value in value.items():
+            handler = exact.get(child_key, fallback)
+            handler(child_key, child_value, level, ctx, f"{parent_path}.{child_key}")
+        out[key] = level
+
+    return transform_level
+
+
+class CompiledFieldPolicy:
+    """A field policy compiled into nested closures and applied in one pass"""
+
+    def __init__(self, policy: Dict[str, str] = None):
+        self.policy = dict(policy or DEFAULT_GAME_DATA_POLICY)
+        root = _parse(self.policy)
+        default_action = root['action'] or 'keep'
+        if default_action == 'hash' or default_action == 'encrypt':
+            raise FieldPolicyError("The document-wide default must be 'keep' or 'drop'")
+
+        self._root_exact = {
+            key: _compile_node(child, default_action, key) for key, child in root['children'].items()
+        }
+        self._root_fallback = (
+            _compile_node(root['wildcard'], default_action, '*')
+            if root['wildcard'] is not None else _LEAF_HANDLERS[default_action]
+        )
+
+    def apply(self, document: dict, hash_key: bytes = None, field_key: bytes = None) -> dict:
+        """Return a new redacted document; the input is never modified
+
+        All hashed fields in a document share one random key, recorded under '_redaction'.
+        Re-redacting a document keeps its existing key so earlier hashes stay verifiable.
+        """
+        if hash_key is None:
+            previous = document.get('_redaction')
+            hash_key = bytes.fromhex(previous['hash_key']) if previous else os.urandom(32)
+        ctx = _TransformContext(hash_key, field_key)
+        exact = self._root_exact
+        fallback = self._root_fallback
+
+        out = {}
+        for key, value in document.items():
+            exact.get(key, fallback)(key, value, out, ctx, key)
+
+        out['_redaction'] = {
+            'algorithm': 'BLAKE3-keyed',
+            'hash_key': hash_key.hex(),
+            'policy_version': POLICY_VERSION,
+            'hashed_fields': ctx.hashed,
+            'encrypted_fields': ctx.encrypted,
+            'dropped_fields': ctx.dropped
+        }
+        return out
+
+
+def verify_hashed_field(value, digest: str, redaction_info: dict) -> bool:
+    """Check a plaintext value against a field hashed by CompiledFieldPolicy.apply"""
+    expected = blake3.blake3(
+        str(value).encode(), key=bytes.fromhex(redaction_info['hash_key'])
+    ).hexdigest()
+    return hmac.compare_digest(expected, digest)
+
+
+_default_policy: Optional[CompiledFieldPolicy] = None
+_default_policy_lock = threading.Lock()
+
+
+def get_default_field_policy() -> CompiledFieldPolicy:
+    """Compile the default (or GAME_DATA_FIELD_POLICY JSON file) policy once per process"""
+    global _default_policy
+    with _default_policy_lock:
+        if _default_policy is None:
+            policy_path = os.getenv('GAME_DATA_FIELD_POLICY')
+            if policy_path:
+                with open(policy_path, 'r', encoding='utf-8') as f:
+                    _default_policy = CompiledFieldPolicy(json.load(f))
+            else:
+                _default_policy = CompiledFieldPolicy(DEFAULT_GAME_DATA_POLICY)
+        return _default_policy
@@ -0,0 +1,633 @@
+"""
+Pluggable async connectors for retrieving game data from platforms and save stores
+Fetches every source concurrently on a shared event loop with pooled keep-alive HTTP and ETag/TTL caching
+"""
+
+import os
+import re
+import copy
+import json
+import time
+import hashlib
+import queue
+import asyncio
+import threading
+import http.client
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit, quote
+
+MAX_AGE_RE = re.compile(r'max-age=(\d+)')
+
+
+class ConnectorError(Exception):
+    """Raised when a connector cannot produce data for a game"""
+
+
+class ResponseCache:
+    """LRU cache of HTTP responses keyed by URL, honouring TTLs and keeping ETag validators"""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[str, dict]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'revalidated': 0}
+
+    def get(self, key: str) -> Optional[dict]:
+        """Return the cached entry (fresh or stale) for a key"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def get_fresh(self, key: str) -> Optional[dict]:
+        """Return the cached body only while its TTL has not expired"""
+        entry = self.get(key)
+        with self._lock:
+            if entry is not None and entry['expires_at'] > time.monotonic():
+                self._stats['hits'] += 1
+                return entry
+            self._stats['misses'] += 1
+            return None
+
+    def store(self, key: str, body, etag: str = None, last_modified: str = None, ttl: float = 60):
+        with self._lock:
+            self._entries[key] = {
+                'body': body,
+                'etag': etag,
+                'last_modified': last_modified,
+                'expires_at': time.monotonic() + ttl
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def refresh(self, key: str, ttl: float):
+        """Extend a stale entry after a 304 Not Modified revalidation"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry['expires_at'] = time.monotonic() + ttl
+                self._stats['revalidated'] += 1
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+        return stats
+
+
+class KeepAliveHTTPPool:
+    """Per-origin pools of persistent http.client connections"""
+
+    def __init__(self, max_connections_per_host: int = 8, timeout: float = 10.0):
+        self.max_connections_per_host = max_connections_per_host
+        self.timeout = timeout
+        self._idle: Dict[Tuple[str, str, int], queue.LifoQueue] = {}
+        self._lock = threading.Lock()
+        self._stats = {'connections_opened': 0, 'connections_reused': 0}
+
+    def _pool_for(self, origin: tuple) -> queue.LifoQueue:
+        with self._lock:
+            pool = self._idle.get(origin)
+            if pool is None:
+                pool = queue.LifoQueue(maxsize=self.max_connections_per_host)
+                self._idle[origin] = pool
+            return pool
+
+    def _open(self, origin: tuple) -> http.client.HTTPConnection:
+        scheme, host, port = origin
+        connection_class = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+        with self._lock:
+            self._stats['connections_opened'] += 1
+        return connection_class(host, port, timeout=self.timeout)
+
+    def request(self, method: str, url: str, headers: dict = None, body: bytes = None) -> tuple:
+        """Send a request over a pooled connection; returns (status, headers, body)"""
+        parts = urlsplit(url)
+        scheme = parts.scheme or 'http'
+        origin = (scheme, parts.hostname, parts.port or (443 if scheme == 'https' else 80))
+        path = parts.path or '/'
+        if parts.query:
+            path = f"{path}?{parts.query}"
+        pool = self._pool_for(origin)
+
+        try:
+            connection = pool.get_nowait()
+            reused = True
+        except queue.Empty:
+            connection = self._open(origin)
+            reused = False
+
+        for attempt in range(2):
+            try:
+                connection.request(method, path, body=body, headers=headers or {})
+                response = connection.getresponse()
+                payload = response.read()
+                break
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                connection.close()
+                # A reused keep-alive connection may have been closed by the server; retry once
+                if attempt or not reused:
+                    raise
+                connection = self._open(origin)
+                reused = False
+            except Exception:
+                connection.close()
+                raise
+
+        if reused:
+            with self._lock:
+                self._stats['connections_reused'] += 1
+
+        if response.will_close:
+            connection.close()
+        else:
+            try:
+                pool.put_nowait(connection)
+            except queue.Full:
+                connection.close()
+
+        return response.status, {k.lower(): v for k, v in response.getheaders()}, payload
+
+    def close(self):
+        with self._lock:
+            pools = list(self._idle.values())
+            self._idle.clear()
+        for pool in pools:
+            while True:
+                try:
+                    pool.get_nowait().close()
+                except queue.Empty:
+                    break
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats)
+
+
+class AsyncHTTPClient:
+    """Async JSON client over a keep-alive pool with conditional-request caching"""
+
+    def __init__(self, pool: KeepAliveHTTPPool = None, cache: ResponseCache = None,
+                 default_ttl: float = 60):
+        self.pool = pool or KeepAliveHTTPPool()
+        self.cache = cache or ResponseCache()
+        self.default_ttl = default_ttl
+
+    def _ttl_from(self, headers: dict, ttl: float = None) -> float:
+        found = MAX_AGE_RE.search(headers.get('cache-control', ''))
+        if found:
+            return float(found.group(1))
+        return self.default_ttl if ttl is None else ttl
+
+    async def get_json(self, url: str, headers: dict = None, ttl: float = None):
+        """GET a JSON document, serving fresh cache hits and revalidating stale ones with ETags"""
+        cached = self.cache.get_fresh(url)
+        if cached is not None:
+            return cached['body']
+
+        request_headers = {'Accept': 'application/json', 'Connection': 'keep-alive'}
+        request_headers.update(headers or {})
+        stale = self.cache.get(url)
+        if stale is not None:
+            if stale['etag']:
+                request_headers['If-None-Match'] = stale['etag']
+            if stale['last_modified']:
+                request_headers['If-Modified-Since'] = stale['last_modified']
+
+        status, response_headers, payload = await asyncio.to_thread(
+            self.pool.request, 'GET', url, request_headers
+        )
+
+        if status == 304 and stale is not None:
+            self.cache.refresh(url, self._ttl_from(response_headers, ttl))
+            return stale['body']
+        if status != 200:
+            raise ConnectorError(f"GET {urlsplit(url).path} returned HTTP {status}")
+
+        body = json.loads(payload) if payload else {}
+        if 'no-store' not in response_headers.get('cache-control', ''):
+            self.cache.store(
+                url, body,
+                etag=response_headers.get('etag'),
+                last_modified=response_headers.get('last-modified'),
+                ttl=self._ttl_from(response_headers, ttl)
+            )
+        return body
+
+    async def get_json_conditional(self, url: str, headers: dict = None,
+                                   etag: str = None, last_modified: str = None) -> tuple:
+        """Uncached conditional GET against caller-held validators; returns (status, body, headers)"""
+        request_headers = {'Accept': 'application/json', 'Connection': 'keep-alive'}
+        request_headers.update(headers or {})
+        if etag:
+            request_headers['If-None-Match'] = etag
+        if last_modified:
+            request_headers['If-Modified-Since'] = last_modified
+
+        status, response_headers, payload = await asyncio.to_thread(
+            self.pool.request, 'GET', url, request_headers
+        )
+        if status == 304:
+            return status, None, response_headers
+        if status != 200:
+            raise ConnectorError(f"GET {urlsplit(url).path} returned HTTP {status}")
+        return status, (json.loads(payload) if payload else {}), response_headers
+
+
+def hash_fragment(data: dict) -> str:
+    """Stable content hash of a connector fragment"""
+    return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class GameDataConnector:
+    """Base class for a single game-data source"""
+
+    name = 'base'
+    max_concurrency = 4
+
+    def supports(self, game_name: str) -> bool:
+        return True
+
+    async def fetch(self, user_id: str, game_name: str) -> dict:
+        """Return a partial game document to merge into the retrieved record"""
+        raise NotImplementedError
+
+    async def owned_games(self, user_id: str) -> List[str]:
+        """Games this source knows the user owns; sources without a library return none"""
+        return []
+
+    async def fetch_delta(self, user_id: str, game_name: str, watermark: dict = None) -> dict:
+        """Return {'changed', 'data', 'watermark'} relative to a stored watermark
+
+        The default re-fetches and compares content hashes; sources with validators or cursors override it.
+        """
+        data = await self.fetch(user_id, game_name)
+        content_hash = hash_fragment(data)
+        if watermark and watermark.get('content_hash') == content_hash:
+            return {'changed': False, 'data': {}, 'watermark': watermark}
+        return {'changed': True, 'data': data, 'watermark': {'content_hash': content_hash}}
+
+
+class HTTPJSONConnector(GameDataConnector):
+    """Connector for a JSON HTTP endpoint described by a URL template and a response mapper"""
+
+    path_template = '/users/{user_id}/games/{game}'
+    # Query parameter carrying the sync cursor for sources that serve deltas
+    cursor_param = None
+
+    def __init__(self, base_url: str, client: AsyncHTTPClient, headers: dict = None,
+                 ttl: float = 60, max_concurrency: int = None):
+        self.base_url = base_url.rstrip('/')
+        self.client = client
+        self.headers = headers or {}
+        self.ttl = ttl
+        if max_concurrency is not None:
+            self.max_concurrency = max_concurrency
+
+    def build_url(self, user_id: str, game_name: str) -> str:
+        return self.base_url + self.path_template.format(
+            user_id=quote(user_id, safe=''), game=quote(game_name, safe='')
+        )
+
+    def map_response(self, body: dict) -> dict:
+        """Translate the source's response into game-document fields"""
+        return {
+            key: body[key]
+            for key in ('progress', 'scores', 'settings', 'sensitive_data')
+            if isinstance(body.get(key), dict)
+        }
+
+    async def fetch(self, user_id: str, game_name: str) -> dict:
+        body = await self.client.get_json(self.build_url(user_id, game_name), self.headers, self.ttl)
+        return self.map_response(body)
+
+    async def fetch_delta(self, user_id: str, game_name: str, watermark: dict = None) -> dict:
+        watermark = watermark or {}
+        url = self.build_url(user_id, game_name)
+        if self.cursor_param and watermark.get('cursor'):
+            separator = '&' if '?' in url else '?'
+            url = f"{url}{separator}{self.cursor_param}={quote(str(watermark['cursor']), safe='')}"
+
+        status, body, headers = await self.client.get_json_conditional(
+            url, self.headers, watermark.get('etag'), watermark.get('last_modified')
+        )
+        if status == 304:
+            return {'changed': False, 'data': {}, 'watermark': watermark}
+
+        data = self.map_response(body)
+        new_watermark = {
+            'etag': headers.get('etag'),
+            'last_modified': headers.get('last-modified'),
+            'cursor': body.get('next_cursor', watermark.get('cursor')) if self.cursor_param else None,
+            'content_hash': hash_fragment(data)
+        }
+        changed = bool(data) and new_watermark['content_hash'] != watermark.get('content_hash')
+        return {'changed': changed, 'data': data if changed else {}, 'watermark': new_watermark}
+
+
+class SteamConnector(HTTPJSONConnector):
+    """Steam Web API user stats for titles with a known app id"""
+
+    name = 'steam'
+    path_template = '/ISteamUserStats/GetUserStatsForGame/v0002/?appid={appid}&key={key}&steamid={user_id}'
+    APP_IDS = {
+        "Counter-Strike 2": 730,
+        "Dota 2": 570,
+        "Apex Legends": 1172470,
+        "Rocket League": 252950,
+        "Among Us": 945360,
+    }
+
+    def __init__(self, api_key: str, client: AsyncHTTPClient,
+                 base_url: str = 'https://api.steampowered.com', **kwargs):
+        super().__init__(base_url, client, **kwargs)
+        self.api_key = api_key
+
+    def supports(self, game_name: str) -> bool:
+        return game_name in self.APP_IDS
+
+    def build_url(self, user_id: str, game_name: str) -> str:
+        return self.base_url + self.path_template.format(
+            appid=self.APP_IDS[game_name], key=quote(self.api_key, safe=''),
+            user_id=quote(user_id, safe='')
+        )
+
+    async def owned_games(self, user_id: str) -> List[str]:
+        url = (
+            f"{self.base_url}/IPlayerService/GetOwnedGames/v0001/"
+            f"?key={quote(self.api_key, safe='')}&steamid={quote(user_id, safe='')}&format=json"
+        )
+        body = await self.client.get_json(url, ttl=3600)
+        names = {appid: name for name, appid in self.APP_IDS.items()}
+        return [
+            names[game['appid']] for game in body.get('response', {}).get('games', [])
+            if game.get('appid') in names
+        ]
+
+    def map_response(self, body: dict) -> dict:
+        stats = body.get('playerstats', {})
+        return {
+            'progress': {'achievements_unlocked': len(stats.get('achievements', []))},
+            'scores': {item['name']: item['value'] for item in stats.get('stats', [])}
+        }
+
+
+class XboxLiveConnector(HTTPJSONConnector):
+    """Xbox Live title progress through a JSON gateway authenticated with a bearer token"""
+
+    name = 'xbox'
+    path_template = '/titles/{game}/players/{user_id}/progress'
+
+    def __init__(self, token: str, client: AsyncHTTPClient, base_url: str, **kwargs):
+        super().__init__(base_url, client, headers={'Authorization': f"Bearer {token}"}, **kwargs)
+
+
+class PSNConnector(HTTPJSONConnector):
+    """PlayStation Network trophies and stats through a JSON gateway"""
+
+    name = 'psn'
+    path_template = '/users/{user_id}/titles/{game}/trophies'
+
+    def __init__(self, token: str, client: AsyncHTTPClient, base_url: str, **kwargs):
+        super().__init__(base_url, client, headers={'Authorization': f"Bearer {token}"}, **kwargs)
+
+
+class CloudSaveConnector(HTTPJSONConnector):
+    """Cloud save metadata and settings stored by the game publisher"""
+
+    name = 'cloud_save'
+    path_template = '/saves/{user_id}/{game}'
+    cursor_param = 'since'
+
+
+class LocalSaveFileConnector(GameDataConnector):
+    """Reads JSON save files from `<save_dir>/<game>/<user_id>.json`"""
+
+    name = 'local_files'
+    max_concurrency = 2
+
+    def __init__(self, save_dir: str):
+        self.save_dir = save_dir
+
+    def _path(self, user_id: str, game_name: str) -> str:
+        safe = lambda value: re.sub(r'[^A-Za-z0-9._ -]', '_', value)
+        return os.path.join(self.save_dir, safe(game_name), f"{safe(user_id)}.json")
+
+    def supports(self, game_name: str) -> bool:
+        return os.path.isdir(os.path.join(self.save_dir, re.sub(r'[^A-Za-z0-9._ -]', '_', game_name)))
+
+    def _scan_owned(self, user_id: str) -> List[str]:
+        try:
+            entries = list(os.scandir(self.save_dir))
+        except OSError:
+            return []
+        filename = os.path.basename(self._path(user_id, ''))
+        return [
+            entry.name for entry in entries
+            if entry.is_dir() and os.path.exists(os.path.join(entry.path, filename))
+        ]
+
+    async def owned_games(self, user_id: str) -> List[str]:
+        return await asyncio.to_thread(self._scan_owned, user_id)
+
+    def _read(self, path: str) -> dict:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            raise ConnectorError(f"Unreadable save file: {str(e)}")
+
+    async def fetch(self, user_id: str, game_name: str) -> dict:
+        return await asyncio.to_thread(self._read, self._path(user_id, game_name))
+
+    async def fetch_delta(self, user_id: str, game_name: str, watermark: dict = None) -> dict:
+        watermark = watermark or {}
+        path = self._path(user_id, game_name)
+        try:
+            modified = str(os.stat(path).st_mtime_ns)
+        except FileNotFoundError:
+            return {'changed': False, 'data': {}, 'watermark': watermark}
+
+        # The file's mtime is the watermark: unchanged saves are never read
+        if modified == watermark.get('last_modified'):
+            return {'changed': False, 'data': {}, 'watermark': watermark}
+
+        data = await asyncio.to_thread(self._read, path)
+        content_hash = hash_fragment(data)
+        return {
+            'changed': content_hash != watermark.get('content_hash'),
+            'data': data,
+            'watermark': {'last_modified': modified, 'content_hash': content_hash}
+        }
+
+
+def merge_documents(target: dict, fragment: dict) -> dict:
+    """Recursively merge a fragment into a document in place, copying so cached bodies stay untouched"""
+    for key, value in fragment.items():
+        if isinstance(value, dict) and isinstance(target.get(key), dict):
+            merge_documents(target[key], value)
+        else:
+            target[key] = copy.deepcopy(value)
+    return target
+
+
+class ConnectorRegistry:
+    """Runs registered connectors concurrently on a dedicated event loop thread
+
+    The loop is shared by every session, so per-source semaphores bound concurrency process-wide.
+    """
+
+    def __init__(self, source_timeout: float = 10.0):
+        self.source_timeout = source_timeout
+        self._connectors: Dict[str, GameDataConnector] = {}
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    def register(self, connector: GameDataConnector):
+        with self._lock:
+            self._connectors[connector.name] = connector
+
+    def connectors(self) -> List[GameDataConnector]:
+        with self._lock:
+            return list(self._connectors.values())
+
+    def __bool__(self) -> bool:
+        return bool(self._connectors)
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=loop.run_forever, name='game-connectors', daemon=True
+                ).start()
+                self._loop = loop
+            return self._loop
+
+    def _semaphore_for(self, connector: GameDataConnector) -> asyncio.Semaphore:
+        # Only called on the registry loop, so no locking is needed
+        semaphore = self._semaphores.get(connector.name)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(connector.max_concurrency)
+            self._semaphores[connector.name] = semaphore
+        return semaphore
+
+    async def _run_one(self, connector: GameDataConnector, make_call) -> dict:
+        started = time.monotonic()
+        try:
+            async with self._semaphore_for(connector):
+                data = await asyncio.wait_for(make_call(), self.source_timeout)
+            return {'status': 'ok', 'data': data, 'elapsed_seconds': time.monotonic() - started}
+        except asyncio.TimeoutError:
+            error = f"timed out after {self.source_timeout:.1f}s"
+        except Exception as e:
+            error = str(e)
+        return {'status': 'error', 'error': error, 'elapsed_seconds': time.monotonic() - started}
+
+    async def fetch_all_async(self, user_id: str, game_name: str) -> Dict[str, dict]:
+        """Fetch from every connector that supports the game, concurrently"""
+        connectors = [c for c in self.connectors() if c.supports(game_name)]
+        results = await asyncio.gather(*(
+            self._run_one(c, lambda c=c: c.fetch(user_id, game_name)) for c in connectors
+        ))
+        return {connector.name: result for connector, result in zip(connectors, results)}
+
+    async def fetch_deltas_async(self, user_id: str, game_name: str,
+                                 watermarks: Dict[str, dict]) -> Dict[str, dict]:
+        """Fetch only what changed since each source's watermark, concurrently"""
+        connectors = [c for c in self.connectors() if c.supports(game_name)]
+        results = await asyncio.gather(*(
+            self._run_one(c, lambda c=c: c.fetch_delta(user_id, game_name, watermarks.get(c.name)))
+            for c in connectors
+        ))
+        return {connector.name: result for connector, result in zip(connectors, results)}
+
+    async def owned_games_async(self, user_id: str) -> List[str]:
+        """Union of the games every source reports the user owns, in first-seen order"""
+        connectors = self.connectors()
+        results = await asyncio.gather(*(
+            self._run_one(c, lambda c=c: c.owned_games(user_id)) for c in connectors
+        ))
+        games = []
+        for result in results:
+            for game in result.get('data') or []:
+                if game not in games:
+                    games.append(game)
+        return games
+
+    def owned_games(self, user_id: str) -> List[str]:
+        """Blocking wrapper around owned_games_async"""
+        return self._run_blocking(self.owned_games_async(user_id))
+
+    def _run_blocking(self, coroutine):
+        future = asyncio.run_coroutine_threadsafe(coroutine, self._ensure_loop())
+        return future.result(timeout=self.source_timeout + 5)
+
+    def fetch_all(self, user_id: str, game_name: str) -> Dict[str, dict]:
+        """Blocking wrapper for callers outside the registry loop"""
+        return self._run_blocking(self.fetch_all_async(user_id, game_name))
+
+    def fetch_deltas(self, user_id: str, game_name: str, watermarks: Dict[str, dict]) -> Dict[str, dict]:
+        """Blocking wrapper around fetch_deltas_async"""
+        return self._run_blocking(self.fetch_deltas_async(user_id, game_name, watermarks))
+
+
+def build_default_registry(client: AsyncHTTPClient = None) -> ConnectorRegistry:
+    """Register every connector configured through environment variables"""
+    client = client or AsyncHTTPClient(
+        KeepAliveHTTPPool(int(os.getenv('CONNECTOR_POOL_SIZE', '8'))),
+        ResponseCache(),
+        default_ttl=float(os.getenv('CONNECTOR_CACHE_TTL', '60'))
+    )
+    registry = ConnectorRegistry(float(os.getenv('CONNECTOR_TIMEOUT', '10')))
+
+    if os.getenv('STEAM_API_KEY'):
+        registry.register(SteamConnector(
+            os.environ['STEAM_API_KEY'], client,
+            base_url=os.getenv('STEAM_API_BASE_URL', 'https://api.steampowered.com')
+        ))
+    if os.getenv('XBOX_API_TOKEN') and os.getenv('XBOX_API_BASE_URL'):
+        registry.register(XboxLiveConnector(
+            os.environ['XBOX_API_TOKEN'], client, os.environ['XBOX_API_BASE_URL']
+        ))
+    if os.getenv('PSN_ACCESS_TOKEN') and os.getenv('PSN_API_BASE_URL'):
+        registry.register(PSNConnector(
+            os.environ['PSN_ACCESS_TOKEN'], client, os.environ['PSN_API_BASE_URL']
+        ))
+    if os.getenv('CLOUD_SAVE_BASE_URL'):
+        registry.register(CloudSaveConnector(os.environ['CLOUD_SAVE_BASE_URL'], client))
+    if os.getenv('LOCAL_SAVE_DIR'):
+        registry.register(LocalSaveFileConnector(os.environ['LOCAL_SAVE_DIR']))
+
+    return registry
+
+
+_default_registry: Optional[ConnectorRegistry] = None
+_default_registry_lock = threading.Lock()
+
+
+def get_default_connector_registry() -> ConnectorRegistry:
+    """Return the process-wide registry so pools, caches and limits are shared"""
+    global _default_registry
+    with _default_registry_lock:
+        if _default_registry is None:
+            _default_registry = build_default_registry()
+        return _default_registry
+
+
+def retrieved_metadata(source_results: Dict[str, dict]) -> dict:
+    """Summarise per-source outcomes for the game document's metadata block"""
+    return {
+        'retrieved_at': datetime.utcnow().isoformat(),
+        'sources': {
+            name: {'status': result['status'], 'error': result.get('error')}
+            for name, result in source_results.items()
+        }
+    }
@@ -0,0 +1,232 @@
+"""
+Schema validation for game data documents
+The declarative schema is compiled once into checking closures that report every violation in one pass
+"""
+
+import os
+import threading
+from typing import Callable, List, Optional, Tuple
+
+# Node types: 'string', 'integer', 'number', 'boolean', 'scalar', 'object', 'json'.
+# 'json' accepts any JSON-serializable value and only enforces the size and depth limits.
+GAME_DATA_SCHEMA = {
+    'type': 'object',
+    'required': ['user_id', 'game_name'],
+    'properties': {
+        'user_id': {'type': 'string', 'min_length': 1, 'max_length': 256},
+        'game_name': {'type': 'string', 'min_length': 1, 'max_length': 128},
+        'progress': {
+            'type': 'object',
+            'properties': {
+                'level': {'type': 'integer', 'minimum': 0},
+                'experience_points': {'type': 'integer', 'minimum': 0},
+                'achievements_unlocked': {'type': 'integer', 'minimum': 0},
+                'total_playtime_hours': {'type': 'number', 'minimum': 0},
+                'last_played': {'type': 'string', 'max_length': 64}
+            },
+            'additional': {'type': 'json'}
+        },
+        'scores': {'type': 'object', 'additional': {'type': 'json'}},
+        'settings': {'type': 'object', 'additional': {'type': 'json'}},
+        'sensitive_data': {'type': 'object', 'additional': {'type': 'json'}},
+        'metadata': {'type': 'object', 'additional': {'type': 'json'}},
+        '_redaction': {'type': 'object', 'additional': {'type': 'json'}}
+    },
+    # Local save files may contribute extra top-level sections
+    'additional': {'type': 'json'}
+}
+
+DEFAULT_MAX_BYTES = 1024 * 1024
+DEFAULT_MAX_DEPTH = 16
+
+
+class GameDataValidationError(ValueError):
+    """Raised with every schema violation found in a document"""
+
+    def __init__(self, errors: List[Tuple[str, str]]):
+        self.errors = errors
+        summary = '; '.join(f"{path}: {message}" for path, message in errors[:10])
+        if len(errors) > 10:
+            summary += f"; ... {len(errors) - 10} more"
+        super().__init__(f"Invalid game data ({len(errors)} violations): {summary}")
+
+
+class _Budget:
+    """Approximate serialized size remaining while walking a document"""
+
+    __slots__ = ('remaining',)
+
+    def __init__(self, max_bytes: int):
+        self.remaining = max_bytes
+
+
+def _type_name(value) -> str:
+    return type(value).__name__
+
+
+def _compile_json(max_depth: int) -> Callable:
+    """Checker for free-form JSON values: types, depth and size only"""
+
+    def check_json(value, path, errors, budget, depth):
+        if depth > max_depth:
+            errors.append((path, f"nested deeper than {max_depth} levels"))
+            return
+        if budget.remaining < 0:
+            # Oversized documents are rejected without walking the rest of them
+            return
+        if isinstance(value, str):
+            budget.remaining -= len(value) + 2
+        elif isinstance(value, dict):
+            budget.remaining -= 2
+            for key, item in value.items():
+                if budget.remaining < 0:
+                    return
+                if not isinstance(key, str):
+                    errors.append((path, f"non-string key {key!r}"))
+                    continue
+                budget.remaining -= len(key) + 4
+                check_json(item, f"{path}.{key}", errors, budget, depth + 1)
+        elif isinstance(value, (list, tuple)):
+            budget.remaining -= 2
+            for index, item in enumerate(value):
+                if budget.remaining < 0:
+                    return
+                check_json(item, f"{path}[{index}]", errors, budget, depth + 1)
+        elif value is None or isinstance(value, (bool, int, float)):
+            budget.remaining -= 8
+        else:
+            errors.append((path, f"unsupported type {_type_name(value)}"))
+
+    return check_json
+
+
+def _compile_node(schema: dict, max_depth: int) -> Callable:
+    """Compile one schema node into check(value, path, errors, budget, depth)"""
+    node_type = schema.get('type', 'json')
+
+    if node_type == 'json':
+        return _compile_json(max_depth)
+
+    if node_type == 'object':
+        properties = {
+            key: _compile_node(child, max_depth) for key, child in schema.get('properties', {}).items()
+        }
+        required = tuple(schema.get('required', ()))
+        additional = schema.get('additional')
+        additional_check = _compile_node(additional, max_depth) if additional else None
+
+        def check_object(value, path, errors, budget, depth):
+            if not isinstance(value, dict):
+                errors.append((path, f"expected object, got {_type_name(value)}"))
+                return
+            if depth > max_depth:
+                errors.append((path, f"nested deeper than {max_depth} levels"))
+                return
+            if budget.remaining < 0:
+                return
+            for key in required:
+                if key not in value:
+                    errors.append((f"{path}.{key}", "required field missing"))
+            budget.remaining -= 2
+            for key, item in value.items():
+                if budget.remaining < 0:
+                    return
+                if not isinstance(key, str):
+                    errors.append((path, f"non-string key {key!r}"))
+                    continue
+                budget.remaining -= len(key) + 4
+                check = properties.get(key, additional_check)
+                if check is None:
+                    errors.append((f"{path}.{key}", "unexpected field"))
+                else:
+                    check(item, f"{path}.{key}", errors, budget, depth + 1)
+
+        return check_object
+
+    if node_type == 'string':
+        min_length = schema.get('min_length', 0)
+        max_length = schema.get('max_length')
+
+        def check_string(value, path, errors, budget, depth):
+            if not isinstance(value, str):
+                errors.append((path, f"expected string, got {_type_name(value)}"))
+                return
+            budget.remaining -= len(value) + 2
+            if len(value) < min_length:
+                errors.append((path, f"shorter than {min_length} characters"))
+            elif max_length is not None and len(value) > max_length:
+                errors.append((path, f"longer than {max_length} characters"))
+
+        return check_string
+
+    if node_type in ('integer', 'number'):
+        # bool is an int subclass but never a valid count or score
+        accepted = int if node_type == 'integer' else (int, float)
+        minimum = schema.get('minimum')
+        maximum = schema.get('maximum')
+
+        def check_number(value, path, errors, budget, depth):
+            if isinstance(value, bool) or not isinstance(value, accepted):
+                errors.append((path, f"expected {node_type}, got {_type_name(value)}"))
+                return
+            budget.remaining -= 8
+            if minimum is not None and value < minimum:
+                errors.append((path, f"below minimum {minimum}"))
+            elif maximum is not None and value > maximum:
+                errors.append((path, f"above maximum {maximum}"))
+
+        return check_number
+
+    if node_type in ('boolean', 'scalar'):
+        accepted = bool if node_type == 'boolean' else (str, int, float, bool)
+
+        def check_scalar(value, path, errors, budget, depth):
+            if not isinstance(value, accepted):
+                errors.append((path, f"expected {node_type}, got {_type_name(value)}"))
+                return
+            budget.remaining -= len(value) + 2 if isinstance(value, str) else 8
+
+        return check_scalar
+
+    raise ValueError(f"Unknown schema type: {node_type}")
+
+
+class GameDataValidator:
+    """A game data schema compiled once into nested checking closures"""
+
+    def __init__(self, schema: dict = None, max_bytes: int = DEFAULT_MAX_BYTES,
+                 max_depth: int = DEFAULT_MAX_DEPTH):
+        self.schema = schema or GAME_DATA_SCHEMA
+        self.max_bytes = max_bytes
+        self.max_depth = max_depth
+        self._check = _compile_node(self.schema, max_depth)
+
+    def errors(self, document) -> List[Tuple[str, str]]:
+        """Return every (path, message) violation; empty when the document is valid"""
+        errors: List[Tuple[str, str]] = []
+        budget = _Budget(self.max_bytes)
+        self._check(document, '$', errors, budget, 0)
+        if budget.remaining < 0:
+            errors.append(('$', f"document larger than {self.max_bytes} bytes"))
+        return errors
+
+    def validate(self, document):
+        """Raise GameDataValidationError listing all violations"""
+        errors = self.errors(document)
+        if errors:
+            raise GameDataValidationError(errors)
+
+
+_default_validator: Optional[GameDataValidator] = None
+_default_validator_lock = threading.Lock()
+
+
+def get_default_game_data_validator() -> GameDataValidator:
+    """Return the process-wide validator, sized by GAME_DATA_MAX_BYTES"""
+    global _default_validator
+    with _default_validator_lock:
+        if _default_validator is None:
+            _default_validator = GameDataValidator(
+                max_bytes=int(os.getenv('GAME_DATA_MAX_BYTES', str(DEFAULT_MAX_BYTES)))
+            )
+        return _default_validator
@@ -0,0 +1,133 @@
+"""
+Incremental game data synchronisation
+Fetches only per-source deltas since stored watermarks and re-encrypts only when content changed
+"""
+
+import copy
+from typing import Dict, Optional, Tuple
+from utils.game_connectors import (
+    ConnectorError, ConnectorRegistry, get_default_connector_registry, merge_documents,
+    retrieved_metadata
+)
+
+
+def apply_delta(document: dict, delta: dict) -> dict:
+    """Merge a delta into a document in place; a None value deletes the key"""
+    for key, value in delta.items():
+        if value is None:
+            document.pop(key, None)
+        elif isinstance(value, dict) and isinstance(document.get(key), dict):
+            apply_delta(document[key], value)
+        else:
+            document[key] = copy.deepcopy(value)
+    return document
+
+
+class GameDataSyncEngine:
+    """Keeps a user's stored game record in step with its sources using per-source watermarks"""
+
+    def __init__(self, security_manager, database, registry: ConnectorRegistry = None):
+        self.security_manager = security_manager
+        self.database = database
+        self.registry = registry or get_default_connector_registry()
+
+    def _empty_document(self, user_id: str, game_name: str) -> dict:
+        return {
+            'user_id': user_id,
+            'game_name': game_name,
+            'progress': {},
+            'scores': {},
+            'settings': {},
+            'sensitive_data': {}
+        }
+
+    def _fetch_document(self, user_id: str, game_name: str) -> Tuple[Optional[dict], Dict[str, dict]]:
+        """Full unredacted document from every supporting source, or None if any source failed"""
+        results = self.registry.fetch_all(user_id, game_name)
+        if any(result['status'] != 'ok' for result in results.values()):
+            return None, results
+        document = self._empty_document(user_id, game_name)
+        for result in results.values():
+            merge_documents(document, result['data'])
+        return document, results
+
+    def _unchanged(self, user_id_hash: str, stored: dict, sources: dict) -> Dict:
+        return {
+            'status': 'unchanged',
+            'user_id_hash': user_id_hash,
+            'encrypted_data': stored['encrypted_payload'],
+            'data_hash': stored['data_hash'],
+            'sources': sources
+        }
+
+    def sync(self, user_id: str, game_name: str) -> Dict:
+        """Bring the stored record up to date; the session password must already be set"""
+        manager = self.security_manager
+        user_id_hash = manager.encryption_manager.hash_user_id(user_id)
+
+        stored_rows = self.database.retrieve_encrypted_game_data(user_id_hash, game_name)
+        stored = stored_rows[0] if stored_rows else None
+        # Without a stored document there is nothing to merge deltas into, so pull everything
+        watermarks = self.database.get_sync_watermarks(user_id_hash, game_name) if stored else {}
+
+        results = self.registry.fetch_deltas(user_id, game_name, watermarks)
+        succeeded = {name: r['data'] for name, r in results.items() if r['status'] == 'ok'}
+        changed = {name: delta for name, delta in succeeded.items() if delta['changed']}
+        new_watermarks = {name: delta['watermark'] for name, delta in succeeded.items()}
+        watermarks_moved = any(watermarks.get(name) != wm for name, wm in new_watermarks.items())
+        sources = retrieved_metadata(results)['sources']
+
+        if stored is not None and not changed:
+            if watermarks_moved:
+                self.database.store_sync_watermarks(user_id_hash, game_name, new_watermarks)
+            return self._unchanged(user_id_hash, stored, sources)
+
+        if not results:
+            # No configured source covers this game; fall back the way retrieve_game_data does
+            document = manager.retrieve_game_data(user_id, game_name)
+        elif stored is None:
+            if not succeeded:
+                raise ConnectorError(f"No game data source succeeded for {game_name}")
+            # Without watermarks every delta is a full fragment
+            document = self._empty_document(user_id, game_name)
+            for delta in changed.values():
+                apply_delta(document, delta['data'])
+        else:
+            # The stored payload is redacted (hashed and dropped fields cannot be recovered), while
+            # data_hash describes the unredacted document, so rebuild that from full fetches, which
+            # are mostly fresh cache hits or ETag revalidations
+            document, results = self._fetch_document(user_id, game_name)
+            sources = retrieved_metadata(results)['sources']
+            if document is None:
+                # Keep the stored record and the old watermarks so the next sync retries
+                return self._unchanged(user_id_hash, stored, sources)
+
+        data_hash = manager.compute_data_hash(document)
+        if stored is not None and data_hash == stored['data_hash']:
+            self.database.store_sync_watermarks(user_id_hash, game_name, new_watermarks)
+            return self._unchanged(user_id_hash, stored, sources)
+
+        metadata = document.setdefault('metadata', {})
+        metadata.update(retrieved_metadata(results))
+        metadata.update({'data_version': '1.0', 'encryption_required': True})
+        encrypted_data = manager.encrypt_game_data(document, 'AES')
+
+        self.database.create_user(user_id_hash=user_id_hash, username=user_id)
+        persisted = self.database.store_encrypted_game_data(
+            user_id_hash=user_id_hash,
+            game_name=game_name,
+            encrypted_data=encrypted_data,
+            data_hash=encrypted_data['data_hash']
+        )
+        # Watermarks only advance once the merged document is safely stored
+        if persisted:
+            self.database.store_sync_watermarks(user_id_hash, game_name, new_watermarks)
+
+        return {
+            'status': 'created' if stored is None else 'updated',
+            'user_id_hash': user_id_hash,
+            'encrypted_data': encrypted_data,
+            'data_hash': encrypted_data['data_hash'],
+            'persisted': persisted,
+            'sources': sources
+        }
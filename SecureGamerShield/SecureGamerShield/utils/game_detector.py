@@ -0,0 +1,220 @@
+"""
+Low-overhead game process detection for Linux
+Scans /proc incrementally and matches process names against game signatures with Aho-Corasick
+"""
+
+import os
+import time
+import threading
+from collections import deque
+from typing import Dict, List, Optional, Set, Tuple
+
+# Game name -> lowercase executable / cmdline fragments (native, Proton and Wine launches)
+GAME_SIGNATURES = {
+    "Valorant": ["valorant-win64-shipping", "valorant.exe"],
+    "League of Legends": ["league of legends.exe", "leagueclient.exe", "leagueclientux"],
+    "Fortnite": ["fortniteclient-win64-shipping", "fortnitelauncher.exe"],
+    "Minecraft": ["net.minecraft.client.main", "minecraft-launcher", "/.minecraft/"],
+    "Among Us": ["among us.exe", "among us_data"],
+    "Call of Duty": ["cod.exe", "modernwarfare.exe", "blackopscoldwar.exe", "cod22-cod.exe"],
+    "Apex Legends": ["r5apex.exe", "r5apex_dx12.exe"],
+    "Rocket League": ["rocketleague.exe", "rocketleague"],
+    "Counter-Strike 2": ["/game/bin/linuxsteamrt64/cs2", "cs2.exe"],
+    "Dota 2": ["dota2", "dota 2 beta"],
+}
+
+
+class AhoCorasickMatcher:
+    """Multi-pattern substring matcher built once from a pattern -> label table"""
+
+    def __init__(self, patterns: Dict[str, List[str]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Set[str]] = [set()]
+
+        for label, fragments in patterns.items():
+            for fragment in fragments:
+                self._add(fragment.lower(), label)
+        self._build_failure_links()
+
+    def _add(self, pattern: str, label: str):
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(set())
+            state = next_state
+        self._output[state].add(label)
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                candidate = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = candidate if candidate != next_state else 0
+                self._output[next_state] |= self._output[self._fail[next_state]]
+
+    def match(self, text: str) -> Set[str]:
+        """Return every label whose pattern occurs in the (lowercased) text"""
+        found = set()
+        state = 0
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        for char in text.lower():
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found |= output[state]
+        return found
+
+
+class ProcessGameDetector:
+    """Detects running games by polling /proc, fully reading only PIDs that appeared since the last poll
+
+    Every `recheck_interval` seconds each tracked PID's (comm, start time) fingerprint is re-read
+    from /proc/<pid>/stat; a PID that exec'd (e.g. a launcher becoming the game, or a process
+    caught between fork and exec) or was recycled is classified again.
+    """
+
+    def __init__(self, signatures: Dict[str, List[str]] = None, proc_root: str = '/proc',
+                 min_poll_interval: float = 1.0, max_cmdline_bytes: int = 4096,
+                 recheck_interval: float = 5.0):
+        self.signatures = signatures or GAME_SIGNATURES
+        self.proc_root = proc_root
+        self.min_poll_interval = min_poll_interval
+        self.max_cmdline_bytes = max_cmdline_bytes
+        self._matcher = AhoCorasickMatcher(self.signatures)
+        self._priority = {game: index for index, game in enumerate(self.signatures)}
+        self.recheck_interval = recheck_interval
+        self._known: Dict[int, Optional[str]] = {}
+        self._fingerprints: Dict[int, Optional[Tuple[str, str]]] = {}
+        self._running: Dict[str, Set[int]] = {}
+        self._last_poll = 0.0
+        self._last_recheck = 0.0
+        self._lock = threading.Lock()
+        self._stats = {'polls': 0, 'pids_read': 0, 'reclassified': 0, 'last_poll_seconds': 0.0}
+
+    @property
+    def available(self) -> bool:
+        return os.path.isdir(self.proc_root)
+
+    def _read_process(self, pid: int) -> str:
+        """Return 'comm cmdline' for a PID, or '' if it vanished or is unreadable"""
+        base = f"{self.proc_root}/{pid}"
+        try:
+            with open(f"{base}/comm", 'rb') as f:
+                comm = f.read().strip()
+            with open(f"{base}/cmdline", 'rb') as f:
+                cmdline = f.read(self.max_cmdline_bytes).replace(b'\0', b' ')
+        except OSError:
+            return ''
+        return (comm + b' ' + cmdline).decode('utf-8', errors='replace')
+
+    def _fingerprint(self, pid: int) -> Optional[Tuple[str, str]]:
+        """(comm, start time) from /proc/<pid>/stat; changes on exec and when a PID is reused"""
+        try:
+            with open(f"{self.proc_root}/{pid}/stat", 'rb') as f:
+                stat = f.read().decode('utf-8', errors='replace')
+        except OSError:
+            return None
+        # comm may itself contain spaces or parentheses, so split around the last ')'
+        comm = stat[stat.find('(') + 1:stat.rfind(')')]
+        fields = stat[stat.rfind(')') + 2:].split()
+        # starttime is field 22 of stat; the fields after comm start at field 3
+        return comm, fields[19] if len(fields) > 19 else ''
+
+    def _classify(self, pid: int) -> Optional[str]:
+        matches = self._matcher.match(self._read_process(pid))
+        if not matches:
+            return None
+        return min(matches, key=self._priority.__getitem__)
+
+    def _track(self, pid: int):
+        """Classify a PID and record it under its game"""
+        self._fingerprints[pid] = self._fingerprint(pid)
+        game = self._classify(pid)
+        self._known[pid] = game
+        if game is not None:
+            self._running.setdefault(game, set()).add(pid)
+
+    def _forget(self, pid: int):
+        game = self._known.pop(pid)
+        self._fingerprints.pop(pid, None)
+        if game is not None:
+            pids = self._running[game]
+            pids.discard(pid)
+            if not pids:
+                del self._running[game]
+
+    def poll(self, force: bool = False) -> Dict[str, Set[int]]:
+        """Refresh the set of running games, at most once per `min_poll_interval`"""
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._last_poll < self.min_poll_interval:
+                return {game: set(pids) for game, pids in self._running.items()}
+
+            try:
+                current = {int(name) for name in os.listdir(self.proc_root) if name.isdigit()}
+            except OSError:
+                current = set()
+
+            for pid in self._known.keys() - current:
+                self._forget(pid)
+
+            # Periodic cheap stat read per tracked PID; full re-read only when the fingerprint changed
+            reclassified = 0
+            if now - self._last_recheck >= self.recheck_interval:
+                for pid in list(self._known):
+                    if self._fingerprint(pid) != self._fingerprints.get(pid):
+                        self._forget(pid)
+                        self._track(pid)
+                        reclassified += 1
+                self._last_recheck = now
+
+            new_pids = current - self._known.keys()
+            for pid in new_pids:
+                self._track(pid)
+
+            self._last_poll = now
+            self._stats['polls'] += 1
+            self._stats['pids_read'] += len(new_pids) + reclassified
+            self._stats['reclassified'] += reclassified
+            self._stats['last_poll_seconds'] = time.monotonic() - now
+            return {game: set(pids) for game, pids in self._running.items()}
+
+    def running_games(self) -> List[str]:
+        """Currently running games ordered by signature-table priority"""
+        return sorted(self.poll(), key=self._priority.__getitem__)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['tracked_pids'] = len(self._known)
+        return stats
+
+
+_default_detector: Optional[ProcessGameDetector] = None
+_default_detector_lock = threading.Lock()
+
+
+def get_default_game_detector() -> ProcessGameDetector:
+    """Return the process-wide detector so every session shares one incremental PID table"""
+    global _default_detector
+    with _default_detector_lock:
+        if _default_detector is None:
+            _default_detector = ProcessGameDetector(
+                min_poll_interval=float(os.getenv('GAME_DETECTOR_POLL_INTERVAL', '1.0')),
+                recheck_interval=float(os.getenv('GAME_DETECTOR_RECHECK_INTERVAL', '5.0'))
+            )
+        return _default_detector
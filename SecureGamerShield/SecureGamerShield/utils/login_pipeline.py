@@ -0,0 +1,291 @@
+"""
+Stage-based pipeline for the secure login flow
+detect -> fetch -> redact -> encrypt -> persist -> audit, each stage with its own workers, bounded queue and metrics
+"""
+
+import os
+import time
+import queue
+import threading
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+_STOP = object()
+
+DEFAULT_STAGE_WORKERS = {
+    'detect': 2,
+    'fetch': 8,
+    'redact': 2,
+    'encrypt': max(2, os.cpu_count() or 2),
+    'persist': 4,
+    'audit': 2
+}
+
+
+class PipelineStage:
+    """One pipeline stage: a bounded input queue drained by a dedicated pool of worker threads"""
+
+    def __init__(self, name: str, handler: Callable[[dict], None], workers: int = 1,
+                 queue_size: int = 64, run_on_error: bool = False):
+        self.name = name
+        self.handler = handler
+        self.workers = workers
+        self.run_on_error = run_on_error
+        self.queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.next_stage: Optional['PipelineStage'] = None
+        self.error_stage: Optional['PipelineStage'] = None
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=1024)
+        self._stats = {'processed': 0, 'errors': 0, 'max_queue_depth': 0,
+                       'total_seconds': 0.0, 'max_seconds': 0.0}
+
+    def start(self):
+        for index in range(self.workers):
+            thread = threading.Thread(
+                target=self._run, name=f"login-pipeline-{self.name}-{index}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def put(self, job: dict):
+        """Enqueue a job, blocking while the stage is saturated (backpressure)"""
+        self.queue.put(job)
+        depth = self.queue.qsize()
+        with self._lock:
+            if depth > self._stats['max_queue_depth']:
+                self._stats['max_queue_depth'] = depth
+
+    def _forward(self, job: dict):
+        # Failed jobs jump straight to the error stage (audit) so failures are still recorded
+        target = self.next_stage
+        if job.get('error') is not None and not self.run_on_error:
+            target = self.error_stage
+        if target is None:
+            job['completed_at'] = time.monotonic()
+            job['done'].set()
+        else:
+            target.put(job)
+
+    def _run(self):
+        while True:
+            job = self.queue.get()
+            if job is _STOP:
+                break
+
+            started = time.perf_counter()
+            try:
+                self.handler(job)
+                failed = False
+            except Exception as e:
+                if job.get('error') is None:
+                    job['error'] = e
+                    job['failed_stage'] = self.name
+                failed = True
+            elapsed = time.perf_counter() - started
+
+            job['stage_timings'][self.name] = elapsed
+            with self._lock:
+                self._stats['processed'] += 1
+                self._stats['errors'] += int(failed)
+                self._stats['total_seconds'] += elapsed
+                self._stats['max_seconds'] = max(self._stats['max_seconds'], elapsed)
+                self._latencies.append(elapsed)
+            self._forward(job)
+
+    def stop(self):
+        for _ in self._threads:
+            self.queue.put(_STOP)
+        for thread in self._threads:
+            thread.join()
+        self._threads.clear()
+
+    def get_metrics(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            latencies = sorted(self._latencies)
+        processed = stats.pop('processed')
+        total = stats.pop('total_seconds')
+        return {
+            'stage': self.name,
+            'workers': self.workers,
+            'queue_depth': self.queue.qsize(),
+            'queue_capacity': self.queue.maxsize,
+            'processed': processed,
+            'avg_ms': (total / processed * 1000) if processed else 0.0,
+            'p95_ms': latencies[int(len(latencies) * 0.95) - 1] * 1000 if latencies else 0.0,
+            'max_ms': stats.pop('max_seconds') * 1000,
+            **stats
+        }
+
+
+def detect_stage(job: dict):
+    """Identify the game to secure for this login"""
+    job['game_name'] = job['manager'].detect_current_game(job['user_session'])
+
+
+def fetch_stage(job: dict):
+    """Retrieve game data, or sync deltas when the manager has a sync engine"""
+    manager = job['manager']
+    if manager.sync_engine is not None:
+        job['sync_result'] = manager.sync_engine.sync(job['user_id'], job['game_name'])
+        job['encrypted_data'] = job['sync_result']['encrypted_data']
+    else:
+        job['game_data'] = manager.retrieve_game_data(job['user_id'], job['game_name'])
+
+
+def redact_stage(job: dict):
+    """Validate, then apply the field policy; the content hash covers the unredacted document"""
+    if 'game_data' not in job:
+        return
+    manager = job['manager']
+    manager.validator.validate(job['game_data'])
+    job['data_hash'] = manager.compute_data_hash(job['game_data'])
+    job['redacted_data'] = manager.redact_game_data(job['game_data'])
+
+
+def encrypt_stage(job: dict):
+    """Encrypt the redacted document with the session key"""
+    if 'encrypted_data' in job:
+        return
+    job['encrypted_data'] = job['manager'].encrypt_redacted_game_data(
+        job['game_data'], job['redacted_data'], 'AES', data_hash=job['data_hash']
+    )
+
+
+def persist_stage(job: dict):
+    """Upsert the user and the encrypted record"""
+    database = job.get('database')
+    if database is None:
+        return
+    sync_result = job.get('sync_result')
+    if sync_result is not None:
+        # The sync engine already wrote any change
+        job['persisted'] = sync_result.get('persisted', sync_result['status'] == 'unchanged')
+        return
+
+    encrypted_data = job['encrypted_data']
+    database.create_user(
+        user_id_hash=encrypted_data['user_id_hash'],
+        username=job['user_id'],
+        email_hash=""
+    )
+    # 'inserted', 'updated', 'unchanged' (identical data_hash, write skipped) or None on error
+    job['write_outcome'] = database.upsert_encrypted_game_data(
+        user_id_hash=encrypted_data['user_id_hash'],
+        game_name=job['game_name'],
+        encrypted_data=encrypted_data,
+        data_hash=encrypted_data['data_hash']
+    )
+    job['persisted'] = job['write_outcome'] is not None
+
+
+def audit_stage(job: dict):
+    """Record the login outcome, including failures routed here from earlier stages"""
+    database = job.get('database')
+    if database is None:
+        return
+    error = job.get('error')
+    details = {
+        'game': job.get('game_name'),
+        'data_stored': job.get('persisted', False),
+        'write_outcome': job.get('write_outcome'),
+        'stage_timings_ms': {name: round(seconds * 1000, 2) for name, seconds in job['stage_timings'].items()}
+    }
+    if error is None:
+        details['encryption_algorithm'] = job['encrypted_data']['algorithm']
+    else:
+        details['failed_stage'] = job.get('failed_stage')
+    database.log_security_action(
+        user_id_hash=job['user_id_hash'],
+        action_type="secure_login" if error is None else "secure_login_failed",
+        resource_type="game_data",
+        details=details
+    )
+
+
+class LoginPipeline:
+    """Runs login jobs through explicit stages connected by bounded queues"""
+
+    STAGES = [
+        ('detect', detect_stage),
+        ('fetch', fetch_stage),
+        ('redact', redact_stage),
+        ('encrypt', encrypt_stage),
+        ('persist', persist_stage),
+        ('audit', audit_stage),
+    ]
+
+    def __init__(self, stage_workers: Dict[str, int] = None, queue_size: int = 64):
+        workers = dict(DEFAULT_STAGE_WORKERS)
+        workers.update(stage_workers or {})
+        self.stages = [
+            PipelineStage(name, handler, workers[name], queue_size, run_on_error=(name == 'audit'))
+            for name, handler in self.STAGES
+        ]
+        audit = self.stages[-1]
+        for stage, next_stage in zip(self.stages, self.stages[1:]):
+            stage.next_stage = next_stage
+        for stage in self.stages:
+            stage.error_stage = audit
+        for stage in self.stages:
+            stage.start()
+
+    def submit(self, manager, user_id: str, user_id_hash: str, user_session: dict,
+               database=None) -> dict:
+        """Enqueue a login job and return it; wait on job['done'] for completion"""
+        job = {
+            'manager': manager,
+            'user_id': user_id,
+            'user_id_hash': user_id_hash,
+            'user_session': user_session,
+            'database': database,
+            'error': None,
+            'stage_timings': {},
+            'submitted_at': time.monotonic(),
+            'done': threading.Event()
+        }
+        self.stages[0].put(job)
+        return job
+
+    def process(self, manager, user_id: str, user_id_hash: str, user_session: dict,
+                database=None, timeout: float = 60) -> dict:
+        """Submit a login job and block until every stage has handled it"""
+        job = self.submit(manager, user_id, user_id_hash, user_session, database)
+        if not job['done'].wait(timeout):
+            raise TimeoutError(f"Login pipeline did not complete within {timeout:.0f}s")
+        return job
+
+    def get_metrics(self) -> List[dict]:
+        """Per-stage latency, throughput and queue-depth metrics"""
+        return [stage.get_metrics() for stage in self.stages]
+
+    def shutdown(self):
+        for stage in self.stages:
+            stage.stop()
+
+
+_default_pipeline: Optional[LoginPipeline] = None
+_default_pipeline_lock = threading.Lock()
+
+
+def _workers_from_env() -> Dict[str, int]:
+    """Parse LOGIN_PIPELINE_WORKERS such as 'fetch=16,encrypt=8'"""
+    workers = {}
+    for item in os.getenv('LOGIN_PIPELINE_WORKERS', '').split(','):
+        if '=' in item:
+            name, count = item.split('=', 1)
+            workers[name.strip()] = int(count)
+    return workers
+
+
+def get_default_login_pipeline() -> LoginPipeline:
+    """Return the process-wide login pipeline shared by all sessions"""
+    global _default_pipeline
+    with _default_pipeline_lock:
+        if _default_pipeline is None:
+            _default_pipeline = LoginPipeline(
+                _workers_from_env(),
+                queue_size=int(os.getenv('LOGIN_PIPELINE_QUEUE_SIZE', '64'))
+            )
+        return _default_pipeline
@@ -0,0 +1,404 @@
+"""
+Fast password strength estimation for the secure login form
+zxcvbn-style pattern matching over dictionary tries and keyboard tables built once per process
+"""
+
+import os
+import re
+import math
+from functools import lru_cache
+from typing import List, Dict
+
+# Ranked by frequency: a word's rank approximates how many guesses an attacker needs
+COMMON_PASSWORDS = """
+123456 password 12345678 qwerty 123456789 12345 1234 111111 1234567 dragon
+123123 baseball abc123 football monkey letmein 696969 shadow master 666666
+qwertyuiop 123321 mustang 1234567890 michael 654321 superman 1qaz2wsx 7777777
+121212 000000 qazwsx 123qwe killer trustno1 jordan jennifer zxcvbnm asdfgh
+hunter buster soccer harley batman andrew tigger sunshine iloveyou 2000
+charlie robert thomas hockey ranger daniel starwars klaster 112233 george
+computer michelle jessica pepper 1111 zxcvbn 555555 11111111 131313 freedom
+777777 pass maggie 159753 aaaaaa ginger princess joshua cheese amanda summer
+love ashley nicole chelsea biteme matthew access yankees 987654321 dallas
+austin thunder taylor matrix minecraft welcome admin login passw0rd abc
+""".split()
+
+ENGLISH_WORDS = """
+the secure password game gamer games play player pass word love secret
+super power dragon shadow master hunter killer ninja pro noob best king
+queen star dark light fire ice storm night day blue red green black white
+summer winter spring autumn happy lucky magic cyber hack hacker login user
+admin welcome hello world money sun moon sky time life angel devil demon
+wolf tiger lion bear eagle hawk snake shark phoenix legend hero zero one
+""".split()
+
+GAMING_TERMS = """
+valorant fortnite minecraft roblox league legends apex callofduty cod
+overwatch pubg warzone rocket among steam xbox playstation nintendo zelda
+mario pokemon halo skyrim gta diablo warcraft starcraft dota csgo counter
+strike battlefield destiny elden ring sonic tetris pacman creeper enderman
+headshot respawn clutch gg noscope sniper speedrun esports twitch
+""".split()
+
+NAMES = """
+james john robert michael william david richard joseph thomas charles
+mary patricia jennifer linda elizabeth barbara susan jessica sarah karen
+alex chris sam jordan taylor morgan casey riley jamie max emma olivia
+noah liam ava mia lucas ethan sophia isabella mason logan
+""".split()
+
+KEYBOARD_ROWS = {
+    'qwerty': [
+        "`~ 1! 2@ 3# 4$ 5% 6^ 7& 8* 9( 0) -_ =+",
+        "qQ wW eE rR tT yY uU iI oO pP [{ ]} \\|",
+        "aA sS dD fF gG hH jJ kK lL ;: '\"",
+        "zZ xX cC vV bB nN mM ,< .> /?",
+    ],
+    'keypad': [
+        "/ * -",
+        "7 8 9 +",
+        "4 5 6",
+        "1 2 3",
+        "0 .",
+    ],
+}
+
+L33T_TABLE = {
+    '4': 'a', '@': 'a', '8': 'b', '(': 'c', '3': 'e', '6': 'g', '1': 'i',
+    '!': 'i', '|': 'l', '0': 'o', '$': 's', '5': 's', '7': 't', '+': 't', '2': 'z',
+}
+
+SCORE_THRESHOLDS = (1e3 + 5, 1e6 + 5, 1e8 + 5, 1e10 + 5)
+REPEAT_RE = re.compile(r'(.+?)\1+')
+DIGITS_RE = re.compile(r'\d{3,}')
+YEAR_RE = re.compile(r'19\d\d|20\d\d')
+
+# Past 1e300 guesses every password is "centuries"; clamp before leaving log space
+MAX_GUESSES_LOG10 = 300
+
+
+def _build_trie(words: List[str]) -> dict:
+    """Build a dict-of-dicts trie whose terminal '$' entry stores the word's rank"""
+    root = {}
+    for rank, word in enumerate(words, start=1):
+        node = root
+        for char in word:
+            node = node.setdefault(char, {})
+        node.setdefault('$', rank)
+    return root
+
+
+def _build_adjacency(rows: List[str]) -> Dict[str, set]:
+    """Map every key (shifted and unshifted) to the keys physically next to it"""
+    grid = [row.split(' ') for row in rows]
+    adjacency = {}
+    for r, row in enumerate(grid):
+        for c, key in enumerate(row):
+            neighbours = set()
+            for dr, dc in ((-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0)):
+                nr, nc = r + dr, c + dc
+                if 0 <= nr < len(grid) and 0 <= nc < len(grid[nr]):
+                    neighbours.update(grid[nr][nc])
+            for char in key:
+                adjacency[char] = neighbours
+    return adjacency
+
+
+@lru_cache(maxsize=1)
+def get_tables() -> dict:
+    """Compile dictionary tries and keyboard tables once per process"""
+    extra_words = []
+    wordlist_path = os.getenv('PASSWORD_STRENGTH_WORDLIST')
+    if wordlist_path and os.path.exists(wordlist_path):
+        with open(wordlist_path, 'r', encoding='utf-8', errors='replace') as f:
+            extra_words = [line.strip().lower() for line in f if line.strip()]
+
+    dictionaries = {
+        'passwords': COMMON_PASSWORDS + extra_words,
+        'english': ENGLISH_WORDS,
+        'gaming': GAMING_TERMS,
+        'names': NAMES,
+    }
+    return {
+        'tries': {name: _build_trie(words) for name, words in dictionaries.items()},
+        'keyboards': {
+            name: (_build_adjacency(rows), sum(len(row.split(' ')) for row in rows))
+            for name, rows in KEYBOARD_ROWS.items()
+        },
+        'l33t': str.maketrans(L33T_TABLE),
+    }
+
+
+def _dictionary_matches(password: str, tables: dict, user_trie: dict = None) -> List[dict]:
+    """Find dictionary words, including reversed and l33t-substituted variants"""
+    lower = password.lower()
+    unl33ted = lower.translate(tables['l33t'])
+    reversed_lower = lower[::-1]
+    length = len(password)
+    tries = dict(tables['tries'])
+    if user_trie:
+        tries['user_inputs'] = user_trie
+
+    matches = []
+    variants = [(lower, False, False)]
+    if unl33ted != lower:
+        variants.append((unl33ted, True, False))
+    variants.append((reversed_lower, False, True))
+
+    for text, l33t, reversed_ in variants:
+        for name, trie in tries.items():
+            for i in range(length):
+                node = trie
+                for j in range(i, length):
+                    node = node.get(text[j])
+                    if node is None:
+                        break
+                    rank = node.get('$')
+                    if rank is None or j == i:
+                        continue
+                    start, end = (length - 1 - j, length - 1 - i) if reversed_ else (i, j)
+                    token = password[start:end + 1]
+                    if l33t and token.lower() == text[i:j + 1]:
+                        continue
+                    guesses = rank
+                    if token != token.lower():
+                        upper = sum(1 for ch in token if ch.isupper())
+                        guesses *= 2 if upper == 1 and token[0].isupper() else 2 ** min(upper, 4) * 2
+                    if l33t:
+                        guesses *= 2 * sum(1 for ch in token if ch in L33T_TABLE)
+                    if reversed_:
+                        guesses *= 2
+                    matches.append({
+                        'pattern': 'dictionary', 'i': start, 'j': end, 'token': token,
+                        'dictionary': name, 'rank': rank, 'l33t': l33t,
+                        'reversed': reversed_, 'guesses': max(guesses, 1)
+                    })
+    return matches
+
+
+def _spatial_matches(password: str, tables: dict) -> List[dict]:
+    """Find runs of physically adjacent keys such as 'qwerty' or 'zxcvb'"""
+    matches = []
+    length = len(password)
+    for name, (adjacency, key_count) in tables['keyboards'].items():
+        average_degree = sum(len(v) for v in adjacency.values()) / len(adjacency)
+        i = 0
+        while i < length - 2:
+            j = i
+            turns = 0
+            direction = None
+            while j + 1 < length and password[j + 1] in adjacency.get(password[j], ()):
+                step = ord(password[j + 1]) - ord(password[j])
+                if step != direction:
+                    turns += 1
+                    direction = step
+                j += 1
+            if j - i >= 2:
+                token = password[i:j + 1]
+                guesses = key_count * average_degree ** turns * (j - i)
+                shifted = sum(1 for ch in token if ch.isupper() or ch in '~!@#$%^&*()_+{}|:"<>?')
+                if shifted:
+                    guesses *= 2 ** min(shifted, 4)
+                matches.append({
+                    'pattern': 'spatial', 'i': i, 'j': j, 'token': token,
+                    'graph': name, 'turns': turns, 'guesses': guesses
+                })
+                i = j
+            else:
+                i += 1
+    return matches
+
+
+def _sequence_matches(password: str) -> List[dict]:
+    """Find ascending or descending character runs such as 'abcd' or '9876'"""
+    matches = []
+    length = len(password)
+    i = 0
+    while i < length - 2:
+        delta = ord(password[i + 1]) - ord(password[i])
+        if abs(delta) != 1:
+            i += 1
+            continue
+        j = i + 1
+        while j + 1 < length and ord(password[j + 1]) - ord(password[j]) == delta:
+            j += 1
+        if j - i >= 2:
+            token = password[i:j + 1]
+            base = 4 if token[0] in 'aAzZ019' else (10 if token[0].isdigit() else 26)
+            matches.append({
+                'pattern': 'sequence', 'i': i, 'j': j, 'token': token,
+                'guesses': base * len(token) * (1 if delta > 0 else 2)
+            })
+        i = j
+    return matches
+
+
+def _repeat_matches(password: str) -> List[dict]:
+    """Find repeated substrings such as 'aaaa' or 'abcabc'"""
+    matches = []
+    for found in REPEAT_RE.finditer(password):
+        base = found.group(1)
+        token = found.group(0)
+        base_guesses = _brute_force_guesses(base)
+        matches.append({
+            'pattern': 'repeat', 'i': found.start(), 'j': found.end() - 1, 'token': token,
+            'base_token': base, 'guesses': base_guesses * (len(token) // len(base))
+        })
+    return matches
+
+
+def _digit_matches(password: str) -> List[dict]:
+    """Find years and digit runs, which attackers enumerate cheaply"""
+    matches = []
+    for found in YEAR_RE.finditer(password):
+        matches.append({
+            'pattern': 'year', 'i': found.start(), 'j': found.end() - 1,
+            'token': found.group(0), 'guesses': 120
+        })
+    for found in DIGITS_RE.finditer(password):
+        matches.append({
+            'pattern': 'digits', 'i': found.start(), 'j': found.end() - 1,
+            'token': found.group(0), 'guesses': 10 ** len(found.group(0)) // 2
+        })
+    return matches
+
+
+def _cardinality(token: str) -> int:
+    cardinality = 0
+    if any(ch.islower() for ch in token):
+        cardinality += 26
+    if any(ch.isupper() for ch in token):
+        cardinality += 26
+    if any(ch.isdigit() for ch in token):
+        cardinality += 10
+    if any(not ch.isalnum() for ch in token):
+        cardinality += 33
+    return cardinality or 10
+
+
+def _brute_force_guesses(token: str) -> int:
+    # Integer power: a float would overflow for long tokens; math.log10 accepts big ints
+    return _cardinality(token) ** len(token)
+
+
+def _minimum_guess_sequence(password: str, matches: List[dict]) -> tuple:
+    """Pick the cheapest non-overlapping cover of the password (dynamic programming)"""
+    length = len(password)
+    char_guesses = _cardinality(password)
+    by_end = [[] for _ in range(length)]
+    for match in matches:
+        by_end[match['j']].append(match)
+
+    def total(entry):
+        # Attackers also have to guess how many patterns were chained together
+        return entry[0] + math.log10(math.factorial(max(entry[1], 1)))
+
+    # best[k] = (log10 product of guesses, matches used, sequence) covering password[:k]
+    best = [(0.0, 0, [])] + [None] * length
+    for k in range(1, length + 1):
+        log_guesses, count, sequence = best[k - 1]
+        candidate = (log_guesses + math.log10(char_guesses), count, sequence)
+        for match in by_end[k - 1]:
+            prev_log, prev_count, prev_sequence = best[match['i']]
+            option = (prev_log + math.log10(match['guesses']), prev_count + 1, prev_sequence + [match])
+            if total(option) < total(candidate):
+                candidate = option
+        best[k] = candidate
+
+    return total(best[length]), best[length][2]
+
+
+def _score(guesses: float) -> int:
+    for score, threshold in enumerate(SCORE_THRESHOLDS):
+        if guesses < threshold:
+            return score
+    return 4
+
+
+def _crack_time_display(seconds: float) -> str:
+    for unit, size in (('years', 31536000), ('days', 86400), ('hours', 3600), ('minutes', 60)):
+        if seconds >= size:
+            value = seconds / size
+            return 'centuries' if unit == 'years' and value >= 100 else f"{value:.0f} {unit}"
+    return 'less than a minute' if seconds >= 1 else 'instant'
+
+
+def _feedback(score: int, sequence: List[dict]) -> dict:
+    if score >= 3:
+        return {'warning': '', 'suggestions': []}
+
+    suggestions = ["Add another word or two. Uncommon words are better."]
+    warning = "This password is easy to guess."
+    if sequence:
+        longest = max(sequence, key=lambda m: m['j'] - m['i'])
+        pattern = longest['pattern']
+        if pattern == 'dictionary':
+            if longest['dictionary'] == 'passwords':
+                warning = "This is a very common password."
+            elif longest['dictionary'] == 'user_inputs':
+                warning = "Passwords based on your user ID are easy to guess."
+            else:
+                warning = "A word by itself is easy to guess."
+            if longest['l33t']:
+                suggestions.append("Predictable substitutions like '@' instead of 'a' don't help very much.")
+            if longest['reversed']:
+                suggestions.append("Reversed words aren't much harder to guess.")
+        elif pattern == 'spatial':
+            warning = "Keyboard patterns like 'qwerty' are easy to guess."
+            suggestions.append("Use a longer keyboard pattern with more turns.")
+        elif pattern == 'repeat':
+            warning = "Repeats like 'aaa' or 'abcabc' are easy to guess."
+            suggestions.append("Avoid repeated words and characters.")
+        elif pattern == 'sequence':
+            warning = "Sequences like 'abc' or '6543' are easy to guess."
+            suggestions.append("Avoid sequences.")
+        elif pattern in ('year', 'digits'):
+            warning = "Recent years and number runs are easy to guess."
+            suggestions.append("Avoid years and dates that are associated with you.")
+    return {'warning': warning, 'suggestions': suggestions}
+
+
+def estimate_password_strength(password: str, user_inputs: List[str] = None) -> dict:
+    """Estimate guesses needed to crack a password and map them to a 0-4 score"""
+    if not password:
+        return {
+            'score': 0, 'guesses': 1, 'guesses_log10': 0.0,
+            'crack_time_display': 'instant', 'sequence': [],
+            'feedback': {'warning': 'Enter a password.', 'suggestions': []}
+        }
+
+    tables = get_tables()
+    user_trie = _build_trie([value.lower() for value in user_inputs if value]) if user_inputs else None
+
+    matches = (
+        _dictionary_matches(password, tables, user_trie)
+        + _spatial_matches(password, tables)
+        + _sequence_matches(password)
+        + _repeat_matches(password)
+        + _digit_matches(password)
+    )
+    guesses_log10, sequence = _minimum_guess_sequence(password, matches)
+    # Scored in log space; the linear value is clamped so long random passwords cannot overflow a float
+    guesses = 10 ** min(guesses_log10, MAX_GUESSES_LOG10)
+    score = _score(guesses)
+
+    return {
+        'score': score,
+        'guesses': guesses,
+        'guesses_log10': guesses_log10,
+        # Offline attack against a slow hash at ~10k guesses per second
+        'crack_time_display': _crack_time_display(guesses / 1e4),
+        'sequence': [
+            {'pattern': m['pattern'], 'token': m['token'], 'guesses': m['guesses']}
+            for m in sequence
+        ],
+        'feedback': _feedback(score, sequence)
+    }
+
+
+def is_password_acceptable(password: str, user_inputs: List[str] = None, min_score: int = None) -> tuple:
+    """Return (acceptable, estimate) using MIN_PASSWORD_SCORE as the default bar"""
+    if min_score is None:
+        min_score = int(os.getenv('MIN_PASSWORD_SCORE', '2'))
+    estimate = estimate_password_strength(password, user_inputs)
+    return estimate['score'] >= min_score, estimate
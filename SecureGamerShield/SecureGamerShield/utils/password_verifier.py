@@ -0,0 +1,313 @@
+"""
+Password verifier storage for the secure login flow
+Uses Argon2id verifiers with admission control to bound concurrent memory-hard hashing
+"""
+
+import os
+import hmac
+import base64
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional, Dict
+from cryptography.hazmat.primitives.kdf.argon2 import Argon2id
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+
+class AdmissionRejectedError(Exception):
+    """Raised when a KDF computation is shed instead of queued"""
+
+
+class KDFAdmissionController:
+    """Caps concurrent KDF computations and sheds load past a bounded, deadlined queue"""
+
+    def __init__(self, max_concurrent: int = 4, max_queue: int = 32, queue_timeout: float = 2.0):
+        if max_concurrent < 1:
+            raise ValueError("max_concurrent must be at least 1")
+
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._in_flight = 0
+        self._stats = {
+            'admitted': 0,
+            'queued': 0,
+            'shed_queue_full': 0,
+            'shed_deadline': 0,
+            'total_wait_seconds': 0.0
+        }
+
+    @classmethod
+    def from_memory_budget(cls, memory_budget_mb: int, memory_cost_kib: int, **kwargs) -> 'KDFAdmissionController':
+        """Size the concurrency cap so in-flight hashes never exceed a memory budget"""
+        max_concurrent = max(1, (memory_budget_mb * 1024) // memory_cost_kib)
+        return cls(max_concurrent=max_concurrent, **kwargs)
+
+    @contextmanager
+    def admit(self, timeout: float = None):
+        """Hold a KDF slot for the duration of the block, waiting at most `timeout` seconds"""
+        deadline = self.queue_timeout if timeout is None else timeout
+        started = time.monotonic()
+
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                if self._waiting >= self.max_queue:
+                    self._stats['shed_queue_full'] += 1
+                    raise AdmissionRejectedError(
+                        "Login service is busy (KDF queue full), please retry shortly"
+                    )
+                self._waiting += 1
+                self._stats['queued'] += 1
+
+            try:
+                acquired = self._slots.acquire(timeout=deadline)
+            finally:
+                with self._lock:
+                    self._waiting -= 1
+
+            if not acquired:
+                with self._lock:
+                    self._stats['shed_deadline'] += 1
+                raise AdmissionRejectedError(
+                    f"Login service is busy (no KDF slot within {deadline:.1f}s), please retry shortly"
+                )
+
+        with self._lock:
+            self._in_flight += 1
+            self._stats['admitted'] += 1
+            self._stats['total_wait_seconds'] += time.monotonic() - started
+
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            self._slots.release()
+
+    def get_stats(self) -> dict:
+        """Return admission counters and current queue depth"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = self._in_flight
+            stats['waiting'] = self._waiting
+        stats['max_concurrent'] = self.max_concurrent
+        stats['max_queue'] = self.max_queue
+        return stats
+
+
+class InMemoryVerifierBackend:
+    """Process-local verifier storage for development without a database; lost on restart"""
+
+    def __init__(self):
+        self._verifiers: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id_hash: str) -> Optional[str]:
+        with self._lock:
+            return self._verifiers.get(user_id_hash)
+
+    def create(self, user_id_hash: str, encoded: str) -> bool:
+        """Store a verifier only if the user has none; False when already registered"""
+        with self._lock:
+            if user_id_hash in self._verifiers:
+                return False
+            self._verifiers[user_id_hash] = encoded
+            return True
+
+    def replace(self, user_id_hash: str, expected: str, encoded: str) -> bool:
+        """Swap in a new verifier only if the stored one is still `expected`"""
+        with self._lock:
+            if self._verifiers.get(user_id_hash) != expected:
+                return False
+            self._verifiers[user_id_hash] = encoded
+            return True
+
+
+class DatabaseVerifierBackend:
+    """Verifiers in the password_verifiers table, shared by every process and replica"""
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+
+    def get(self, user_id_hash: str) -> Optional[str]:
+        with self.engine.connect() as conn:
+            return conn.execute(
+                text("SELECT verifier FROM password_verifiers WHERE user_id_hash = :user_id_hash"),
+                {'user_id_hash': user_id_hash}
+            ).scalar()
+
+    def create(self, user_id_hash: str, encoded: str) -> bool:
+        """Insert-if-absent in one statement, so concurrent registrations cannot both win"""
+        with self.engine.connect() as conn:
+            created = conn.execute(
+                text("""
+                INSERT INTO password_verifiers (user_id_hash, verifier)
+                VALUES (:user_id_hash, :verifier)
+                ON CONFLICT (user_id_hash) DO NOTHING
+                RETURNING user_id_hash
+                """),
+                {'user_id_hash': user_id_hash, 'verifier': encoded}
+            ).fetchone()
+            conn.commit()
+            return created is not None
+
+    def replace(self, user_id_hash: str, expected: str, encoded: str) -> bool:
+        """Compare-and-swap so a rehash never overwrites a concurrent password change"""
+        with self.engine.connect() as conn:
+            updated = conn.execute(
+                text("""
+                UPDATE password_verifiers
+                SET verifier = :verifier, updated_at = CURRENT_TIMESTAMP
+                WHERE user_id_hash = :user_id_hash AND verifier = :expected
+                """),
+                {'user_id_hash': user_id_hash, 'verifier': encoded, 'expected': expected}
+            ).rowcount
+            conn.commit()
+            return updated == 1
+
+
+class PasswordVerifierStore:
+    """Stores Argon2id password verifiers keyed by hashed user id"""
+
+    ALGORITHM = 'argon2id'
+    VERSION = 19
+
+    def __init__(self, backend=None, admission_controller: KDFAdmissionController = None,
+                 time_cost: int = 3, memory_cost: int = 65536, parallelism: int = 4,
+                 hash_length: int = 32):
+        self.time_cost = time_cost
+        self.memory_cost = memory_cost  # KiB
+        self.parallelism = parallelism
+        self.hash_length = hash_length
+        self.admission_controller = admission_controller or KDFAdmissionController.from_memory_budget(
+            int(os.getenv('KDF_MEMORY_BUDGET_MB', '256')),
+            memory_cost,
+            max_queue=int(os.getenv('KDF_MAX_QUEUE', '32')),
+            queue_timeout=float(os.getenv('KDF_QUEUE_TIMEOUT', '2.0'))
+        )
+        self.backend = backend or InMemoryVerifierBackend()
+        # Verified against for unknown users so lookups do not leak enrollment via timing
+        self._dummy_verifier = None
+        self._dummy_lock = threading.Lock()
+
+    def _derive(self, password: str, salt: bytes, time_cost: int, memory_cost: int,
+                parallelism: int, length: int) -> bytes:
+        """Run one admitted Argon2id derivation"""
+        kdf = Argon2id(
+            salt=salt,
+            length=length,
+            iterations=time_cost,
+            lanes=parallelism,
+            memory_cost=memory_cost
+        )
+        with self.admission_controller.admit():
+            return kdf.derive(password.encode())
+
+    @staticmethod
+    def _b64encode(data: bytes) -> str:
+        return base64.b64encode(data).decode().rstrip('=')
+
+    @staticmethod
+    def _b64decode(data: str) -> bytes:
+        return base64.b64decode(data + '=' * (-len(data) % 4))
+
+    def hash_password(self, password: str) -> str:
+        """Hash a password into a PHC-formatted Argon2id verifier string"""
+        salt = os.urandom(16)
+        digest = self._derive(
+            password, salt, self.time_cost, self.memory_cost, self.parallelism, self.hash_length
+        )
+        return (
+            f"${self.ALGORITHM}$v={self.VERSION}"
+            f"$m={self.memory_cost},t={self.time_cost},p={self.parallelism}"
+            f"${self._b64encode(salt)}${self._b64encode(digest)}"
+        )
+
+    def verify_password(self, password: str, encoded: str) -> bool:
+        """Check a password against a PHC-formatted Argon2id verifier"""
+        try:
+            _, algorithm, version, params, salt, digest = encoded.split('$')
+            if algorithm != self.ALGORITHM or version != f"v={self.VERSION}":
+                raise ValueError(f"Unsupported verifier format: {algorithm} {version}")
+
+            options = dict(item.split('=') for item in params.split(','))
+            expected = self._b64decode(digest)
+            candidate = self._derive(
+                password,
+                self._b64decode(salt),
+                int(options['t']),
+                int(options['m']),
+                int(options['p']),
+                len(expected)
+            )
+        except AdmissionRejectedError:
+            raise
+        except (ValueError, KeyError) as e:
+            raise ValueError(f"Malformed password verifier: {str(e)}")
+
+        return hmac.compare_digest(candidate, expected)
+
+    def _get_dummy_verifier(self) -> str:
+        """Create the unknown-user verifier once, even when the first lookups race"""
+        with self._dummy_lock:
+            if self._dummy_verifier is None:
+                self._dummy_verifier = self.hash_password(os.urandom(16).hex())
+            return self._dummy_verifier
+
+    def needs_rehash(self, encoded: str) -> bool:
+        """Return True when a verifier was produced with weaker parameters than the current ones"""
+        return f"$m={self.memory_cost},t={self.time_cost},p={self.parallelism}$" not in encoded
+
+    def register(self, user_id_hash: str, password: str) -> bool:
+        """Enroll a new user; False when the user already has a verifier (never overwritten)"""
+        return self.backend.create(user_id_hash, self.hash_password(password))
+
+    def has_verifier(self, user_id_hash: str) -> bool:
+        """Return True when the user has an enrolled verifier"""
+        return self.backend.get(user_id_hash) is not None
+
+    def verify(self, user_id_hash: str, password: str) -> bool:
+        """Verify a user's password, upgrading the stored verifier if its parameters are stale
+
+        Unknown users are rejected; enrollment only happens through register().
+        """
+        encoded = self.backend.get(user_id_hash)
+
+        if encoded is None:
+            self.verify_password(password, self._get_dummy_verifier())
+            return False
+
+        if not self.verify_password(password, encoded):
+            return False
+
+        if self.needs_rehash(encoded):
+            self.backend.replace(user_id_hash, encoded, self.hash_password(password))
+        return True
+
+
+_default_store: Optional[PasswordVerifierStore] = None
+_default_store_lock = threading.Lock()
+
+
+def get_default_verifier_store() -> PasswordVerifierStore:
+    """Return the process-wide verifier store shared by all sessions"""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            database_url = os.getenv('DATABASE_URL')
+            if database_url:
+                # Imported here so the verifier module stays usable without the database layer
+                from utils.db_engine import get_engine_registry
+                from utils.db_migrations import ensure_schema
+                engine = get_engine_registry().get_engine(database_url)
+                ensure_schema(engine)
+                backend = DatabaseVerifierBackend(engine)
+            else:
+                print("DATABASE_URL not set: password verifiers are kept in memory and lost on restart")
+                backend = InMemoryVerifierBackend()
+            _default_store = PasswordVerifierStore(backend)
+        return _default_store
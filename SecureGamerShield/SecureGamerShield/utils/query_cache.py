@@ -0,0 +1,264 @@
+"""
+Read-through cache for user-scoped database queries
+In-process LRU with TTL, optionally backed by a shared store served from a local manager process
+"""
+
+import os
+import sys
+import copy
+import time
+import uuid
+import argparse
+import threading
+from collections import OrderedDict
+from multiprocessing.managers import BaseManager
+from typing import Callable, Optional, Tuple
+
+
+class TTLCache:
+    """Thread-safe LRU map whose entries also expire `ttl` seconds after being stored"""
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 60.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'evictions': 0, 'expirations': 0}
+
+    def lookup(self, key) -> Tuple[bool, object]:
+        """Return (found, value) so a miss is distinguishable from a cached None, even over a proxy"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self._stats['expirations'] += 1
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def store(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {'entries': len(self._entries), 'capacity': self.max_entries, **self._stats}
+
+
+class CacheStore:
+    """Cached query results plus a version token per user; invalidating a user replaces the token
+
+    Entries are keyed by the token, so a bump makes every older entry unreachable at once and the
+    LRU ages them out. Tokens are random rather than counters, so an evicted token can never come
+    back and resurrect stale entries.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 60.0):
+        self.entries = TTLCache(max_entries, ttl)
+        self.versions = TTLCache(max_entries, ttl)
+        self._version_lock = threading.Lock()
+
+    def version(self, user_id_hash: str) -> str:
+        with self._version_lock:
+            found, token = self.versions.lookup(user_id_hash)
+            if not found:
+                token = uuid.uuid4().hex
+                self.versions.store(user_id_hash, token)
+            return token
+
+    def bump(self, user_id_hash: str) -> str:
+        token = uuid.uuid4().hex
+        with self._version_lock:
+            self.versions.store(user_id_hash, token)
+        return token
+
+    def lookup(self, key) -> Tuple[bool, object]:
+        return self.entries.lookup(key)
+
+    def store(self, key, value):
+        self.entries.store(key, value)
+
+    def clear(self):
+        self.entries.clear()
+        self.versions.clear()
+
+    def get_stats(self) -> dict:
+        return self.entries.get_stats()
+
+
+class SharedCacheManager(BaseManager):
+    """Manager serving one CacheStore to every app process on the host"""
+
+
+def serve_shared_cache(address: Tuple[str, int], authkey: bytes, max_entries: int = 10000,
+                       ttl: float = 60.0):
+    """Run the shared cache server in the current process (blocks)"""
+    store = CacheStore(max_entries, ttl)
+    SharedCacheManager.register('get_store', callable=lambda: store)
+    manager = SharedCacheManager(address=address, authkey=authkey)
+    print(f"Shared query cache listening on {address[0]}:{address[1]}")
+    manager.get_server().serve_forever()
+
+
+def connect_shared_cache(address: Tuple[str, int], authkey: bytes):
+    """Proxy to the CacheStore of a running shared cache server"""
+    SharedCacheManager.register('get_store')
+    manager = SharedCacheManager(address=address, authkey=authkey)
+    manager.connect()
+    return manager.get_store()
+
+
+class QueryCache:
+    """Read-through cache for user-scoped queries with per-user versioned keys"""
+
+    def __init__(self, local: CacheStore, shared=None):
+        self.local = local
+        self.shared = shared
+        self._lock = threading.Lock()
+        self._stats = {'local_hits': 0, 'shared_hits': 0, 'misses': 0, 'invalidations': 0,
+                       'remote_invalidations': 0, 'shared_errors': 0}
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _shared_call(self, method: str, *args):
+        """Call the shared store; a failure degrades to the local cache instead of failing the read"""
+        if self.shared is None:
+            return None
+        try:
+            return getattr(self.shared, method)(*args)
+        except (OSError, EOFError) as e:
+            print(f"Error reaching shared query cache: {str(e)}")
+            self._count('shared_errors')
+            return None
+
+    def _version(self, user_id_hash: str) -> str:
+        # The shared store owns versions when configured, so one process' write invalidates all
+        return self._shared_call('version', user_id_hash) or self.local.version(user_id_hash)
+
+    def get_or_load(self, namespace: str, user_id_hash: str, args: tuple, loader: Callable):
+        """Return a cached result for (namespace, user, args) or call loader and cache it
+
+        Results are deep-copied on local hits so callers can never mutate a cached value.
+        """
+        key = (namespace, user_id_hash, self._version(user_id_hash), args)
+        found, value = self.local.lookup(key)
+        if found:
+            self._count('local_hits')
+            return copy.deepcopy(value)
+
+        shared = self._shared_call('lookup', key)
+        if shared and shared[0]:
+            self._count('shared_hits')
+            self.local.store(key, shared[1])
+            return copy.deepcopy(shared[1])
+
+        self._count('misses')
+        value = loader()
+        if value is not None:
+            self.local.store(key, copy.deepcopy(value))
+            self._shared_call('store', key, value)
+        return value
+
+    def invalidate_user(self, user_id_hash: str):
+        """Drop every cached result for a user (called after writes)"""
+        self._count('invalidations')
+        self.local.bump(user_id_hash)
+        self._shared_call('bump', user_id_hash)
+
+    def invalidate_remote_write(self, user_id_hash: str):
+        """Drop a user's results after another replica's write
+
+        The writer only bumped its own caches; the shared store here may belong to a different
+        host, and owns the versions when configured, so it is bumped as well.
+        """
+        self._count('remote_invalidations')
+        self.local.bump(user_id_hash)
+        self._shared_call('bump', user_id_hash)
+
+    def clear(self):
+        self.local.clear()
+        self._shared_call('clear')
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats['local_hits'] + stats['shared_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['local_hits'] + stats['shared_hits']) / lookups if lookups else 0.0
+        stats['shared_backend'] = self.shared is not None
+        stats.update(self.local.get_stats())
+        return stats
+
+
+def _shared_address() -> Optional[Tuple[str, int]]:
+    address = os.getenv('QUERY_CACHE_SHARED_ADDRESS')
+    if not address:
+        return None
+    host, port = address.rsplit(':', 1)
+    return host, int(port)
+
+
+def _shared_authkey() -> bytes:
+    authkey = os.getenv('QUERY_CACHE_SHARED_AUTHKEY')
+    if not authkey:
+        raise ValueError("QUERY_CACHE_SHARED_AUTHKEY must be set to use the shared query cache")
+    return authkey.encode()
+
+
+_default_cache: Optional[QueryCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_query_cache() -> QueryCache:
+    """Return the process-wide query cache configured from QUERY_CACHE_* environment variables"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            local = CacheStore(
+                max_entries=int(os.getenv('QUERY_CACHE_MAX_ENTRIES', '1024')),
+                ttl=float(os.getenv('QUERY_CACHE_TTL', '60'))
+            )
+            shared = None
+            address = _shared_address()
+            if address:
+                try:
+                    shared = connect_shared_cache(address, _shared_authkey())
+                except (OSError, EOFError) as e:
+                    print(f"Error connecting to shared query cache, using local cache only: {str(e)}")
+            _default_cache = QueryCache(local, shared)
+        return _default_cache
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the shared query cache server")
+    parser.add_argument('command', choices=['serve'])
+    parser.add_argument('--max-entries', type=int, default=int(os.getenv('QUERY_CACHE_MAX_ENTRIES', '10000')))
+    parser.add_argument('--ttl', type=float, default=float(os.getenv('QUERY_CACHE_TTL', '60')))
+    args = parser.parse_args(argv)
+
+    address = _shared_address()
+    if address is None:
+        print("QUERY_CACHE_SHARED_ADDRESS environment variable not set (host:port)")
+        return 1
+    serve_shared_cache(address, _shared_authkey(), args.max_entries, args.ttl)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,204 @@
+"""
+In-process rate limiting for KDF-heavy operations
+Token buckets per user and per client plus a global KDF budget and sliding-window counters
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict
+
+
+class RateLimitExceededError(Exception):
+    """Raised when a caller has exhausted its KDF budget"""
+
+    def __init__(self, scope: str, retry_after: float):
+        self.scope = scope
+        self.retry_after = retry_after
+        super().__init__(
+            f"Too many attempts ({scope} limit), retry in {retry_after:.1f}s"
+        )
+
+
+class TokenBucket:
+    """Classic token bucket refilled lazily on each call"""
+
+    __slots__ = ('capacity', 'refill_rate', 'tokens', 'updated')
+
+    def __init__(self, capacity: float, refill_rate: float, now: float = None):
+        self.capacity = capacity
+        self.refill_rate = refill_rate  # tokens per second
+        self.tokens = capacity
+        self.updated = time.monotonic() if now is None else now
+
+    def _refill(self, now: float):
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_rate)
+            self.updated = now
+
+    def try_consume(self, cost: float = 1.0, now: float = None) -> float:
+        """Consume tokens; return 0 on success or the seconds until enough tokens exist"""
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.refill_rate
+
+    def refund(self, cost: float = 1.0):
+        """Return tokens taken for work that was never performed"""
+        self.tokens = min(self.capacity, self.tokens + cost)
+
+
+class SlidingWindowCounter:
+    """Approximate sliding-window counter using the current and previous fixed windows"""
+
+    __slots__ = ('window', 'current_start', 'current_count', 'previous_count')
+
+    def __init__(self, window_seconds: float, now: float = None):
+        self.window = window_seconds
+        now = time.monotonic() if now is None else now
+        self.current_start = now - (now % window_seconds)
+        self.current_count = 0
+        self.previous_count = 0
+
+    def _roll(self, now: float):
+        elapsed_windows = int((now - self.current_start) // self.window)
+        if elapsed_windows >= 1:
+            self.previous_count = self.current_count if elapsed_windows == 1 else 0
+            self.current_count = 0
+            self.current_start += elapsed_windows * self.window
+
+    def count(self, now: float = None) -> float:
+        """Weighted request count over the trailing window"""
+        now = time.monotonic() if now is None else now
+        self._roll(now)
+        overlap = 1.0 - (now - self.current_start) / self.window
+        return self.current_count + self.previous_count * overlap
+
+    def add(self, amount: int = 1, now: float = None):
+        now = time.monotonic() if now is None else now
+        self._roll(now)
+        self.current_count += amount
+
+
+class KDFRateLimiter:
+    """Bounds KDF work per user, per client and globally for the whole process"""
+
+    def __init__(self,
+                 user_capacity: float = 5, user_refill_per_second: float = 5 / 60,
+                 client_capacity: float = 20, client_refill_per_second: float = 20 / 60,
+                 global_capacity: float = 50, global_refill_per_second: float = 10,
+                 window_seconds: float = 60, max_tracked_keys: int = 100_000):
+        self.user_capacity = user_capacity
+        self.user_refill_per_second = user_refill_per_second
+        self.client_capacity = client_capacity
+        self.client_refill_per_second = client_refill_per_second
+        self.window_seconds = window_seconds
+        self.max_tracked_keys = max_tracked_keys
+
+        self._global_bucket = TokenBucket(global_capacity, global_refill_per_second)
+        self._user_buckets: 'OrderedDict[str, TokenBucket]' = OrderedDict()
+        self._client_buckets: 'OrderedDict[str, TokenBucket]' = OrderedDict()
+        self._user_windows: 'OrderedDict[str, SlidingWindowCounter]' = OrderedDict()
+        self._global_window = SlidingWindowCounter(window_seconds)
+        self._rejections: Dict[str, int] = {'user': 0, 'client': 0, 'global': 0}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> 'KDFRateLimiter':
+        """Build a limiter from KDF_RATE_* environment variables"""
+        return cls(
+            user_capacity=float(os.getenv('KDF_RATE_USER_BURST', '5')),
+            user_refill_per_second=float(os.getenv('KDF_RATE_USER_PER_MINUTE', '5')) / 60,
+            client_capacity=float(os.getenv('KDF_RATE_CLIENT_BURST', '20')),
+            client_refill_per_second=float(os.getenv('KDF_RATE_CLIENT_PER_MINUTE', '20')) / 60,
+            global_capacity=float(os.getenv('KDF_RATE_GLOBAL_BURST', '50')),
+            global_refill_per_second=float(os.getenv('KDF_RATE_GLOBAL_PER_SECOND', '10'))
+        )
+
+    def _lookup(self, table: OrderedDict, key: str, factory):
+        """Fetch or create a per-key entry, evicting the least recently used past the cap"""
+        entry = table.get(key)
+        if entry is None:
+            entry = factory()
+            table[key] = entry
+            if len(table) > self.max_tracked_keys:
+                table.popitem(last=False)
+        else:
+            table.move_to_end(key)
+        return entry
+
+    def acquire(self, user_key: str, client_key: str = None, cost: float = 1.0) -> None:
+        """Charge one KDF operation to the user, client and global budgets or raise"""
+        now = time.monotonic()
+        with self._lock:
+            user_bucket = self._lookup(
+                self._user_buckets, user_key,
+                lambda: TokenBucket(self.user_capacity, self.user_refill_per_second, now)
+            )
+            charged = []
+
+            wait = user_bucket.try_consume(cost, now)
+            if wait:
+                self._rejections['user'] += 1
+                raise RateLimitExceededError('user', wait)
+            charged.append(user_bucket)
+
+            if client_key is not None:
+                client_bucket = self._lookup(
+                    self._client_buckets, client_key,
+                    lambda: TokenBucket(self.client_capacity, self.client_refill_per_second, now)
+                )
+                wait = client_bucket.try_consume(cost, now)
+                if wait:
+                    for bucket in charged:
+                        bucket.refund(cost)
+                    self._rejections['client'] += 1
+                    raise RateLimitExceededError('client', wait)
+                charged.append(client_bucket)
+
+            wait = self._global_bucket.try_consume(cost, now)
+            if wait:
+                for bucket in charged:
+                    bucket.refund(cost)
+                self._rejections['global'] += 1
+                raise RateLimitExceededError('global', wait)
+
+            self._lookup(
+                self._user_windows, user_key,
+                lambda: SlidingWindowCounter(self.window_seconds, now)
+            ).add(1, now)
+            self._global_window.add(1, now)
+
+    def get_user_rate(self, user_key: str) -> float:
+        """KDF operations charged to a user over the trailing window"""
+        with self._lock:
+            window = self._user_windows.get(user_key)
+            return window.count() if window else 0.0
+
+    def get_stats(self) -> dict:
+        """Return rejection counters and the global trailing-window rate"""
+        with self._lock:
+            return {
+                'rejections': dict(self._rejections),
+                'global_window_count': self._global_window.count(),
+                'window_seconds': self.window_seconds,
+                'tracked_users': len(self._user_buckets),
+                'tracked_clients': len(self._client_buckets)
+            }
+
+
+_default_limiter: Optional[KDFRateLimiter] = None
+_default_limiter_lock = threading.Lock()
+
+
+def get_default_rate_limiter() -> KDFRateLimiter:
+    """Return the process-wide KDF rate limiter shared by all sessions"""
+    global _default_limiter
+    with _default_limiter_lock:
+        if _default_limiter is None:
+            _default_limiter = KDFRateLimiter.from_env()
+        return _default_limiter
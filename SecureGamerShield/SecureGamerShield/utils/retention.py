@@ -0,0 +1,197 @@
+"""
+Per-user data retention engine
+Deletes expired rows in small keyset-ordered batches honoring privacy_settings.data_retention_days
+"""
+
+import os
+import time
+import threading
+from typing import Dict, Optional
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
+from utils.query_cache import QueryCache
+from utils.cache_invalidation import INVALIDATION_CHANNEL, invalidation_payloads
+
+# Job name -> (table, timestamp expression over alias t the retention window applies to).
+# Game data expires by its last upsert: updated_at no longer moves when an upsert changes nothing.
+RETENTION_JOBS = {
+    'privacy_assessments': ('privacy_assessments', 't.completed_at'),
+    'encrypted_game_data': ('encrypted_game_data', 'COALESCE(t.last_seen_at, t.updated_at)'),
+}
+
+
+class RetentionEngine:
+    """Walks each table by primary key in short transactions, deleting rows past their owner's retention"""
+
+    def __init__(self, engine: Engine, batch_size: int = 500, max_rows_per_second: float = 2000,
+                 default_retention_days: int = 365, query_cache: QueryCache = None):
+        self.engine = engine
+        self.query_cache = query_cache
+        self.batch_size = batch_size
+        self.max_rows_per_second = max_rows_per_second
+        self.default_retention_days = default_retention_days
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_env(cls, engine: Engine, default_retention_days: int = 365,
+                 query_cache: QueryCache = None) -> 'RetentionEngine':
+        """Build an engine tuned by RETENTION_BATCH_SIZE and RETENTION_MAX_ROWS_PER_SECOND"""
+        return cls(
+            engine,
+            batch_size=int(os.getenv('RETENTION_BATCH_SIZE', '500')),
+            max_rows_per_second=float(os.getenv('RETENTION_MAX_ROWS_PER_SECOND', '2000')),
+            default_retention_days=default_retention_days,
+            query_cache=query_cache
+        )
+
+    def _batch_sql(self, table: str, activity: str):
+        # Scan the next keyset window, then delete only the expired rows inside it
+        return text(f"""
+            WITH scan AS (
+                SELECT t.id,
+                       {activity} < NOW() - make_interval(
+                           days => COALESCE(ps.data_retention_days, :default_days)
+                       ) AS expired
+                FROM {table} t
+                LEFT JOIN privacy_settings ps ON ps.user_id_hash = t.user_id_hash
+                WHERE t.id > :after_id
+                ORDER BY t.id
+                LIMIT :batch_size
+            ),
+            deleted AS (
+                DELETE FROM {table} t
+                USING scan s
+                WHERE t.id = s.id AND s.expired
+                RETURNING t.id, t.user_id_hash
+            )
+            SELECT (SELECT MAX(id) FROM scan), (SELECT COUNT(*) FROM scan), (SELECT COUNT(*) FROM deleted),
+                   (SELECT ARRAY_AGG(DISTINCT user_id_hash) FROM deleted)
+        """)
+
+    def run_batch(self, job_name: str) -> Optional[Dict]:
+        """Process one window for a job; None when another worker holds the job's checkpoint"""
+        table, activity = RETENTION_JOBS[job_name]
+        with self.engine.connect() as conn:
+            conn.execute(
+                text("INSERT INTO retention_checkpoints (job_name) VALUES (:job) ON CONFLICT DO NOTHING"),
+                {'job': job_name}
+            )
+            # The checkpoint row lock keeps concurrent replicas from processing the same window
+            checkpoint = conn.execute(
+                text("""
+                SELECT last_id FROM retention_checkpoints
+                WHERE job_name = :job FOR UPDATE SKIP LOCKED
+                """),
+                {'job': job_name}
+            ).fetchone()
+            if checkpoint is None:
+                conn.rollback()
+                return None
+
+            last_id, scanned, deleted, user_id_hashes = conn.execute(
+                self._batch_sql(table, activity),
+                {
+                    'after_id': checkpoint[0],
+                    'batch_size': self.batch_size,
+                    'default_days': self.default_retention_days
+                }
+            ).fetchone()
+
+            # An empty window means the end of the table: wrap around for the next pass
+            wrapped = scanned == 0
+            conn.execute(
+                text("""
+                UPDATE retention_checkpoints
+                SET last_id = :last_id,
+                    passes_completed = passes_completed + :wrapped,
+                    rows_deleted = rows_deleted + :deleted,
+                    updated_at = NOW()
+                WHERE job_name = :job
+                """),
+                {'last_id': 0 if wrapped else last_id, 'wrapped': int(wrapped), 'deleted': deleted, 'job': job_name}
+            )
+            # Other replicas evict the owners' cached queries only if the deletes commit
+            user_id_hashes = user_id_hashes or []
+            for payload in invalidation_payloads(table, user_id_hashes):
+                conn.execute(
+                    text("SELECT pg_notify(:channel, :payload)"),
+                    {'channel': INVALIDATION_CHANNEL, 'payload': payload}
+                )
+            conn.commit()
+        if self.query_cache is not None:
+            for user_id_hash in user_id_hashes:
+                self.query_cache.invalidate_user(user_id_hash)
+        return {'scanned': scanned, 'deleted': deleted, 'wrapped': wrapped}
+
+    def run_pass(self, job_name: str, max_seconds: float = None) -> Dict:
+        """Run batches until the job reaches the end of its table, throttled to max_rows_per_second"""
+        stats = {'batches': 0, 'scanned': 0, 'deleted': 0, 'completed': False}
+        started = time.monotonic()
+        while not self._stop.is_set():
+            batch_started = time.monotonic()
+            result = self.run_batch(job_name)
+            if result is None:
+                break
+            stats['batches'] += 1
+            stats['scanned'] += result['scanned']
+            stats['deleted'] += result['deleted']
+            if result['wrapped']:
+                stats['completed'] = True
+                break
+            if max_seconds is not None and time.monotonic() - started >= max_seconds:
+                break
+
+            # Rate ceiling on deletions keeps WAL volume and replication lag smooth
+            if self.max_rows_per_second and result['deleted']:
+                pause = result['deleted'] / self.max_rows_per_second - (time.monotonic() - batch_started)
+                if pause > 0:
+                    self._stop.wait(pause)
+        return stats
+
+    def run(self, max_seconds: float = None) -> Dict[str, Dict]:
+        """One pass over every retention job"""
+        results = {}
+        for job_name in RETENTION_JOBS:
+            try:
+                results[job_name] = self.run_pass(job_name, max_seconds)
+            except SQLAlchemyError as e:
+                print(f"Error running retention job {job_name}: {str(e)}")
+                results[job_name] = {'error': str(e)}
+        return results
+
+    def start(self, interval: float = 3600):
+        """Run passes continuously on a background thread, sleeping `interval` between passes"""
+        if self._thread is not None:
+            return
+
+        def loop():
+            while not self._stop.is_set():
+                self.run()
+                self._stop.wait(interval)
+
+        self._thread = threading.Thread(target=loop, name='retention-engine', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def get_checkpoints(self) -> Dict[str, Dict]:
+        """Current keyset position and totals for every job"""
+        try:
+            with self.engine.connect() as conn:
+                rows = conn.execute(text("""
+                    SELECT job_name, last_id, passes_completed, rows_deleted, updated_at
+                    FROM retention_checkpoints
+                """)).fetchall()
+        except SQLAlchemyError as e:
+            print(f"Error reading retention checkpoints: {str(e)}")
+            return {}
+        return {
+            row[0]: {'last_id': row[1], 'passes_completed': row[2], 'rows_deleted': row[3], 'updated_at': row[4]}
+            for row in rows
+        }